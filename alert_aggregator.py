@@ -0,0 +1,153 @@
+"""
+Agrégation des alertes avant écriture en base
+Une anomalie répétée sur le même (capteur, type) pendant la fenêtre de suppression ne crée
+pas de nouvelle alerte : elle incrémente le compteur d'occurrences et la date de dernière
+occurrence de l'alerte active existante, mises à jour en base par lots
+"""
+import threading
+from typing import Dict, Optional
+from config import Config
+from database import get_database, now_ms
+
+
+class AlertAggregator:
+    """
+    Index en mémoire {(capteur, type): (id de l'alerte active, dernière occurrence ms)}.
+    Les occurrences supprimées sont cumulées puis écrites en une transaction au plus
+    toutes les ALERT_OCCURRENCE_FLUSH_INTERVAL_MS (flush_if_due) ou sur flush().
+    
+    La clé d'une nouvelle alerte est réservée sous le verrou (id None) avant l'insertion :
+    les anomalies concurrentes sur la même clé sont comptées comme occurrences de l'alerte
+    en cours de création au lieu de créer des doublons.
+    """
+    
+    def __init__(self, db=None, windows: Optional[Dict] = None, default_window_s: Optional[float] = None,
+                 flush_interval_ms: Optional[int] = None):
+        self.db = db or get_database()
+        self.windows = Config.ALERT_SUPPRESSION_WINDOWS if windows is None else windows
+        self.default_window_s = Config.ALERT_SUPPRESSION_WINDOW_S if default_window_s is None else default_window_s
+        self.flush_interval_ms = Config.ALERT_OCCURRENCE_FLUSH_INTERVAL_MS if flush_interval_ms is None else flush_interval_ms
+        self._lock = threading.Lock()
+        self._active = {}      # (capteur, type) -> [id, dernière occurrence ms]
+        self._pending = {}     # id -> [occurrences à ajouter, dernière occurrence ms]
+        self._reserved = {}    # (capteur, type) en cours de création -> [occurrences, dernière occurrence ms]
+        self._last_flush_ms = now_ms()
+        self._stats = {'created': 0, 'suppressed': 0, 'flushes': 0, 'flushed_alerts': 0}
+        self.reload()
+    
+    def reload(self):
+        """Recharge les alertes actives depuis la base (démarrage, résolutions externes)"""
+        try:
+            active = {key: [alert_id, last_seen_ms] for key, (alert_id, last_seen_ms) in self.db.get_active_alert_keys().items()}
+        except Exception as e:
+            print(f"❌ Erreur de chargement des alertes actives: {e}")
+            return
+        with self._lock:
+            for key in self._reserved:
+                active[key] = self._active.get(key) or [None, now_ms()]
+            self._active = active
+    
+    def get_window_ms(self, sensor_name: str, alert_type: str) -> int:
+        """Fenêtre de suppression : (capteur, type), puis type, puis valeur par défaut"""
+        window_s = self.windows.get((sensor_name, alert_type), self.windows.get(alert_type, self.default_window_s))
+        return int(window_s * 1000)
+    
+    def submit(self, anomaly: Dict, ts_ms: Optional[int] = None) -> Optional[int]:
+        """
+        Enregistre une anomalie. Renvoie l'id de la nouvelle alerte créée, ou None si
+        l'anomalie a été rattachée à l'alerte active existante (pas de nouvelle diffusion)
+        """
+        ts_ms = ts_ms or now_ms()
+        key = (anomaly['sensor_name'], anomaly['type'])
+        
+        with self._lock:
+            entry = self._active.get(key)
+            if entry is not None and (entry[0] is None or ts_ms - entry[1] <= self.get_window_ms(*key)):
+                entry[1] = max(entry[1], ts_ms)
+                if entry[0] is None:
+                    # Alerte en cours de création par un autre thread
+                    pending = self._reserved[key]
+                else:
+                    pending = self._pending.setdefault(entry[0], [0, ts_ms])
+                pending[0] += 1
+                pending[1] = max(pending[1], ts_ms)
+                self._stats['suppressed'] += 1
+                return None
+            # Réserver la clé avant l'insertion (hors verrou)
+            self._active[key] = [None, ts_ms]
+            self._reserved[key] = [0, ts_ms]
+        
+        try:
+            alert_id = self.db.create_alert(
+                sensor_name=anomaly['sensor_name'],
+                alert_type=anomaly['type'],
+                message=anomaly['message'],
+                severity=anomaly['severity']
+            )
+        except Exception:
+            with self._lock:
+                self._reserved.pop(key, None)
+                entry = self._active.get(key)
+                if entry is not None and entry[0] is None:
+                    del self._active[key]
+            raise
+        
+        with self._lock:
+            count, last_seen_ms = self._reserved.pop(key)
+            entry = self._active.setdefault(key, [None, ts_ms])
+            entry[0] = alert_id
+            if count:
+                self._pending[alert_id] = [count, last_seen_ms]
+            self._stats['created'] += 1
+        return alert_id
+    
+    def forget(self, alert_id: int):
+        """Alerte résolue : la prochaine anomalie du même (capteur, type) créera une nouvelle alerte"""
+        with self._lock:
+            for key, (active_id, _) in list(self._active.items()):
+                if active_id == alert_id:
+                    del self._active[key]
+            self._pending.pop(alert_id, None)
+    
+    def flush_if_due(self):
+        if now_ms() - self._last_flush_ms >= self.flush_interval_ms:
+            self.flush()
+    
+    def flush(self) -> int:
+        """Écrit les occurrences cumulées en une transaction ; renvoie le nombre d'alertes mises à jour"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush_ms = now_ms()
+        if not pending:
+            return 0
+        
+        try:
+            updated = self.db.record_alert_occurrences(
+                [(alert_id, count, last_seen_ms) for alert_id, (count, last_seen_ms) in pending.items()]
+            )
+        except Exception as e:
+            print(f"❌ Erreur d'écriture des occurrences d'alertes: {e}")
+            with self._lock:
+                for alert_id, (count, last_seen_ms) in pending.items():
+                    entry = self._pending.setdefault(alert_id, [0, last_seen_ms])
+                    entry[0] += count
+                    entry[1] = max(entry[1], last_seen_ms)
+            return 0
+        
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['flushed_alerts'] += updated
+        if updated < len(pending):
+            # Alertes résolues hors de l'application : resynchroniser l'index
+            self.reload()
+        return updated
+    
+    def get_stats(self) -> Dict:
+        """Compteurs d'alertes créées / supprimées et d'écritures groupées"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['active_keys'] = len(self._active)
+            stats['reserved_keys'] = len(self._reserved)
+            stats['pending_alerts'] = len(self._pending)
+            stats['pending_occurrences'] = sum(count for count, _ in self._pending.values())
+        return stats
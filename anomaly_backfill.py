@@ -0,0 +1,305 @@
+"""
+Ré-analyse de l'historique des capteurs (backfill de la détection d'anomalies)
+Rejoue sensor_readings sur une plage de temps, par lots, avec une détection vectorisée
+(pandas/NumPy) équivalente à celle de l'AnomalyDetector, écrit les alertes en bloc et
+reprend au dernier point de contrôle en cas d'interruption (enregistré en base avec les
+alertes de chaque lot, dans la même transaction)
+
+Usage:
+    python anomaly_backfill.py --start 2024-01-01 [--end 2024-12-31] [--sensors ph temperature]
+                               [--chunk-size 100000] [--trend] [--active] [--dry-run] [--reset]
+"""
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import Config
+from database import get_database, now_ms, to_epoch_ms, epoch_ms_to_iso
+from streaming_stats import SlidingWindowStats
+from anomaly_detector import AnomalyDetector
+from drift_detectors import create_detectors, run_detectors
+
+CHUNK_COLUMNS = ['id', 'sensor_name', 'value', 'unit', 'ts_ms']
+
+
+class AnomalyBackfill:
+    """
+    Ré-analyse par lots de (ts_ms, id) croissants. L'état de chaque capteur (fenêtre
+    glissante des statistiques, 5 dernières lectures pour la tendance, détecteurs de
+    dérive) est conservé d'un lot à l'autre, si bien que le découpage n'a pas d'effet
+    sur les alertes produites. Le point de contrôle (dernière lecture traitée, état des
+    détecteurs) est enregistré dans la transaction qui écrit les alertes de chaque lot :
+    une interruption laisse le lot entièrement écrit ou pas du tout, et une reprise
+    reconstruit la fenêtre depuis la base.
+    """
+    
+    def __init__(self, start_ms: int, end_ms: Optional[int] = None, sensors: Optional[List[str]] = None, db=None,
+                 chunk_size: Optional[int] = None, checkpoint_name: Optional[str] = None,
+                 check_trend: bool = False, active: bool = False, dry_run: bool = False):
+        self.db = db or get_database()
+        self.thresholds = Config.SENSOR_THRESHOLDS
+        self.start_ms = int(start_ms)
+        self.end_ms = int(end_ms) if end_ms is not None else None   # None : maintenant, ou la fin de la ré-analyse reprise
+        self.sensors = sorted(sensors) if sensors else sorted(self.thresholds)
+        self.chunk_size = chunk_size or Config.ANOMALY_BACKFILL_CHUNK_SIZE
+        self.checkpoint_name = checkpoint_name or Config.ANOMALY_BACKFILL_CHECKPOINT
+        self.check_trend = check_trend
+        self.active = active          # Alertes historiques résolues par défaut (pas de tableau de bord inondé)
+        self.dry_run = dry_run
+        self.window_ms = int(Config.ANOMALY_STATS_WINDOW_HOURS * 3600 * 1000)
+        self.sensor_stats = {}
+        self.trend_tails = {}         # capteur -> (ts_ms, valeurs) des 5 dernières lectures
+        self.drift_detectors = {
+            sensor_name: create_detectors(sensor_name, Config.SENSOR_DRIFT_DETECTORS.get(sensor_name))
+            for sensor_name in self.sensors
+        }
+    
+    def _run_signature(self) -> Dict:
+        """Paramètres qui doivent être identiques pour reprendre une ré-analyse"""
+        thresholds = json.dumps({
+            name: [self.thresholds.get(name), Config.SENSOR_DRIFT_DETECTORS.get(name)] for name in self.sensors
+        }, sort_keys=True)
+        return {
+            'start_ms': self.start_ms,
+            'end_ms': self.end_ms,
+            'sensors': self.sensors,
+            'check_trend': self.check_trend,
+            'default_z_threshold': AnomalyDetector.STATISTICAL_Z_THRESHOLD,
+            'thresholds_hash': hashlib.sha256(thresholds.encode()).hexdigest()[:16]
+        }
+    
+    def load_checkpoint(self) -> Optional[Dict]:
+        checkpoint = self.db.get_backfill_checkpoint(self.checkpoint_name)
+        if checkpoint is None:
+            return None
+        if self.end_ms is None:
+            self.end_ms = checkpoint.get('signature', {}).get('end_ms')
+        if checkpoint.get('signature') != self._run_signature():
+            raise ValueError(
+                f"Le point de contrôle '{self.checkpoint_name}' correspond à une autre ré-analyse "
+                f"(plage, capteurs ou seuils différents) ; relancez avec --reset"
+            )
+        return checkpoint
+    
+    def save_checkpoint(self, checkpoint: Dict):
+        self.db.save_backfill_checkpoint(self.checkpoint_name, checkpoint)
+    
+    def clear_checkpoint(self):
+        self.db.delete_backfill_checkpoint(self.checkpoint_name)
+    
+    def _get_sensor_stats(self, sensor_name: str) -> SlidingWindowStats:
+        stats = self.sensor_stats.get(sensor_name)
+        if stats is None:
+            stats = SlidingWindowStats(Config.ANOMALY_STATS_CAPACITY, self.window_ms)
+            self.sensor_stats[sensor_name] = stats
+        return stats
+    
+    def _restore_state(self, after_ts_ms: int, after_id: int):
+        """
+        Reconstruit la fenêtre de chaque capteur à partir des lectures précédant le point de
+        reprise, sans remonter avant `start_ms` (une ré-analyse continue ne les a pas vues)
+        """
+        rows = self.db.get_readings_chunk(max(self.start_ms, after_ts_ms - self.window_ms), after_ts_ms, limit=-1,
+                                          sensor_names=self.sensors)
+        rows = [row for row in rows if (row[4], row[0]) <= (after_ts_ms, after_id)]
+        if not rows:
+            return
+        frame = pd.DataFrame(rows, columns=CHUNK_COLUMNS)
+        for sensor_name, group in frame.groupby('sensor_name', sort=False):
+            timestamps = group['ts_ms'].to_numpy(dtype=np.int64)
+            values = group['value'].to_numpy(dtype=np.float64)
+            self._get_sensor_stats(sensor_name).load(timestamps, values)
+            self.trend_tails[sensor_name] = (timestamps[-5:], values[-5:])
+    
+    def _trend(self, sensor_name: str, timestamps: np.ndarray, values: np.ndarray):
+        """Taux de variation par rapport à la moyenne des 5 lectures précédentes (fenêtres glissantes)"""
+        tail_ts, tail_values = self.trend_tails.get(sensor_name, (np.empty(0, dtype=np.int64), np.empty(0)))
+        all_ts = np.concatenate((tail_ts, timestamps))
+        all_values = np.concatenate((tail_values, values))
+        self.trend_tails[sensor_name] = (all_ts[-5:], all_values[-5:])
+        
+        k, offset = len(values), len(tail_values)
+        rates = np.zeros(k)
+        flags = np.zeros(k, dtype=bool)
+        first = max(0, 5 - offset)          # premières valeurs ayant 5 lectures avant elles
+        if first >= k:
+            return rates, flags
+        
+        # Moyenne exacte de chaque fenêtre (indépendante du découpage en lots, contrairement à un cumul)
+        windows = np.lib.stride_tricks.sliding_window_view(all_values, 5)[offset + first - 5:offset + k - 5]
+        averages = windows.mean(axis=1)
+        varying = windows.max(axis=1) != windows.min(axis=1)
+        # Les 5 lectures doivent appartenir à la fenêtre d'historique (2 h) de la lecture évaluée
+        in_window = all_ts[offset + first - 5:offset + k - 5] >= timestamps[first:] - self.window_ms
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates[first:] = np.where(averages != 0, np.abs(values[first:] - averages) / np.where(averages != 0, averages, 1.0), 0.0)
+        flags[first:] = in_window & varying & (averages != 0) & (rates[first:] > AnomalyDetector.TREND_CHANGE_THRESHOLD)
+        return rates, flags
+    
+    def detect_sensor(self, sensor_name: str, group: pd.DataFrame) -> List[Dict]:
+        """Alertes d'un capteur pour un lot (lectures chronologiques)"""
+        threshold = self.thresholds.get(sensor_name)
+        if threshold is None:
+            return []
+        
+        values = group['value'].to_numpy(dtype=np.float64)
+        timestamps = group['ts_ms'].to_numpy(dtype=np.int64)
+        units = group['unit'].to_numpy()
+        n = len(values)
+        
+        low = values < threshold['min'] if 'min' in threshold else np.zeros(n, dtype=bool)
+        high = ~low & (values > threshold['max']) if 'max' in threshold else np.zeros(n, dtype=bool)
+        
+        if self.check_trend:
+            trend_rates, trend_flags = self._trend(sensor_name, timestamps, values)
+        else:
+            trend_rates, trend_flags = None, np.zeros(n, dtype=bool)
+        
+        counts, means, stds = self._get_sensor_stats(sensor_name).evaluate_and_extend(timestamps, values)
+        valid = (counts >= 10) & (stds > 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_scores = np.where(valid, np.abs(values - means) / np.where(valid, stds, 1.0), 0.0)
+        statistical = valid & (z_scores > threshold.get('z_score', AnomalyDetector.STATISTICAL_Z_THRESHOLD))
+        drift = run_detectors(self.drift_detectors.get(sensor_name), values, units, counts, means, stds)
+        drift_flags = np.zeros(n, dtype=bool)
+        drift_flags[list(drift)] = True
+        
+        alerts = []
+        for k in np.flatnonzero(low | high | statistical | drift_flags | trend_flags):
+            value, unit, ts_ms = float(values[k]), units[k], int(timestamps[k])
+            base = {'sensor_name': sensor_name, 'created_at_ms': ts_ms, 'is_active': self.active}
+            if low[k]:
+                alerts.append(dict(base, type='threshold_low', severity='high',
+                                   message=f"{sensor_name} en dessous du seuil minimum: {value} {unit} < {threshold['min']} {unit}"))
+            elif high[k]:
+                alerts.append(dict(base, type='threshold_high', severity='high',
+                                   message=f"{sensor_name} au-dessus du seuil maximum: {value} {unit} > {threshold['max']} {unit}"))
+            if statistical[k]:
+                alerts.append(dict(base, type='statistical_anomaly', severity='medium',
+                                   message=f"Valeur {value} {unit} statistiquement anormale pour {sensor_name} (z-score: {z_scores[k]:.2f})"))
+            alerts.extend(dict(base, **anomaly) for anomaly in drift.get(k, ()))
+            if trend_flags[k]:
+                rate_of_change = trend_rates[k]
+                severity = 'low' if rate_of_change < 0.3 else 'medium' if rate_of_change < 0.5 else 'high'
+                alerts.append(dict(base, type='trend_anomaly', severity=severity,
+                                   message=f"Variation rapide détectée ({rate_of_change*100:.1f}% de changement)"))
+        return alerts
+    
+    def analyze_chunk(self, rows: List[tuple]) -> List[Dict]:
+        """Alertes d'un lot de lectures (id, sensor_name, value, unit, ts_ms), triées par date"""
+        frame = pd.DataFrame(rows, columns=CHUNK_COLUMNS)
+        alerts = []
+        for sensor_name, group in frame.groupby('sensor_name', sort=False):
+            alerts.extend(self.detect_sensor(sensor_name, group))
+        alerts.sort(key=lambda alert: alert['created_at_ms'])
+        return alerts
+    
+    def run(self, reset: bool = False) -> Dict:
+        """Traite la plage lot par lot depuis le dernier point de contrôle ; renvoie le bilan"""
+        if reset:
+            self.clear_checkpoint()
+        checkpoint = None if self.dry_run else self.load_checkpoint()
+        if self.end_ms is None:
+            self.end_ms = now_ms()
+        
+        if checkpoint and checkpoint.get('completed'):
+            print(f"✅ Ré-analyse déjà terminée ({checkpoint['processed_rows']} lectures, "
+                  f"{checkpoint['alerts_written']} alertes) ; --reset pour recommencer")
+            return checkpoint
+        
+        if checkpoint:
+            after = (checkpoint['last_ts_ms'], checkpoint['last_id'])
+            self._restore_state(*after)
+            for sensor_name, states in checkpoint.get('drift_state', {}).items():
+                for detector, state in zip(self.drift_detectors.get(sensor_name, ()), states):
+                    detector.load_state(state)
+            print(f"🔁 Reprise après {epoch_ms_to_iso(after[0])} ({checkpoint['processed_rows']} lectures déjà traitées)")
+        else:
+            after = None
+            checkpoint = {'signature': self._run_signature(), 'processed_rows': 0, 'alerts_written': 0,
+                          'started_at': datetime.now().isoformat()}
+        
+        pending = self.db.count_pending_epoch_backfill()
+        if pending:
+            print(f"⚠️ {pending} lectures sans ts_ms ne seront pas analysées (migration en cours)")
+        
+        started = time.perf_counter()
+        processed = 0
+        while True:
+            rows = self.db.get_readings_chunk(self.start_ms, self.end_ms, after=after,
+                                              limit=self.chunk_size, sensor_names=self.sensors)
+            if not rows:
+                break
+            
+            alerts = self.analyze_chunk(rows)
+            
+            last = rows[-1]
+            after = (last[4], last[0])
+            processed += len(rows)
+            checkpoint.update({
+                'last_ts_ms': after[0],
+                'last_id': after[1],
+                'processed_rows': checkpoint['processed_rows'] + len(rows),
+                'alerts_written': checkpoint['alerts_written'] + len(alerts),
+                'drift_state': {
+                    sensor_name: [detector.state_dict() for detector in detectors]
+                    for sensor_name, detectors in self.drift_detectors.items() if detectors
+                },
+                'updated_at': datetime.now().isoformat()
+            })
+            # Alertes et point de contrôle du lot dans une seule transaction
+            written = len(alerts) if self.dry_run else self.db.create_alerts(alerts, checkpoint=(self.checkpoint_name, checkpoint))
+            
+            elapsed = time.perf_counter() - started
+            print(f"📦 {checkpoint['processed_rows']} lectures jusqu'à {epoch_ms_to_iso(after[0])} "
+                  f"— {written} alertes ({processed / elapsed:.0f} lectures/s)")
+        
+        checkpoint['completed'] = True
+        if not self.dry_run:
+            self.save_checkpoint(checkpoint)
+        print(f"✅ Ré-analyse terminée : {checkpoint['processed_rows']} lectures, "
+              f"{checkpoint['alerts_written']} alertes{' (simulation)' if self.dry_run else ''}")
+        return checkpoint
+
+
+def _parse_time(value: str) -> int:
+    """Date ISO (« 2024-01-01 » ou « 2024-01-01T12:00 ») en epoch ms, heure locale"""
+    return to_epoch_ms(datetime.fromisoformat(value))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ré-analyse de l\'historique des capteurs')
+    parser.add_argument('--start', type=_parse_time, default=0, help='Début de la plage (date ISO)')
+    parser.add_argument('--end', type=_parse_time, default=None, help='Fin de la plage (date ISO, maintenant par défaut)')
+    parser.add_argument('--sensors', nargs='+', default=None, help='Capteurs à analyser (tous par défaut)')
+    parser.add_argument('--chunk-size', type=int, default=Config.ANOMALY_BACKFILL_CHUNK_SIZE)
+    parser.add_argument('--checkpoint', default=Config.ANOMALY_BACKFILL_CHECKPOINT, help='Nom du point de contrôle')
+    parser.add_argument('--trend', action='store_true', help='Inclure les anomalies de tendance')
+    parser.add_argument('--active', action='store_true', help='Créer les alertes comme actives (résolues par défaut)')
+    parser.add_argument('--dry-run', action='store_true', help='Compter les alertes sans les écrire')
+    parser.add_argument('--reset', action='store_true', help='Ignorer le point de contrôle existant')
+    args = parser.parse_args()
+    
+    backfill = AnomalyBackfill(
+        start_ms=args.start,
+        end_ms=args.end,
+        sensors=args.sensors,
+        chunk_size=args.chunk_size,
+        checkpoint_name=args.checkpoint,
+        check_trend=args.trend,
+        active=args.active,
+        dry_run=args.dry_run
+    )
+    try:
+        backfill.run(reset=args.reset)
+    except ValueError as e:
+        print(f"❌ {e}")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -325,22 +325,128 @@ import numpy as np
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from config import Config
-from database import Database
+from database import get_database, now_ms, to_epoch_ms
+from streaming_stats import SlidingWindowStats
+from history_cache import HistoryCache
+from drift_detectors import create_detectors, run_detectors
+from correlation_engine import CorrelationEngine
+from communication_monitor import CommunicationMonitor
 
 class AnomalyDetector:
-    def __init__(self):
-        self.db = Database()
+    # Seuil de z-score par défaut, pour les capteurs sans 'z_score' dans Config.SENSOR_THRESHOLDS
+    STATISTICAL_Z_THRESHOLD = 4.0
+    # Variation relative déclenchant une anomalie de tendance
+    TREND_CHANGE_THRESHOLD = 0.2
+    # En dessous de ce nombre de lectures d'un même capteur, le chemin unitaire (O(1) par lecture)
+    # est plus rapide que la version vectorisée (copie de la fenêtre, sommes préfixées)
+    VECTORIZE_MIN_GROUP = 32
+    
+    def __init__(self, db=None, simulation=False, sensors=None, cross_sensor=True):
+        """
+        `sensors` restreint l'état par capteur préchauffé (partition d'un processus de détection) ;
+        `cross_sensor=False` désactive les contrôles inter-capteurs (communication, corrélations),
+        tenus alors par un autre détecteur qui voit toutes les lectures.
+        """
+        self.db = db or get_database()
         self.thresholds = Config.SENSOR_THRESHOLDS
-        self.historical_data = {}  # Cache pour les données historiques
-        self.last_communication = {}  # Suivi de la dernière communication
+        self.sensors = list(self.thresholds) if sensors is None else list(sensors)
+        self.cross_sensor = cross_sensor
+        self.historical_data = HistoryCache()  # Cache borné de l'historique, alimenté par les nouvelles lectures
+        
+        # Suivi de la dernière communication de chaque équipement (cadence apprise, roue temporelle)
+        self.communication = CommunicationMonitor()
+        self.set_simulation_mode(simulation)
+        
+        # Fenêtre glissante par capteur (moyenne/écart-type en O(1)), préchauffée depuis la base
+        self.stats_window_ms = int(Config.ANOMALY_STATS_WINDOW_HOURS * 3600 * 1000)
+        self.sensor_stats = {}
+        
+        # Détecteurs de dérive (EWMA, CUSUM, Page-Hinkley) configurés par capteur
+        self.drift_detectors = {
+            sensor_name: create_detectors(sensor_name, specs)
+            for sensor_name, specs in Config.SENSOR_DRIFT_DETECTORS.items() if sensor_name in self.sensors
+        }
+        # Matrice alignée de tous les capteurs (distance de Mahalanobis)
+        self.correlation = CorrelationEngine() if cross_sensor else None
+        self.warm_up()
+    
+    def warm_up(self):
+        """Charge la fenêtre statistique de chaque capteur depuis la base (au démarrage uniquement)"""
+        start_ms = now_ms() - self.stats_window_ms
+        loaded = 0
+        for sensor_name in self.sensors:
+            try:
+                timestamps, values = self.db.get_sensor_series(
+                    sensor_name, limit=Config.ANOMALY_STATS_CAPACITY, start_time=start_ms
+                )
+                self._get_sensor_stats(sensor_name).load(timestamps, values)
+                loaded += len(values)
+            except Exception as e:
+                print(f"❌ Erreur de préchauffage des statistiques {sensor_name}: {e}")
+        print(f"📈 Statistiques glissantes préchauffées ({loaded} lectures)")
+        
+        if self.correlation is None:
+            return
+        try:
+            end_ms = now_ms()
+            span_ms = self.correlation.window_rows * self.correlation.slot_ms
+            self.correlation.load(self.db.get_readings_by_timerange(end_ms - span_ms, end_ms))
+        except Exception as e:
+            print(f"❌ Erreur de préchauffage des corrélations: {e}")
+    
+    def _get_sensor_stats(self, sensor_name: str) -> SlidingWindowStats:
+        stats = self.sensor_stats.get(sensor_name)
+        if stats is None:
+            stats = SlidingWindowStats(Config.ANOMALY_STATS_CAPACITY, self.stats_window_ms)
+            self.sensor_stats[sensor_name] = stats
+        return stats
+    
+    def set_simulation_mode(self, simulation: bool):
+        """En simulation, les pertes de communication ne sont signalées que sur opt-in (Config.COMM_LOSS_IN_SIMULATION)"""
+        self.communication.set_enabled(
+            Config.COMM_LOSS_DETECTION_ENABLED and (not simulation or Config.COMM_LOSS_IN_SIMULATION)
+        )
+    
+    @staticmethod
+    def _device_name(reading: Dict) -> str:
+        """Équipement émetteur d'une lecture (type de capteur du message, sinon le capteur lui-même)"""
+        return reading.get('sensor_type') or reading['sensor_name']
+    
+    def _z_threshold(self, sensor_name: str) -> float:
+        return self.thresholds[sensor_name].get('z_score', self.STATISTICAL_Z_THRESHOLD)
+    
+    @staticmethod
+    def _reading_ts_ms(reading: Dict) -> int:
+        """Horodatage d'une lecture en epoch ms (instant courant si absent)"""
+        if reading.get('ts_ms') is not None:
+            return int(reading['ts_ms'])
+        if reading.get('timestamp') is not None:
+            try:
+                return to_epoch_ms(reading['timestamp'])
+            except (TypeError, ValueError):
+                pass
+        return now_ms()
     
     def detect_all_anomalies(self, reading: Dict) -> List[Dict]:
         """Détecte toutes les anomalies pour une lecture de capteur"""
-        anomalies = []
-        sensor_name = reading['sensor_name']
+        if not self.cross_sensor:
+            return self._detect_sensor_anomalies(reading)
         
         # ✅ Mettre à jour la dernière communication
-        self.last_communication[sensor_name] = datetime.now()
+        self.communication.observe(self._device_name(reading))
+        
+        anomalies = self._detect_sensor_anomalies(reading)
+        
+        # Corrélations entre capteurs (créneau clos par cette lecture)
+        correlation_anomaly = self.detect_correlation_anomaly(reading)
+        if correlation_anomaly:
+            anomalies.append(correlation_anomaly)
+        return anomalies
+    
+    def _detect_sensor_anomalies(self, reading: Dict) -> List[Dict]:
+        """Contrôles propres au capteur de la lecture (seuils, z-score, dérive)"""
+        anomalies = []
+        sensor_name = reading['sensor_name']
         
         # Vérifier les anomalies de seuil
         threshold_anomaly = self.detect_threshold_anomaly(reading)
@@ -352,11 +458,164 @@ class AnomalyDetector:
         if statistical_anomaly:
             anomalies.append(statistical_anomaly)
         
+        # Détecteurs de dérive, sur l'état de la fenêtre glissante
+        anomalies.extend(self.detect_drift_anomalies(reading))
+        
+        # Intégrer la lecture à la fenêtre glissante et à l'historique en cache (après évaluation)
+        if sensor_name in self.thresholds:
+            ts_ms = self._reading_ts_ms(reading)
+            self._get_sensor_stats(sensor_name).push(reading['value'], ts_ms)
+            self.historical_data.append({
+                'sensor_name': sensor_name,
+                'value': reading['value'],
+                'unit': reading.get('unit'),
+                'ts_ms': ts_ms
+            })
+        
         # ❌ DÉSACTIVER les alertes de communication pour la simulation
         # Les alertes de communication ne sont pas pertinentes en mode simulation
         
         return anomalies
     
+    def detect_batch(self, readings: List[Dict], check_trend: bool = False) -> List[List[Dict]]:
+        """
+        Détection vectorisée pour un lot de lectures (message complet ou milliers de lignes).
+        Les lectures sont regroupées par capteur et les contrôles de seuil, de z-score
+        (et de tendance si `check_trend`) sont évalués en opérations NumPy.
+        Renvoie, pour chaque lecture, la même liste d'anomalies que l'appel successif de
+        detect_all_anomalies (et de detect_trend_anomaly), lectures du lot précédentes comprises.
+        """
+        results = self.detect_sensor_batch(readings, check_trend)
+        if self.cross_sensor:
+            for anomalies, cross_anomalies in zip(results, self.detect_cross_sensor(readings)):
+                anomalies.extend(cross_anomalies)
+        return results
+    
+    def detect_cross_sensor(self, readings: List[Dict]) -> List[List[Dict]]:
+        """Contrôles inter-capteurs d'un lot : cadence de communication et corrélations"""
+        for device in {self._device_name(reading) for reading in readings}:
+            self.communication.observe(device)
+        
+        # La matrice alignée est alimentée dans l'ordre d'arrivée du lot
+        results = [[] for _ in readings]
+        for index, reading in enumerate(readings):
+            correlation_anomaly = self.detect_correlation_anomaly(reading)
+            if correlation_anomaly:
+                results[index].append(correlation_anomaly)
+        return results
+    
+    def detect_sensor_batch(self, readings: List[Dict], check_trend: bool = False) -> List[List[Dict]]:
+        """
+        Contrôles propres à chaque capteur d'un lot (seuils, z-score, dérive, tendance) ;
+        ne dépend que de l'état des capteurs du lot, ce qui permet de répartir les capteurs
+        entre processus (voir detection_workers.py)
+        """
+        results = [[] for _ in readings]
+        groups = {}
+        for index, reading in enumerate(readings):
+            groups.setdefault(reading['sensor_name'], []).append(index)
+        
+        for sensor_name, indices in groups.items():
+            if len(indices) < self.VECTORIZE_MIN_GROUP:
+                for i in indices:
+                    trend_anomaly = self.detect_trend_anomaly(readings[i]) if check_trend and sensor_name in self.thresholds else None
+                    results[i] = self._detect_sensor_anomalies(readings[i])
+                    if trend_anomaly:
+                        results[i].append(trend_anomaly)
+                continue
+            
+            if sensor_name not in self.thresholds:
+                continue
+            
+            group = [readings[i] for i in indices]
+            values = np.fromiter((float(r['value']) for r in group), dtype=np.float64, count=len(group))
+            timestamps = np.fromiter((self._reading_ts_ms(r) for r in group), dtype=np.int64, count=len(group))
+            
+            # Seuils (le minimum est prioritaire, comme dans detect_threshold_anomaly)
+            threshold = self.thresholds[sensor_name]
+            low = values < threshold['min'] if 'min' in threshold else np.zeros(len(values), dtype=bool)
+            high = ~low & (values > threshold['max']) if 'max' in threshold else np.zeros(len(values), dtype=bool)
+            
+            # Trend : 5 lectures les plus récentes avant chaque valeur (historique en cache + lot)
+            if check_trend:
+                trend_rates, trend_flags = self._batch_trend(sensor_name, values)
+            else:
+                trend_rates, trend_flags = None, np.zeros(len(values), dtype=bool)
+            
+            # Z-score contre la fenêtre glissante telle qu'elle était avant chaque valeur
+            counts, means, stds = self._get_sensor_stats(sensor_name).evaluate_and_extend(timestamps, values)
+            valid = (counts >= 10) & (stds > 0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                z_scores = np.where(valid, np.abs(values - means) / np.where(valid, stds, 1.0), 0.0)
+            statistical = valid & (z_scores > self._z_threshold(sensor_name))
+            units = [reading['unit'] for reading in group]
+            drift = run_detectors(self.drift_detectors.get(sensor_name), values, units, counts, means, stds)
+            drift_flags = np.zeros(len(values), dtype=bool)
+            drift_flags[list(drift)] = True
+            
+            # Les dictionnaires ne sont construits que pour les lectures anormales
+            for k in np.flatnonzero(low | high | statistical | drift_flags | trend_flags):
+                reading = group[k]
+                anomalies = results[indices[k]]
+                value, unit = reading['value'], reading['unit']
+                if low[k]:
+                    anomalies.append({
+                        'sensor_name': sensor_name,
+                        'type': 'threshold_low',
+                        'message': f"{sensor_name} en dessous du seuil minimum: {value} {unit} < {threshold['min']} {unit}",
+                        'severity': 'high'
+                    })
+                elif high[k]:
+                    anomalies.append({
+                        'sensor_name': sensor_name,
+                        'type': 'threshold_high',
+                        'message': f"{sensor_name} au-dessus du seuil maximum: {value} {unit} > {threshold['max']} {unit}",
+                        'severity': 'high'
+                    })
+                if statistical[k]:
+                    anomalies.append({
+                        'sensor_name': sensor_name,
+                        'type': 'statistical_anomaly',
+                        'message': f"Valeur {value} {unit} statistiquement anormale pour {sensor_name} (z-score: {z_scores[k]:.2f})",
+                        'severity': 'medium'
+                    })
+                anomalies.extend(drift.get(k, ()))
+                if trend_flags[k]:
+                    rate_of_change = trend_rates[k]
+                    severity = 'low' if rate_of_change < 0.3 else 'medium' if rate_of_change < 0.5 else 'high'
+                    anomalies.append({
+                        'sensor_name': sensor_name,
+                        'type': 'trend_anomaly',
+                        'message': f"Variation rapide détectée ({rate_of_change*100:.1f}% de changement)",
+                        'severity': severity
+                    })
+            
+            self.historical_data.extend(sensor_name, [
+                {'sensor_name': sensor_name, 'value': reading['value'], 'unit': reading.get('unit'), 'ts_ms': int(ts_ms)}
+                for reading, ts_ms in zip(group, timestamps)
+            ])
+        
+        return results
+    
+    def _batch_trend(self, sensor_name: str, values: np.ndarray):
+        """Taux de variation de chaque valeur par rapport à la moyenne des 5 lectures précédentes"""
+        history = np.array([data['value'] for data in self._get_historical_data(sensor_name, hours=2)], dtype=np.float64)
+        combined = np.concatenate((history, values))
+        k = len(values)
+        rates = np.zeros(k)
+        flags = np.zeros(k, dtype=bool)
+        
+        first = max(0, 5 - len(history))     # premières valeurs ayant 5 lectures avant elles
+        if first >= k:
+            return rates, flags
+        windows = np.lib.stride_tricks.sliding_window_view(combined, 5)[len(history) + first - 5:len(history) + k - 5]
+        averages = windows.mean(axis=1)
+        varying = windows.max(axis=1) != windows.min(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rates[first:] = np.where(averages != 0, np.abs(values[first:] - averages) / np.where(averages != 0, averages, 1.0), 0.0)
+        flags[first:] = varying & (averages != 0) & (rates[first:] > self.TREND_CHANGE_THRESHOLD)
+        return rates, flags
+    
     def detect_threshold_anomaly(self, reading: Dict) -> Optional[Dict]:
         """Détecte les anomalies de dépassement de seuil"""
         sensor_name = reading['sensor_name']
@@ -393,15 +652,15 @@ class AnomalyDetector:
         if sensor_name not in self.thresholds:
             return None
         
-        # Récupérer les données historiques
-        historical_data = self._get_historical_data(sensor_name, hours=2)
-        if len(historical_data) < 10:  # Pas assez de données
+        # Statistiques de la fenêtre glissante (sans relire l'historique)
+        stats = self._get_sensor_stats(sensor_name)
+        stats.expire(self._reading_ts_ms(reading) - self.stats_window_ms)
+        if len(stats) < 10:  # Pas assez de données
             return None
         
-        # Calculer la moyenne et l'écart-type
-        values = [data['value'] for data in historical_data]
-        mean = np.mean(values)
-        std = np.std(values)
+        # Moyenne et écart-type courants
+        mean = stats.mean
+        std = stats.std
         
         if std == 0:  # Éviter la division par zéro
             return None
@@ -409,10 +668,8 @@ class AnomalyDetector:
         # Calculer le z-score
         z_score = abs(value - mean) / std
         
-        # Vérifier si le z-score dépasse le seuil (plus permissif)
-        threshold_z = 4.0  # Seuil plus élevé pour éviter trop d'alertes
-        
-        if z_score > threshold_z:
+        # Vérifier si le z-score dépasse le seuil configuré pour le capteur
+        if z_score > self._z_threshold(sensor_name):
             return {
                 'sensor_name': sensor_name,
                 'type': 'statistical_anomaly',
@@ -422,6 +679,21 @@ class AnomalyDetector:
         
         return None
     
+    def detect_drift_anomalies(self, reading: Dict) -> List[Dict]:
+        """Passe la lecture dans les détecteurs de dérive du capteur (état O(1), sans relire l'historique)"""
+        detectors = self.drift_detectors.get(reading['sensor_name'])
+        if not detectors:
+            return []
+        
+        stats = self._get_sensor_stats(reading['sensor_name'])
+        stats.expire(self._reading_ts_ms(reading) - self.stats_window_ms)
+        anomalies = []
+        for detector in detectors:
+            anomaly = detector.update(reading['value'], reading['unit'], len(stats), stats.mean, stats.std)
+            if anomaly:
+                anomalies.append(anomaly)
+        return anomalies
+    
     def detect_trend_anomaly(self, reading: Dict) -> Optional[Dict]:
         """Détecte les anomalies de tendance (changements rapides)"""
         sensor_name = reading['sensor_name']
@@ -432,8 +704,8 @@ class AnomalyDetector:
         if len(historical_data) < 5:  # Pas assez de données
             return None
         
-        # Calculer la tendance (pente)
-        recent_values = [data['value'] for data in historical_data[:5]]
+        # Calculer la tendance (pente) sur les 5 lectures les plus récentes (historique trié par date croissante)
+        recent_values = [data['value'] for data in historical_data[-5:]]
         if len(set(recent_values)) <= 1:  # Pas de variation
             return None
         
@@ -445,7 +717,7 @@ class AnomalyDetector:
         rate_of_change = abs(value - avg_recent) / avg_recent
         
         # Seuil de variation rapide (20%)
-        if rate_of_change > 0.2:
+        if rate_of_change > self.TREND_CHANGE_THRESHOLD:
             severity = 'low' if rate_of_change < 0.3 else 'medium' if rate_of_change < 0.5 else 'high'
             return {
                 'sensor_name': sensor_name,
@@ -456,32 +728,38 @@ class AnomalyDetector:
         
         return None
     
+    def detect_correlation_anomaly(self, reading: Dict) -> Optional[Dict]:
+        """Détecte les anomalies de corrélation entre capteurs (distance de Mahalanobis)"""
+        if self.correlation is None:
+            return None
+        return self.correlation.update(reading['sensor_name'], reading['value'], self._reading_ts_ms(reading))
+    
+    def get_correlation_stats(self) -> Optional[Dict]:
+        return self.correlation.get_stats() if self.correlation else None
+    
     def detect_communication_loss(self) -> List[Dict]:
         """
-        Détecte les pertes de communication (DÉSACTIVÉ en mode simulation)
-        Cette méthode peut être appelée périodiquement pour vérifier les communications
+        Détecte les pertes de communication (équipements silencieux au-delà de leur cadence apprise).
+        Appelée périodiquement ; son coût ne dépend que du nombre d'échéances expirées.
+        En simulation, ne renvoie rien sauf opt-in (voir set_simulation_mode).
         """
-        # ❌ DÉSACTIVÉ pour éviter les fausses alertes en simulation
-        return []
+        return self.communication.check()
+    
+    def get_communication_stats(self) -> Dict:
+        return self.communication.get_stats()
     
     def _get_historical_data(self, sensor_name: str, hours: int = 24) -> List[Dict]:
-        """Récupère les données historiques pour un capteur"""
-        # Utiliser le cache si disponible
-        cache_key = f"{sensor_name}_{hours}"
-        if cache_key in self.historical_data:
-            # Vérifier si les données sont récentes (moins de 5 minutes)
-            if datetime.now() - self.historical_data[cache_key]['timestamp'] < timedelta(minutes=5):
-                return self.historical_data[cache_key]['data']
-        
-        # Récupérer les données de la base
-        end_time = datetime.now()
-        start_time = end_time - timedelta(hours=hours)
-        data = self.db.get_readings_by_timerange(start_time, end_time, sensor_name)
-        
-        # Mettre en cache
-        self.historical_data[cache_key] = {
-            'timestamp': datetime.now(),
-            'data': data
-        }
+        """
+        Récupère les données historiques pour un capteur.
+        La base n'est lue qu'au premier accès : le cache est ensuite tenu à jour
+        par detect_all_anomalies et élagué au fil de la fenêtre.
+        """
+        def load():
+            end_ms = now_ms()
+            return self.db.get_readings_by_timerange(end_ms - hours * 3600 * 1000, end_ms, sensor_name)
         
-        return data
+        return self.historical_data.get(sensor_name, hours, load)
+    
+    def get_cache_stats(self) -> Dict:
+        """Compteurs du cache d'historique (succès, échecs, évictions)"""
+        return self.historical_data.get_stats()
@@ -0,0 +1,114 @@
+"""
+Tâches périodiques en arrière-plan (hors du chemin d'ingestion et des requêtes HTTP)
+"""
+import time
+import random
+import threading
+import traceback
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+
+class PeriodicJob:
+    """
+    Exécute `func` toutes les `interval_s` secondes (plus un délai aléatoire d'au plus
+    `jitter_s`, pour ne pas synchroniser les tâches entre elles) sur un thread démon.
+    `trigger()` avance la prochaine exécution. Une exécution ne chevauche jamais la
+    précédente ; les erreurs sont journalisées et n'arrêtent pas la tâche.
+    """
+    
+    def __init__(self, name: str, func: Callable[[], Optional[Dict]], interval_s: float,
+                 initial_delay_s: float = 0, jitter_s: float = 0):
+        self.name = name
+        self.func = func
+        self.interval_s = interval_s
+        self.initial_delay_s = initial_delay_s
+        self.jitter_s = jitter_s
+        self._stop = threading.Event()
+        self._wake = threading.Condition()
+        self._triggered = False     # Déclenchement en attente (protégé par _wake)
+        self._running = threading.Lock()
+        self._thread = None
+        self._status = {
+            'runs': 0,
+            'skipped': 0,
+            'errors': 0,
+            'last_run': None,
+            'last_duration_s': None,
+            'last_error': None,
+            'last_result': None
+        }
+    
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        print(f"⏱️ Tâche '{self.name}' démarrée (toutes les {self.interval_s:.0f} s)")
+    
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        with self._wake:
+            self._wake.notify_all()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+    
+    def trigger(self):
+        """Demande une exécution dès que possible (à la fin de l'exécution en cours le cas échéant)"""
+        with self._wake:
+            self._triggered = True
+            self._wake.notify_all()
+    
+    def run_once(self) -> Optional[Dict]:
+        """Exécution immédiate (synchrone) de la tâche ; ignorée si une exécution est en cours"""
+        if not self._running.acquire(blocking=False):
+            self._status['skipped'] += 1
+            return None
+        try:
+            return self._run()
+        finally:
+            self._running.release()
+    
+    def _run(self) -> Optional[Dict]:
+        started = time.perf_counter()
+        self._status['last_run'] = datetime.now().isoformat()
+        try:
+            result = self.func()
+            self._status['last_result'] = result
+            self._status['last_error'] = None
+            return result
+        except Exception as e:
+            self._status['errors'] += 1
+            self._status['last_error'] = str(e)
+            print(f"❌ Erreur tâche '{self.name}': {e}")
+            traceback.print_exc()
+            return None
+        finally:
+            self._status['runs'] += 1
+            self._status['last_duration_s'] = round(time.perf_counter() - started, 3)
+    
+    def _wait(self, timeout: float) -> bool:
+        """Attend `timeout` secondes ou un déclenchement ; True si la tâche est arrêtée"""
+        with self._wake:
+            # Un déclenchement arrivé pendant l'exécution précédente n'est pas perdu :
+            # l'indicateur est testé puis consommé sous le même verrou
+            self._wake.wait_for(lambda: self._triggered or self._stop.is_set(), timeout)
+            self._triggered = False
+        return self._stop.is_set()
+    
+    def _loop(self):
+        if self._wait(self.initial_delay_s):
+            return
+        while not self._stop.is_set():
+            self.run_once()
+            if self._wait(self.interval_s + random.uniform(0, self.jitter_s)):
+                break
+    
+    def get_status(self) -> Dict:
+        status = dict(self._status)
+        status['interval_s'] = self.interval_s
+        status['jitter_s'] = self.jitter_s
+        status['running'] = bool(self._thread and self._thread.is_alive())
+        status['busy'] = self._running.locked()
+        return status
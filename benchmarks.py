@@ -0,0 +1,384 @@
+"""
+Bancs d'essai de performance du système de fertigation
+
+Usage:
+    python benchmarks.py storage [--duration 5] [--readers 4] [--profiles durable throughput]
+    python benchmarks.py dashboard [--readings 1000000] [--iterations 50]
+    python benchmarks.py detection [--readings 20000] [--batch-sizes 1 100 10000]
+    python benchmarks.py workers [--readings 50000] [--max-workers 4]
+"""
+import os
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import threading
+from typing import Dict, List
+from config import Config
+from database import Database, get_pool, now_ms
+from dashboard_service import DashboardService
+from anomaly_detector import AnomalyDetector
+from detection_workers import DetectionWorkerPool
+
+# Mode historique (journal en rollback) utilisé comme référence
+ROLLBACK_BASELINE = {'journal_mode': 'DELETE', 'synchronous': 'FULL', 'busy_timeout': 5000}
+
+NPK_SENSORS = ['nitrogen', 'phosphorus', 'potassium', 'ph', 'conductivity',
+               'temperature', 'humidity', 'salinity']
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _npk_message() -> List[Dict]:
+    """Lectures d'un message NPK complet, comme envoyé par l'ESP32"""
+    return [
+        {'sensor_type': 'npk', 'sensor_name': name,
+         'value': round(random.uniform(Config.SENSOR_THRESHOLDS[name]['min'],
+                                       Config.SENSOR_THRESHOLDS[name]['max']), 2),
+         'unit': Config.SENSOR_THRESHOLDS[name]['unit']}
+        for name in NPK_SENSORS
+    ]
+
+
+def run_storage_profile(label, profile, duration, readers, seed_rows) -> Dict:
+    """Un écrivain (messages NPK) et `readers` lecteurs (tableau de bord) en parallèle"""
+    workdir = tempfile.mkdtemp(prefix='bench_storage_')
+    db_path = os.path.join(workdir, 'bench.db')
+    try:
+        get_pool(db_path, profile=profile)
+        db = Database(db_path)
+        
+        for _ in range(seed_rows // len(NPK_SENSORS)):
+            db.insert_sensor_readings(_npk_message())
+        
+        stop = threading.Event()
+        write_latencies, read_latencies = [], []
+        errors = []
+        
+        def writer():
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    db.insert_sensor_readings(_npk_message())
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                write_latencies.append(time.perf_counter() - started)
+        
+        def reader():
+            latencies = []
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    db.get_recent_readings(random.choice(NPK_SENSORS), 100)
+                    db.get_active_alerts(10)
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                latencies.append(time.perf_counter() - started)
+            read_latencies.extend(latencies)
+        
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        
+        stats = db.get_pool_stats()
+        return {
+            'profile': label,
+            'writes_per_s': len(write_latencies) / elapsed,
+            'rows_per_s': len(write_latencies) * len(NPK_SENSORS) / elapsed,
+            'write_p95_ms': _percentile(write_latencies, 95) * 1000,
+            'reads_per_s': len(read_latencies) / elapsed,
+            'read_p95_ms': _percentile(read_latencies, 95) * 1000,
+            'errors': len(errors),
+            'pool_wait_max_ms': stats['wait_time_max'] * 1000
+        }
+    finally:
+        get_pool(db_path).close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def benchmark_storage(args):
+    """Compare le débit lecture/écriture concurrent de chaque profil de stockage"""
+    profiles = [('rollback (référence)', ROLLBACK_BASELINE)]
+    profiles += [(name, name) for name in (args.profiles or Config.DATABASE_STORAGE_PROFILES)]
+    
+    print(f"🏁 Profils de stockage : 1 écrivain + {args.readers} lecteurs, {args.duration:.0f} s par profil")
+    results = []
+    for label, profile in profiles:
+        print(f"   ⏱️  {label}...")
+        results.append(run_storage_profile(label, profile, args.duration, args.readers, args.seed_rows))
+    
+    print()
+    print(f"{'profil':<22}{'écritures/s':>13}{'lignes/s':>11}{'p95 écr. ms':>13}"
+          f"{'lectures/s':>12}{'p95 lect. ms':>14}{'erreurs':>9}")
+    for r in results:
+        print(f"{r['profile']:<22}{r['writes_per_s']:>13.1f}{r['rows_per_s']:>11.0f}{r['write_p95_ms']:>13.2f}"
+              f"{r['reads_per_s']:>12.1f}{r['read_p95_ms']:>14.2f}{r['errors']:>9}")
+    return results
+
+
+def _seed_dashboard_database(db, readings):
+    """Remplit une base de test : `readings` lectures réparties sur tous les capteurs, alertes, maintenances"""
+    sensors = list(Config.SENSOR_THRESHOLDS.keys())
+    end_ms = now_ms()
+    step_ms = 10000
+    conn = db.get_connection()
+    try:
+        with conn:
+            conn.executemany('''
+                INSERT INTO sensor_readings (sensor_type, sensor_name, value, unit, ts_ms)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (
+                ('bench', sensors[i % len(sensors)], random.random() * 100,
+                 Config.SENSOR_THRESHOLDS[sensors[i % len(sensors)]]['unit'], end_ms - (readings - i) * step_ms)
+                for i in range(readings)
+            ))
+            conn.executemany('''
+                INSERT INTO alerts (sensor_name, alert_type, message, severity, is_active, created_at_ms)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (
+                (sensors[i % len(sensors)], 'threshold', 'Alerte de test', random.choice(['low', 'medium', 'high']),
+                 int(i % 10 == 0), end_ms - i * 60000)
+                for i in range(5000)
+            ))
+            conn.executemany('''
+                INSERT INTO maintenance_records (sensor_name, maintenance_type, description, scheduled_date, status)
+                VALUES (?, ?, ?, datetime('now', ?), ?)
+            ''', (
+                (sensors[i % len(sensors)], 'preventive_inspection', 'Maintenance de test', f'+{i} hours',
+                 'planned' if i % 3 == 0 else 'completed')
+                for i in range(300)
+            ))
+            conn.executemany('''
+                INSERT INTO predictions (sensor_name, failure_probability, confidence_score, created_at_ms)
+                VALUES (?, ?, ?, ?)
+            ''', (
+                (sensors[i % len(sensors)], random.random(), 0.9, end_ms - i * 3600000)
+                for i in range(len(sensors) * 50)
+            ))
+    finally:
+        conn.close()
+
+
+def legacy_dashboard_data(db) -> Dict:
+    """Collecte des données telle que la faisait dashboard() avant le service (référence)"""
+    recent_readings = {}
+    for sensor_name in Config.SENSOR_THRESHOLDS.keys():
+        readings = db.get_recent_readings(sensor_name, limit=1)
+        if readings:
+            recent_readings[sensor_name] = readings[0]
+    active_alerts = db.get_active_alerts(limit=5)
+    latest_predictions = db.get_latest_predictions()
+    planned_maintenance = db.get_maintenance_records(status='planned', limit=3)
+    all_active_alerts = db.get_active_alerts()
+    all_resolved_alerts = db.get_resolved_alerts()
+    stats = {
+        'sensors_count': len(Config.SENSOR_THRESHOLDS),
+        'active_alerts_count': len(all_active_alerts),
+        'resolved_alerts_count': len(all_resolved_alerts),
+        'total_alerts_count': len(all_active_alerts) + len(all_resolved_alerts),
+        'high_risk_sensors_count': sum(1 for p in latest_predictions if float(p.get('failure_probability', 0)) > 0.6),
+        'planned_maintenance_count': len(db.get_maintenance_records(status='planned'))
+    }
+    return {'recent_readings': recent_readings, 'active_alerts': active_alerts,
+            'latest_predictions': latest_predictions, 'planned_maintenance': planned_maintenance, 'stats': stats}
+
+
+def benchmark_dashboard(args):
+    """Latence de collecte des données du tableau de bord : boucle N+1 historique vs service agrégé"""
+    workdir = tempfile.mkdtemp(prefix='bench_dashboard_')
+    db_path = os.path.join(workdir, 'bench.db')
+    try:
+        db = Database(db_path)
+        print(f"🏗️  Génération de {args.readings} lectures...")
+        started = time.perf_counter()
+        _seed_dashboard_database(db, args.readings)
+        print(f"   ✅ {time.perf_counter() - started:.1f} s")
+        
+        service = DashboardService(db)
+        legacy, current = legacy_dashboard_data(db), service.get_dashboard_data()
+        if legacy['stats'] != current['stats'] or set(legacy['recent_readings']) != set(current['recent_readings']):
+            print("⚠️  Les deux versions ne renvoient pas les mêmes données")
+        
+        results = []
+        for label, collect in (('boucle N+1 (avant)', lambda: legacy_dashboard_data(db)),
+                               ('service agrégé', service.get_dashboard_data)):
+            latencies = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                collect()
+                latencies.append(time.perf_counter() - started)
+            results.append((label, latencies))
+        
+        print()
+        print(f"{'version':<22}{'moyenne ms':>12}{'p50 ms':>10}{'p95 ms':>10}")
+        for label, latencies in results:
+            print(f"{label:<22}{sum(latencies) / len(latencies) * 1000:>12.2f}"
+                  f"{_percentile(latencies, 50) * 1000:>10.2f}{_percentile(latencies, 95) * 1000:>10.2f}")
+        before, after = (sum(latencies) for _, latencies in results)
+        print(f"\n🚀 Accélération: x{before / after:.1f}")
+        return results
+    finally:
+        get_pool(db_path).close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _synthetic_readings(count, start_ms) -> List[Dict]:
+    """Lectures aléatoires autour du milieu de la plage de chaque capteur, avec quelques valeurs aberrantes"""
+    sensors = list(Config.SENSOR_THRESHOLDS.items())
+    readings = []
+    for i in range(count):
+        sensor_name, threshold = sensors[i % len(sensors)]
+        center = (threshold['min'] + threshold['max']) / 2
+        spread = (threshold['max'] - threshold['min']) / 10
+        value = center + random.gauss(0, spread) * (8 if random.random() < 0.01 else 1)
+        readings.append({'sensor_type': 'bench', 'sensor_name': sensor_name, 'value': round(value, 2),
+                         'unit': threshold['unit'], 'ts_ms': start_ms + i * 1000})
+    return readings
+
+
+def benchmark_detection(args):
+    """Coût par lecture de detect_all_anomalies (lecture par lecture) vs detect_batch selon la taille de lot"""
+    workdir = tempfile.mkdtemp(prefix='bench_detection_')
+    db_path = os.path.join(workdir, 'bench.db')
+    try:
+        db = Database(db_path)
+        start_ms = now_ms() - (args.readings + 2000) * 1000
+        warmup = _synthetic_readings(2000, start_ms)
+        readings = _synthetic_readings(args.readings, start_ms + 2000 * 1000)
+        
+        print(f"🔎 Détection sur {args.readings} lectures ({len(Config.SENSOR_THRESHOLDS)} capteurs)")
+        print(f"{'taille de lot':>14}{'unitaire µs/lect.':>20}{'lot µs/lect.':>15}{'accélération':>14}")
+        results = []
+        for batch_size in args.batch_sizes:
+            timings = {}
+            for mode in ('single', 'batch'):
+                detector = AnomalyDetector(db)
+                detector.detect_batch(warmup)
+                started = time.perf_counter()
+                for i in range(0, len(readings), batch_size):
+                    chunk = readings[i:i + batch_size]
+                    if mode == 'single':
+                        for reading in chunk:
+                            detector.detect_all_anomalies(reading)
+                    else:
+                        detector.detect_batch(chunk)
+                timings[mode] = (time.perf_counter() - started) / len(readings) * 1e6
+            results.append((batch_size, timings))
+            print(f"{batch_size:>14}{timings['single']:>20.2f}{timings['batch']:>15.2f}"
+                  f"{timings['single'] / timings['batch']:>13.1f}x")
+        return results
+    finally:
+        get_pool(db_path).close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_worker_pool(db_path, workers, warmup, readings, batch_size) -> Dict:
+    """Démarrage d'un pool (jusqu'aux résultats d'un premier lot) puis débit sur `readings`"""
+    done = threading.Condition()
+    processed = [0]
+    
+    def on_results(batch, anomalies):
+        with done:
+            processed[0] += len(batch)
+            done.notify_all()
+    
+    def wait_for(count):
+        with done:
+            done.wait_for(lambda: processed[0] >= count)
+    
+    pool = DetectionWorkerPool(on_results, workers=workers, db_path=db_path)
+    try:
+        started = time.perf_counter()
+        pool.start()
+        pool.submit(warmup)
+        wait_for(len(warmup))
+        startup_s = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        for i in range(0, len(readings), batch_size):
+            pool.submit(readings[i:i + batch_size])
+        wait_for(len(warmup) + len(readings))
+        elapsed = time.perf_counter() - started
+        stats = pool.get_stats()
+    finally:
+        pool.stop()
+    return {'workers': workers, 'startup_s': startup_s, 'readings_per_s': len(readings) / elapsed,
+            'dropped_readings': stats['dropped_readings']}
+
+
+def benchmark_workers(args):
+    """Débit (lectures/s) du pool de processus de détection pour 1…N processus"""
+    workdir = tempfile.mkdtemp(prefix='bench_workers_')
+    db_path = os.path.join(workdir, 'bench.db')
+    try:
+        db = Database(db_path)
+        start_ms = now_ms() - (args.readings + 4000) * 1000
+        db.insert_sensor_readings(_synthetic_readings(2000, start_ms))
+        warmup = _synthetic_readings(len(Config.SENSOR_THRESHOLDS), start_ms + 2000 * 1000)
+        readings = _synthetic_readings(args.readings, start_ms + 4000 * 1000)
+        # Lots assez gros pour ne jamais saturer les files des processus (aucune lecture écartée)
+        batch_size = max(args.batch_size, -(-len(readings) // (Config.DETECTION_WORKER_QUEUE_SIZE // 2)))
+        
+        print(f"⚙️ Pool de détection sur {args.readings} lectures (lots de {batch_size})")
+        print(f"{'processus':>10}{'démarrage s':>14}{'lectures/s':>14}{'accélération':>14}{'écartées':>10}")
+        results = []
+        for workers in range(1, args.max_workers + 1):
+            result = _run_worker_pool(db_path, workers, warmup, readings, batch_size)
+            results.append(result)
+            print(f"{workers:>10}{result['startup_s']:>14.2f}{result['readings_per_s']:>14.0f}"
+                  f"{result['readings_per_s'] / results[0]['readings_per_s']:>13.1f}x{result['dropped_readings']:>10}")
+        return results
+    finally:
+        get_pool(db_path).close_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bancs d\'essai de performance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    storage = subparsers.add_parser('storage', help='Débit concurrent des profils de stockage SQLite')
+    storage.add_argument('--duration', type=float, default=5.0, help='durée par profil (s)')
+    storage.add_argument('--readers', type=int, default=4, help='nombre de threads lecteurs')
+    storage.add_argument('--seed-rows', type=int, default=20000, help='lectures insérées avant la mesure')
+    storage.add_argument('--profiles', nargs='+', choices=list(Config.DATABASE_STORAGE_PROFILES),
+                         help='profils à comparer (défaut: tous)')
+    storage.set_defaults(func=benchmark_storage)
+    
+    dashboard = subparsers.add_parser('dashboard', help='Latence des données du tableau de bord')
+    dashboard.add_argument('--readings', type=int, default=1000000, help='lectures dans la base de test')
+    dashboard.add_argument('--iterations', type=int, default=50, help='chargements mesurés par version')
+    dashboard.set_defaults(func=benchmark_dashboard)
+    
+    detection = subparsers.add_parser('detection', help='Coût par lecture de la détection d\'anomalies')
+    detection.add_argument('--readings', type=int, default=20000, help='lectures traitées par mesure')
+    detection.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 100, 10000], help='tailles de lot')
+    detection.set_defaults(func=benchmark_detection)
+    
+    workers = subparsers.add_parser('workers', help='Débit du pool de processus de détection')
+    workers.add_argument('--readings', type=int, default=50000, help='lectures traitées par mesure')
+    workers.add_argument('--max-workers', type=int, default=os.cpu_count() or 1, help='nombre maximal de processus')
+    workers.add_argument('--batch-size', type=int, default=500, help='lectures par lot soumis')
+    workers.set_defaults(func=benchmark_workers)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
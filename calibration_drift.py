@@ -0,0 +1,106 @@
+"""
+Détection des dérives d'étalonnage
+Régression robuste de Theil–Sen sur les moyennes journalières (table sensor_rollups) :
+un décalage lent et régulier de la mesure, invisible pour les contrôles de z-score et
+de tendance, se traduit par une pente stable sur plusieurs semaines
+"""
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from database import get_database, now_ms
+
+DAY_MS = 86400 * 1000
+
+
+def theil_sen(x: np.ndarray, y: np.ndarray) -> Tuple[float, float, float]:
+    """
+    Pente et ordonnée de Theil–Sen (médianes des pentes de toutes les paires, calculées
+    d'un bloc) et part des paires dont la pente a le signe de la médiane (accord)
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    i, j = np.triu_indices(len(x), k=1)
+    dx = x[j] - x[i]
+    valid = dx != 0
+    slopes = (y[j] - y[i])[valid] / dx[valid]
+    if not len(slopes):
+        return 0.0, float(np.median(y)) if len(y) else 0.0, 0.0
+    slope = float(np.median(slopes))
+    intercept = float(np.median(y - slope * x))
+    agreement = float(np.mean(np.sign(slopes) == np.sign(slope))) if slope != 0 else 0.0
+    return slope, intercept, agreement
+
+
+class CalibrationDriftAnalyzer:
+    """
+    Pour chaque capteur, ajuste les moyennes journalières des CALIBRATION_DRIFT_WINDOW_DAYS
+    derniers jours. Une dérive est signalée quand le décalage cumulé sur la fenêtre dépasse
+    une fraction de la plage nominale du capteur et que les pentes des paires sont
+    majoritairement de même signe (tendance régulière, pas un saut isolé).
+    """
+    
+    def __init__(self, db=None):
+        self.db = db or get_database()
+        self.thresholds = Config.SENSOR_THRESHOLDS
+        self.window_days = Config.CALIBRATION_DRIFT_WINDOW_DAYS
+        self.min_days = Config.CALIBRATION_DRIFT_MIN_DAYS
+        self.min_daily_count = Config.CALIBRATION_DRIFT_MIN_DAILY_COUNT
+        self.min_offset_ratio = Config.CALIBRATION_DRIFT_MIN_OFFSET_RATIO
+        self.min_agreement = Config.CALIBRATION_DRIFT_MIN_AGREEMENT
+    
+    def daily_means(self, sensor_name: str, end_ms: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Jours (depuis l'époque) et moyennes journalières suffisamment fournies"""
+        rollups = self.db.get_rollups(sensor_name, 86400, end_ms - self.window_days * DAY_MS, end_ms)
+        rollups = [r for r in rollups if r['count'] >= self.min_daily_count]
+        days = np.array([r['bucket_start_ms'] / DAY_MS for r in rollups], dtype=np.float64)
+        means = np.array([r['mean_value'] for r in rollups], dtype=np.float64)
+        return days, means
+    
+    def analyze_sensor(self, sensor_name: str, end_ms: Optional[int] = None) -> Optional[Dict]:
+        """Estimation de la dérive d'un capteur (None si pas assez de jours)"""
+        end_ms = end_ms or now_ms()
+        days, means = self.daily_means(sensor_name, end_ms)
+        if len(days) < self.min_days:
+            return None
+        
+        slope, intercept, agreement = theil_sen(days, means)
+        span_days = float(days[-1] - days[0])
+        threshold = self.thresholds.get(sensor_name, {})
+        nominal_range = threshold.get('max', 0) - threshold.get('min', 0)
+        offset = slope * span_days
+        return {
+            'sensor_name': sensor_name,
+            'slope_per_day': slope,
+            'offset': offset,
+            'days': len(days),
+            'span_days': span_days,
+            'agreement': agreement,
+            'baseline': float(intercept + slope * days[0]),
+            'offset_ratio': abs(offset) / nominal_range if nominal_range > 0 else 0.0
+        }
+    
+    def detect(self, end_ms: Optional[int] = None) -> List[Dict]:
+        """Anomalies 'calibration_drift' de tous les capteurs"""
+        anomalies = []
+        for sensor_name, threshold in self.thresholds.items():
+            try:
+                estimate = self.analyze_sensor(sensor_name, end_ms)
+            except Exception as e:
+                print(f"❌ Erreur analyse d'étalonnage {sensor_name}: {e}")
+                continue
+            if (estimate is None or estimate['offset_ratio'] < self.min_offset_ratio
+                    or estimate['agreement'] < self.min_agreement):
+                continue
+            
+            unit = threshold.get('unit', '')
+            anomalies.append({
+                'sensor_name': sensor_name,
+                'type': 'calibration_drift',
+                'message': (f"Dérive d'étalonnage probable pour {sensor_name}: décalage estimé "
+                            f"{estimate['offset']:+.2f} {unit} sur {estimate['span_days']:.0f} jours "
+                            f"(pente {estimate['slope_per_day']:+.3f} {unit}/jour)"),
+                'severity': 'high' if estimate['offset_ratio'] >= 2 * self.min_offset_ratio else 'medium',
+                'offset': estimate['offset'],
+                'slope_per_day': estimate['slope_per_day']
+            })
+        return anomalies
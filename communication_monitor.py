@@ -0,0 +1,133 @@
+"""
+Détection des pertes de communication des équipements
+L'intervalle attendu de chaque équipement est appris à partir de sa cadence observée ;
+les échéances de silence sont tenues dans une roue temporelle, si bien qu'une vérification
+ne coûte que le nombre d'échéances expirées, quel que soit le nombre d'équipements
+"""
+import threading
+from typing import Dict, List, Optional
+from config import Config
+from database import now_ms
+from timer_wheel import TimerWheel
+
+
+class DeviceCadence:
+    """Intervalle moyen (EWMA) et écart absolu moyen entre deux communications d'un équipement"""
+    __slots__ = ('last_seen_ms', 'interval_ms', 'deviation_ms', 'samples', 'lost_since_ms')
+    # En dessous, deux lectures appartiennent au même envoi (ex. les 8 mesures du capteur NPK)
+    MIN_INTERVAL_MS = 500
+    
+    def __init__(self, ts_ms: int):
+        self.last_seen_ms = ts_ms
+        self.interval_ms = None
+        self.deviation_ms = 0.0
+        self.samples = 0
+        self.lost_since_ms = None
+    
+    def observe(self, ts_ms: int, alpha: float):
+        interval = ts_ms - self.last_seen_ms
+        self.last_seen_ms = max(self.last_seen_ms, ts_ms)
+        if interval < self.MIN_INTERVAL_MS:   # Même envoi (ou lectures désordonnées)
+            return
+        if self.interval_ms is None:
+            self.interval_ms = float(interval)
+        else:
+            self.deviation_ms += alpha * (abs(interval - self.interval_ms) - self.deviation_ms)
+            self.interval_ms += alpha * (interval - self.interval_ms)
+        self.samples += 1
+
+
+class CommunicationMonitor:
+    """
+    Échéance de chaque équipement = dernière communication + max(délai minimal,
+    facteur × intervalle appris + 4 × écart moyen). Une alerte est émise à l'expiration,
+    une seule par coupure ; la communication suivante réarme l'échéance.
+    """
+    
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.alpha = Config.COMM_LOSS_CADENCE_ALPHA
+        self.timeout_factor = Config.COMM_LOSS_TIMEOUT_FACTOR
+        self.min_timeout_ms = int(Config.COMM_LOSS_MIN_TIMEOUT_S * 1000)
+        self.default_interval_ms = int(Config.COMM_LOSS_DEFAULT_INTERVAL_S * 1000)
+        self.min_samples = Config.COMM_LOSS_MIN_SAMPLES
+        self.wheel = TimerWheel(tick_ms=int(Config.COMM_LOSS_TICK_S * 1000), slots=Config.COMM_LOSS_WHEEL_SLOTS)
+        self.devices: Dict[str, DeviceCadence] = {}
+        self._lock = threading.Lock()
+        self._stats = {'observations': 0, 'expired': 0, 'recovered': 0}
+    
+    def set_enabled(self, enabled: bool):
+        """Active/désactive la détection (ex. simulation sans opt-in) ; l'apprentissage continue"""
+        self.enabled = enabled
+    
+    def expected_interval_ms(self, device: str) -> Optional[float]:
+        cadence = self.devices.get(device)
+        if cadence is None or cadence.samples < self.min_samples:
+            return None
+        return cadence.interval_ms
+    
+    def timeout_ms(self, cadence: DeviceCadence) -> int:
+        if cadence.samples < self.min_samples:
+            interval, deviation = self.default_interval_ms, 0.0
+        else:
+            interval, deviation = cadence.interval_ms, cadence.deviation_ms
+        return int(max(self.min_timeout_ms, self.timeout_factor * interval + 4 * deviation))
+    
+    def observe(self, device: str, ts_ms: Optional[int] = None) -> Optional[int]:
+        """
+        Enregistre une communication de l'équipement et réarme son échéance.
+        Renvoie la durée de la coupure (ms) si l'équipement était considéré perdu.
+        """
+        ts_ms = ts_ms or now_ms()
+        recovered = None
+        with self._lock:
+            cadence = self.devices.get(device)
+            if cadence is None:
+                cadence = self.devices[device] = DeviceCadence(ts_ms)
+            else:
+                cadence.observe(ts_ms, self.alpha)
+            if cadence.lost_since_ms is not None:
+                recovered = ts_ms - cadence.lost_since_ms
+                cadence.lost_since_ms = None
+                self._stats['recovered'] += 1
+            self._stats['observations'] += 1
+            self.wheel.schedule(device, cadence.last_seen_ms + self.timeout_ms(cadence))
+        if recovered is not None and self.enabled:
+            print(f"📶 Communication rétablie avec {device} après {recovered / 1000:.0f} s")
+        return recovered
+    
+    def check(self, current_ms: Optional[int] = None) -> List[Dict]:
+        """Anomalies des équipements dont l'échéance est dépassée (coût O(expirés))"""
+        current_ms = current_ms or now_ms()
+        expired = self.wheel.advance(current_ms)
+        if not self.enabled:
+            return []
+        
+        anomalies = []
+        with self._lock:
+            for device, _ in expired:
+                cadence = self.devices.get(device)
+                # Communication reçue entre l'expiration et ce verrou : échéance déjà réarmée
+                if cadence is None or device in self.wheel:
+                    continue
+                cadence.lost_since_ms = cadence.last_seen_ms
+                self._stats['expired'] += 1
+                silence_s = (current_ms - cadence.last_seen_ms) / 1000
+                interval = cadence.interval_ms if cadence.samples >= self.min_samples else self.default_interval_ms
+                anomalies.append({
+                    'sensor_name': device,
+                    'type': 'communication_loss',
+                    'message': f"Perte de communication avec {device}: aucune donnée depuis {silence_s:.0f} s "
+                               f"(cadence attendue {interval / 1000:.0f} s)",
+                    'severity': 'high'
+                })
+        return anomalies
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['enabled'] = self.enabled
+            stats['devices'] = len(self.devices)
+            stats['scheduled'] = len(self.wheel)
+            stats['lost'] = sum(1 for cadence in self.devices.values() if cadence.lost_since_ms is not None)
+        return stats
@@ -73,6 +73,62 @@ class Config:
     # Configuration de la base de données
     DATABASE_PATH = os.path.join('data', 'fertigation.db')
     
+    # Pool de connexions SQLite (une connexion longue durée par thread)
+    DATABASE_POOL_SIZE = 8                       # connexions simultanées maximum
+    DATABASE_POOL_TIMEOUT = 10.0                 # secondes d'attente d'une connexion libre
+    DATABASE_POOL_HEALTH_CHECK_INTERVAL = 60.0   # secondes entre deux 'SELECT 1'
+    
+    # Profil de stockage SQLite appliqué à chaque connexion du pool
+    # - 'durable'    : WAL + synchronous=FULL, aucun commit perdu même en cas de coupure de courant
+    # - 'throughput' : WAL + synchronous=NORMAL + cache/mmap plus larges ; un arrêt brutal de
+    #                  l'OS peut perdre les derniers commits, mais la base reste cohérente
+    # Comparer les deux avec : python benchmarks.py storage
+    DATABASE_STORAGE_PROFILE = 'durable'
+    DATABASE_STORAGE_PROFILES = {
+        'durable': {
+            'journal_mode': 'WAL',
+            'synchronous': 'FULL',
+            'cache_size': -16000,       # en Kio (valeur négative) : 16 Mo
+            'mmap_size': 0,
+            'temp_store': 'MEMORY',
+            'busy_timeout': 5000        # ms
+        },
+        'throughput': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -64000,       # 64 Mo
+            'mmap_size': 268435456,     # 256 Mo
+            'temp_store': 'MEMORY',
+            'busy_timeout': 5000
+        }
+    }
+    
+    # Conversion en arrière-plan des anciens horodatages texte en epoch ms (lignes par transaction)
+    DATABASE_EPOCH_BACKFILL_CHUNK = 5000
+    
+    # Résolutions (secondes) des agrégats par intervalle tenus à jour à l'ingestion
+    SENSOR_ROLLUP_RESOLUTIONS = [60, 3600, 86400]
+    
+    # Demi-vie (heures) de l'oubli exponentiel des statistiques de tendance tenues à l'ingestion
+    # (None : régression sur tout l'historique) ; changer la valeur impose refresh_trend_stats()
+    TREND_HALF_LIFE_HOURS = 24 * 7
+    
+    # Vérifier au démarrage (EXPLAIN QUERY PLAN) que les requêtes critiques utilisent leurs index
+    DATABASE_CHECK_QUERY_PLANS = True
+    
+    # File d'ingestion asynchrone (écriture groupée des lectures)
+    INGEST_QUEUE_MAX_SIZE = 5000       # lectures en attente avant de refuser (HTTP 503)
+    INGEST_BATCH_SIZE = 200            # lectures par commit
+    INGEST_FLUSH_INTERVAL_MS = 250     # délai maximal avant écriture d'un lot partiel
+    INGEST_RETRY_AFTER = 2             # secondes suggérées au client en cas de saturation
+    INGEST_WRITE_RETRIES = 3           # réessais d'un lot après une erreur transitoire (base verrouillée)
+    INGEST_WRITE_RETRY_BACKOFF_MS = 100  # délai avant le premier réessai, doublé à chaque tentative
+    
+    # Pool de processus de détection (detection_workers.py), capteurs répartis par hachage du nom
+    DETECTION_WORKERS = 0                   # 0 : détection dans le thread d'ingestion
+    DETECTION_WORKER_QUEUE_SIZE = 64        # lots en attente par processus avant contre-pression
+    DETECTION_WORKER_START_METHOD = 'spawn' # pas de fork d'un serveur multi-thread
+    
     # Configuration MQTT
     MQTT_BROKER_HOST = 'localhost'
     MQTT_BROKER_PORT = 1883
@@ -162,6 +218,59 @@ class Config:
         }
     }
     
+    # Détecteurs de dérive par capteur (drift_detectors.DRIFT_DETECTORS) : {nom: paramètres}
+    # ewma : lambda_ (lissage), L (largeur des limites en σ)
+    # cusum : k (tolérance en σ), h (seuil d'alarme en σ)
+    # page_hinkley : delta (tolérance en σ), threshold (seuil λ), alpha (oubli)
+    SENSOR_DRIFT_DETECTORS = {
+        'ph': {
+            'ewma': {'lambda_': 0.2, 'L': 3.0},
+            'cusum': {'k': 0.5, 'h': 5.0}
+        },
+        'conductivity': {
+            'cusum': {'k': 0.5, 'h': 5.0}
+        },
+        'salinity': {
+            'page_hinkley': {'delta': 0.1, 'threshold': 20.0, 'alpha': 0.999}
+        },
+        'water_pressure': {
+            'cusum': {'k': 0.5, 'h': 4.0}
+        },
+        'water_flow': {
+            'ewma': {'lambda_': 0.1, 'L': 3.0}
+        }
+    }
+    
+    # Corrélations entre capteurs (correlation_engine.py) : lignes alignées par créneau de temps,
+    # distance de Mahalanobis par rapport à la fenêtre glissante des créneaux précédents
+    CORRELATION_SENSORS = list(SENSOR_THRESHOLDS)
+    CORRELATION_SLOT_MS = 10000             # un cycle complet du simulateur
+    CORRELATION_WINDOW_ROWS = 360           # 1 h de créneaux
+    CORRELATION_MIN_ROWS = 60               # créneaux nécessaires avant d'évaluer
+    CORRELATION_CHI2_QUANTILE = 0.999       # seuil sur d² (loi du χ², un degré par capteur)
+    CORRELATION_MAX_STALENESS_SLOTS = 3     # au-delà, la ligne est incomplète et ignorée
+    
+    # Pertes de communication (communication_monitor.py) : échéance par équipement déduite
+    # de sa cadence observée, tenue dans une roue temporelle
+    COMM_LOSS_DETECTION_ENABLED = True
+    COMM_LOSS_IN_SIMULATION = False         # opt-in explicite quand les données sont simulées
+    COMM_LOSS_CHECK_INTERVAL_S = 5          # fréquence de vérification des échéances
+    COMM_LOSS_TICK_S = 1                    # résolution de la roue temporelle
+    COMM_LOSS_WHEEL_SLOTS = 512             # un tour de roue ≈ 8,5 min
+    COMM_LOSS_CADENCE_ALPHA = 0.1           # lissage de l'intervalle appris
+    COMM_LOSS_TIMEOUT_FACTOR = 3.0          # silence toléré, en intervalles attendus
+    COMM_LOSS_MIN_TIMEOUT_S = 30
+    COMM_LOSS_DEFAULT_INTERVAL_S = 60       # tant que la cadence n'est pas apprise
+    COMM_LOSS_MIN_SAMPLES = 5               # intervalles observés avant d'utiliser la cadence apprise
+    
+    # Dérive d'étalonnage (calibration_drift.py) : Theil–Sen sur les moyennes journalières
+    CALIBRATION_DRIFT_INTERVAL_S = 6 * 3600     # fréquence de la tâche de fond
+    CALIBRATION_DRIFT_WINDOW_DAYS = 30
+    CALIBRATION_DRIFT_MIN_DAYS = 7              # jours exploitables nécessaires
+    CALIBRATION_DRIFT_MIN_DAILY_COUNT = 30      # lectures minimales pour retenir une journée
+    CALIBRATION_DRIFT_MIN_OFFSET_RATIO = 0.05   # décalage cumulé / plage nominale (max - min)
+    CALIBRATION_DRIFT_MIN_AGREEMENT = 0.75      # part des paires de jours de pente de même signe
+    
     # Paramètres de durée de vie des capteurs (pour la loi de Weibull)
     SENSOR_LIFE_PARAMETERS = {
         'nitrogen': {
@@ -226,6 +335,46 @@ class Config:
         }
     }
     
+    # Analyse prédictive en arrière-plan (predictive_scheduler.py) : seuls les capteurs dont
+    # les entrées de prédiction (tendance, paramètres de vie, âge) ont changé sont réanalysés, les autres au plus tard
+    # après PREDICTIVE_ANALYSIS_MAX_AGE_S (leur âge, donc leur probabilité, évolue)
+    PREDICTIVE_ANALYSIS_INTERVAL_S = 3600
+    PREDICTIVE_ANALYSIS_JITTER_S = 300
+    PREDICTIVE_ANALYSIS_MAX_AGE_S = 6 * 3600
+    PREDICTIVE_ANALYSIS_TREND_DIGITS = 3     # chiffres significatifs de pente/corrélation comparés entre analyses
+    PREDICTIVE_ANALYSIS_JOB_HISTORY = 100    # demandes d'analyse conservées pour le suivi
+    
+    # Ajustement des paramètres de vie sur l'historique (weibull_fitting.py), un jeu de
+    # paramètres par classe de capteurs (durées de vie de tous les capteurs de la classe mises
+    # en commun) ; à défaut de défaillances en nombre suffisant, SENSOR_LIFE_PARAMETERS est utilisé
+    WEIBULL_FIT_MIN_FAILURES = 3
+    # Classe de chaque capteur : modèle de sonde (sensor_type écrit à l'ingestion) ; un capteur
+    # absent de la table forme sa propre classe
+    WEIBULL_SENSOR_CLASSES = {
+        'nitrogen': 'npk_8in1',
+        'phosphorus': 'npk_8in1',
+        'potassium': 'npk_8in1',
+        'ph': 'npk_8in1',
+        'conductivity': 'npk_8in1',
+        'temperature': 'npk_8in1',
+        'humidity': 'npk_8in1',
+        'salinity': 'npk_8in1',
+        'water_level': 'water_level',
+        'water_temperature': 'water_level',
+        'water_flow': 'water_flow',
+        'water_pressure': 'water_flow'
+    }
+    WEIBULL_FIT_LOCATION = True             # estimer aussi γ (loi à 3 paramètres)
+    WEIBULL_FIT_LOCATION_GRID = 32          # valeurs de γ évaluées simultanément
+    # Maintenances terminées qui interrompent une durée de vie : défaillance observée
+    # (interventions correctives ou d'urgence saisies par l'utilisateur) ou remise à neuf
+    # sans défaillance (durée censurée). Les types créés automatiquement par
+    # schedule_maintenance (preventive_inspection, preventive_maintenance, urgent_maintenance,
+    # emergency_maintenance) découlent des prédictions elles-mêmes : ils ne comptent ni comme
+    # défaillances ni comme remises à neuf, pour ne pas boucler sur l'ajustement
+    WEIBULL_FAILURE_MAINTENANCE_TYPES = ['corrective', 'emergency']
+    WEIBULL_RENEWAL_MAINTENANCE_TYPES = ['preventive', 'predictive']
+    
     # Configuration des alertes
     ALERT_SEVERITIES = {
         'low': 1,
@@ -234,6 +383,27 @@ class Config:
         'critical': 4
     }
     
+    # Fenêtre glissante des statistiques de détection (moyenne / écart-type par capteur)
+    ANOMALY_STATS_WINDOW_HOURS = 2
+    ANOMALY_STATS_CAPACITY = 4096      # lectures conservées au maximum par capteur
+    ANOMALY_HISTORY_CACHE_MAX_ROWS = 50000   # lectures en cache d'historique, tous capteurs (LRU)
+    
+    # Ré-analyse de l'historique (anomaly_backfill.py)
+    ANOMALY_BACKFILL_CHUNK_SIZE = 100000     # lectures lues et analysées par lot
+    ANOMALY_BACKFILL_CHECKPOINT = 'anomaly_backfill'   # nom du point de contrôle (table backfill_checkpoints)
+    
+    # Dédoublonnage des alertes (alert_aggregator.py) : une anomalie répétée sur le même
+    # (capteur, type) dans la fenêtre incrémente l'alerte active au lieu d'en créer une autre
+    ALERT_SUPPRESSION_WINDOW_S = 900            # fenêtre par défaut (secondes)
+    ALERT_SUPPRESSION_WINDOWS = {               # par type d'alerte, ou par (capteur, type)
+        'threshold_low': 1800,
+        'threshold_high': 1800,
+        'statistical_anomaly': 600,
+        'trend_anomaly': 600,
+        'calibration_drift': 2 * 86400         # analyse périodique : les constats suivants s'y ajoutent
+    }
+    ALERT_OCCURRENCE_FLUSH_INTERVAL_MS = 2000   # écriture groupée des compteurs d'occurrences
+    
     # Configuration de la maintenance prédictive
     MAINTENANCE_THRESHOLDS = {
         'failure_probability_warning': 0.3,
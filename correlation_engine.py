@@ -0,0 +1,176 @@
+"""
+Détection d'anomalies de corrélation entre capteurs
+Les lectures sont alignées sur des créneaux de temps communs (dernière valeur connue de
+chaque capteur à la fin du créneau) ; chaque ligne de la matrice est comparée à la fenêtre
+glissante des lignes précédentes par la distance de Mahalanobis
+"""
+import math
+import numpy as np
+from scipy.stats import chi2
+from typing import Dict, Iterable, List, Optional
+from config import Config
+
+
+class CorrelationEngine:
+    """
+    Matrice glissante (créneaux × capteurs) dont la moyenne et la covariance sont tenues
+    à jour par ajout / retrait de rang 1 : le coût d'un créneau est en O(d²) (+ résolution
+    d'un système d×d), indépendant de la longueur de l'historique.
+    
+    Un créneau est clos à l'arrivée de la première lecture du créneau suivant : l'anomalie
+    éventuelle est renvoyée pour cette lecture.
+    """
+    
+    def __init__(self, sensors: Optional[List[str]] = None, slot_ms: Optional[int] = None,
+                 window_rows: Optional[int] = None, min_rows: Optional[int] = None,
+                 quantile: Optional[float] = None, max_staleness_slots: Optional[int] = None):
+        self.sensors = list(sensors or Config.CORRELATION_SENSORS)
+        self.index = {name: i for i, name in enumerate(self.sensors)}
+        self.slot_ms = slot_ms or Config.CORRELATION_SLOT_MS
+        self.window_rows = window_rows or Config.CORRELATION_WINDOW_ROWS
+        self.min_rows = min_rows or Config.CORRELATION_MIN_ROWS
+        self.quantile = quantile or Config.CORRELATION_CHI2_QUANTILE
+        self.max_staleness_slots = Config.CORRELATION_MAX_STALENESS_SLOTS if max_staleness_slots is None else max_staleness_slots
+        
+        d = len(self.sensors)
+        self._rows = np.empty((self.window_rows, d), dtype=np.float64)
+        self._start = 0
+        self.count = 0
+        self._shift = np.zeros(d)             # Recentrage des sommes (précision numérique)
+        self._sum = np.zeros(d)               # Σ (x - shift)
+        self._outer = np.zeros((d, d))        # Σ (x - shift)(x - shift)ᵀ
+        self._updates = 0
+        
+        self._latest = np.full(d, np.nan)     # Dernière valeur connue de chaque capteur
+        self._latest_slot = np.full(d, -1, dtype=np.int64)
+        self._slot = None
+        self._thresholds = {}                 # dimension -> seuil du χ² sur d²
+        self._stats = {'rows': 0, 'evaluated': 0, 'anomalies': 0, 'incomplete_rows': 0}
+    
+    def threshold(self, dimensions: int) -> float:
+        """Seuil sur la distance de Mahalanobis au carré (quantile du χ² à `dimensions` degrés)"""
+        if dimensions not in self._thresholds:
+            self._thresholds[dimensions] = float(chi2.ppf(self.quantile, dimensions))
+        return self._thresholds[dimensions]
+    
+    def update(self, sensor_name: str, value: float, ts_ms: int, evaluate: bool = True) -> Optional[Dict]:
+        """Intègre une lecture ; renvoie l'anomalie du créneau clos par cette lecture, le cas échéant"""
+        i = self.index.get(sensor_name)
+        if i is None:
+            return None
+        
+        slot = int(ts_ms) // self.slot_ms
+        anomaly = None
+        if self._slot is None:
+            self._slot = slot
+        elif slot > self._slot:
+            anomaly = self._close_slot(evaluate)
+            self._slot = slot
+        
+        self._latest[i] = float(value)
+        self._latest_slot[i] = max(self._latest_slot[i], slot)
+        return anomaly
+    
+    def load(self, readings: Iterable[Dict]):
+        """Préchauffage depuis des lectures chronologiques (sans évaluation)"""
+        for reading in readings:
+            if reading.get('ts_ms') is not None:
+                self.update(reading['sensor_name'], reading['value'], reading['ts_ms'], evaluate=False)
+    
+    def _close_slot(self, evaluate: bool) -> Optional[Dict]:
+        # Ligne alignée : capteurs tous vus récemment (sinon capteur muet, voir perte de communication)
+        if not (self._latest_slot >= self._slot - self.max_staleness_slots).all():
+            self._stats['incomplete_rows'] += 1
+            return None
+        row = self._latest.copy()
+        anomaly = self._evaluate(row) if evaluate and self.count >= self.min_rows else None
+        self._push(row)
+        return anomaly
+    
+    def mean(self) -> np.ndarray:
+        return self._shift + self._sum / self.count if self.count else np.full(len(self.sensors), np.nan)
+    
+    def covariance(self) -> np.ndarray:
+        """Covariance d'échantillon de la fenêtre"""
+        n = self.count
+        if n < 2:
+            return np.zeros((len(self.sensors), len(self.sensors)))
+        centered_mean = self._sum / n
+        return (self._outer - n * np.outer(centered_mean, centered_mean)) / (n - 1)
+    
+    def _evaluate(self, row: np.ndarray) -> Optional[Dict]:
+        self._stats['evaluated'] += 1
+        mean = self.mean()
+        cov = self.covariance()
+        
+        # Les capteurs constants sur la fenêtre sont exclus (covariance singulière)
+        variances = np.diag(cov)
+        active = variances > 1e-12 * (1.0 + mean * mean)
+        dimensions = int(active.sum())
+        if dimensions == 0:
+            return None
+        
+        delta = (row - mean)[active]
+        cov = cov[np.ix_(active, active)]
+        try:
+            solution = np.linalg.solve(cov, delta)
+        except np.linalg.LinAlgError:
+            solution = np.linalg.lstsq(cov, delta, rcond=None)[0]
+        distance2 = float(delta @ solution)
+        threshold = self.threshold(dimensions)
+        if not distance2 > threshold:
+            return None
+        
+        # Contribution de chaque capteur à la distance (leur somme vaut d²)
+        names = [name for name, keep in zip(self.sensors, active) if keep]
+        order = np.argsort(delta * solution)[::-1]
+        main = [names[k] for k in order[:2]]
+        self._stats['anomalies'] += 1
+        return {
+            'sensor_name': main[0],
+            'type': 'correlation_anomaly',
+            'message': (f"Corrélation anormale entre capteurs (distance de Mahalanobis "
+                        f"{math.sqrt(distance2):.2f} > {math.sqrt(threshold):.2f}), écarts principaux : {', '.join(main)}"),
+            'severity': 'high' if distance2 > 2 * threshold else 'medium',
+            'sensors': main
+        }
+    
+    def _push(self, row: np.ndarray):
+        if self.count == self.window_rows:
+            oldest = self._rows[self._start] - self._shift
+            self._sum -= oldest
+            self._outer -= np.outer(oldest, oldest)
+            self._start = (self._start + 1) % self.window_rows
+            self.count -= 1
+        elif self.count == 0:
+            self._shift = row.copy()
+        
+        self._rows[(self._start + self.count) % self.window_rows] = row
+        self.count += 1
+        centered = row - self._shift
+        self._sum += centered
+        self._outer += np.outer(centered, centered)
+        self._stats['rows'] += 1
+        
+        # Recalcul exact périodique (coût amorti O(d²) par ligne)
+        self._updates += 1
+        if self._updates >= self.window_rows:
+            self._recompute()
+    
+    def _recompute(self):
+        self._updates = 0
+        end = self._start + self.count
+        if end <= self.window_rows:
+            rows = self._rows[self._start:end]
+        else:
+            rows = np.concatenate((self._rows[self._start:], self._rows[:end - self.window_rows]))
+        self._shift = rows.mean(axis=0)
+        centered = rows - self._shift
+        self._sum = centered.sum(axis=0)
+        self._outer = centered.T @ centered
+    
+    def get_stats(self) -> Dict:
+        stats = dict(self._stats)
+        stats['window_rows'] = self.count
+        stats['sensors'] = len(self.sensors)
+        return stats
@@ -0,0 +1,109 @@
+"""
+Service de données du tableau de bord
+Regroupe en quelques requêtes agrégées ce que la page affiche : dernière valeur
+de chaque capteur, compteurs d'alertes et de maintenances, prédictions
+"""
+from typing import Dict, List
+from config import Config
+from database import get_database
+
+
+class DashboardService:
+    def __init__(self, db=None):
+        self.db = db or get_database()
+    
+    def get_latest_readings(self, conn, sensor_names: List[str]) -> Dict[str, Dict]:
+        """Dernière lecture de chaque capteur : une recherche d'index par capteur, en une requête"""
+        if not sensor_names:
+            return {}
+        
+        sensors = ', '.join('(?)' for _ in sensor_names)
+        rows = conn.execute(f'''
+            WITH sensors(name) AS (VALUES {sensors})
+            SELECT r.* FROM sensor_readings r
+            WHERE r.id IN (
+                SELECT (
+                    SELECT id FROM sensor_readings
+                    WHERE sensor_name = sensors.name
+                    ORDER BY ts_ms DESC
+                    LIMIT 1
+                ) FROM sensors
+            )
+        ''', list(sensor_names)).fetchall()
+        
+        return {row['sensor_name']: dict(row) for row in rows}
+    
+    def get_alert_stats(self, conn) -> Dict[str, int]:
+        """Compteurs d'alertes actives / résolues / totales en un seul parcours de l'index"""
+        row = conn.execute('''
+            SELECT COUNT(*) AS total,
+                   COALESCE(SUM(is_active = 1), 0) AS active,
+                   COALESCE(SUM(is_active = 0), 0) AS resolved
+            FROM alerts
+        ''').fetchone()
+        return {'active': row['active'], 'resolved': row['resolved'], 'total': row['total']}
+    
+    def get_active_alerts(self, conn, limit: int) -> List[Dict]:
+        """Dernières alertes actives, mises en forme pour l'affichage"""
+        alerts = []
+        for row in conn.execute('''
+            SELECT * FROM alerts
+            WHERE is_active = 1
+            ORDER BY created_at_ms DESC
+            LIMIT ?
+        ''', (limit,)).fetchall():
+            alert = dict(row)
+            alert['severity_class'] = self.db._get_severity_class(alert['severity'])
+            alert['severity_text'] = alert['severity'].upper()
+            alerts.append(alert)
+        return alerts
+    
+    def get_planned_maintenance(self, conn, limit: int):
+        """Prochaines maintenances planifiées et leur nombre total (COUNT(*) OVER avant LIMIT)"""
+        rows = conn.execute('''
+            SELECT *, COUNT(*) OVER () AS planned_total
+            FROM maintenance_records
+            WHERE status = 'planned'
+            ORDER BY scheduled_date DESC
+            LIMIT ?
+        ''', (limit,)).fetchall()
+        
+        records = []
+        for row in rows:
+            record = dict(row)
+            record.pop('planned_total')
+            record['status_class'] = self.db._get_status_class(record['status'])
+            records.append(record)
+        return records, (rows[0]['planned_total'] if rows else 0)
+    
+    def get_dashboard_data(self, alerts_limit=5, maintenance_limit=3) -> Dict:
+        """Toutes les données de la page tableau de bord, sur une seule connexion"""
+        sensor_names = list(Config.SENSOR_THRESHOLDS.keys())
+        
+        conn = self.db.get_connection()
+        try:
+            recent_readings = self.get_latest_readings(conn, sensor_names)
+            alert_stats = self.get_alert_stats(conn)
+            active_alerts = self.get_active_alerts(conn, alerts_limit)
+            planned_maintenance, planned_count = self.get_planned_maintenance(conn, maintenance_limit)
+        finally:
+            conn.close()
+        
+        latest_predictions = self.db.get_latest_predictions()
+        
+        stats = {
+            'sensors_count': len(sensor_names),
+            'active_alerts_count': alert_stats['active'],
+            'resolved_alerts_count': alert_stats['resolved'],
+            'total_alerts_count': alert_stats['total'],
+            'high_risk_sensors_count': sum(1 for p in latest_predictions if float(p.get('failure_probability', 0)) > 0.6),
+            'planned_maintenance_count': planned_count
+        }
+        
+        return {
+            'recent_readings': recent_readings,
+            'active_alerts': active_alerts,
+            'latest_predictions': latest_predictions,
+            'planned_maintenance': planned_maintenance,
+            'stats': stats
+        }
@@ -2,20 +2,611 @@
 Gestion de la base de données SQLite - Version corrigée avec chemin sécurisé
 """
 import sqlite3
+import json
 import hashlib
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+import time
+import atexit
+import threading
+from collections import deque
+from urllib.request import pathname2url
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from config import Config
+from downsampling import downsample_points
+from trend_statistics import SUM_FIELDS, update_trend_stats
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Levée lorsqu'aucune connexion du pool ne se libère à temps"""
+
+
+# Colonnes d'horodatage entier (millisecondes depuis l'epoch Unix, UTC) : table -> (colonne texte, colonne entière)
+EPOCH_MS_COLUMNS = {
+    'sensor_readings': ('timestamp', 'ts_ms'),
+    'alerts': ('created_at', 'created_at_ms'),
+    'predictions': ('created_at', 'created_at_ms'),
+}
+
+# Conversion SQL d'un horodatage texte (CURRENT_TIMESTAMP, donc UTC) en epoch ms ; 0 si illisible
+EPOCH_MS_FROM_TEXT = "COALESCE(CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER), 0)"
+
+# Conversion inverse, pour la colonne texte héritée : epoch ms -> horodatage UTC au format
+# de CURRENT_TIMESTAMP, millisecondes comprises
+TEXT_FROM_EPOCH_MS = "strftime('%Y-%m-%d %H:%M:%f', {column} / 1000.0, 'unixepoch')"
+
+
+def now_ms() -> int:
+    """Instant courant en millisecondes depuis l'epoch Unix"""
+    return int(time.time() * 1000)
+
+
+def to_epoch_ms(value) -> Optional[int]:
+    """
+    Convertit un instant en millisecondes depuis l'epoch.
+    Accepte un entier (déjà en ms), un datetime ou une chaîne ISO ;
+    un datetime sans fuseau est interprété en heure locale, comme datetime.now().
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return int(value.timestamp() * 1000)
+
+
+def epoch_ms_to_iso(value: int) -> str:
+    """Epoch ms -> chaîne ISO 8601 en UTC (interprétée correctement par `new Date()` côté navigateur)"""
+    return datetime.fromtimestamp(value / 1000, tz=timezone.utc).isoformat()
+
+
+# Agrégats par intervalle : mise à jour incrémentale (les colonnes de droite sont les anciennes valeurs)
+ROLLUP_UPSERT = '''
+    INSERT INTO sensor_rollups
+    (sensor_name, resolution_s, bucket_start_ms, min_value, max_value, sum_value, count, last_value, last_ts_ms)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (sensor_name, resolution_s, bucket_start_ms) DO UPDATE SET
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value),
+        sum_value = sum_value + excluded.sum_value,
+        count = count + excluded.count,
+        last_value = CASE WHEN excluded.last_ts_ms >= last_ts_ms THEN excluded.last_value ELSE last_value END,
+        last_ts_ms = MAX(last_ts_ms, excluded.last_ts_ms)
+'''
+
+
+# Métadonnées par capteur (première/dernière lecture, nombre de lectures) : mise à jour incrémentale
+SENSOR_METADATA_UPSERT = '''
+    INSERT INTO sensor_metadata (sensor_name, first_ts_ms, last_ts_ms, reading_count, last_value)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (sensor_name) DO UPDATE SET
+        first_ts_ms = MIN(first_ts_ms, excluded.first_ts_ms),
+        last_value = CASE WHEN excluded.last_ts_ms >= last_ts_ms THEN excluded.last_value ELSE last_value END,
+        last_ts_ms = MAX(last_ts_ms, excluded.last_ts_ms),
+        reading_count = reading_count + excluded.reading_count
+'''
+
+# Recalcul complet depuis sensor_readings (la première lecture connue est conservée après une purge)
+SENSOR_METADATA_REFRESH = f'''
+    INSERT INTO sensor_metadata (sensor_name, first_ts_ms, last_ts_ms, reading_count, last_value)
+    SELECT sensor_name, MIN(ts), MAX(ts), COUNT(*), MAX(CASE WHEN rn = 1 THEN value END)
+    FROM (
+        SELECT sensor_name, value, ts,
+               ROW_NUMBER() OVER (PARTITION BY sensor_name ORDER BY ts DESC) AS rn
+        FROM (SELECT sensor_name, value, COALESCE(ts_ms, {EPOCH_MS_FROM_TEXT.format(column='timestamp')}) AS ts
+              FROM sensor_readings)
+    )
+    GROUP BY sensor_name
+    ON CONFLICT (sensor_name) DO UPDATE SET
+        first_ts_ms = MIN(first_ts_ms, excluded.first_ts_ms),
+        last_ts_ms = excluded.last_ts_ms,
+        reading_count = excluded.reading_count,
+        last_value = excluded.last_value
+'''
+
+
+def aggregate_sensor_metadata(rows) -> List[tuple]:
+    """Agrège un lot de lectures (sensor_name, value, ts_ms) par capteur pour SENSOR_METADATA_UPSERT"""
+    sensors = {}
+    for sensor_name, value, ts_ms in rows:
+        entry = sensors.get(sensor_name)
+        if entry is None:
+            sensors[sensor_name] = [ts_ms, ts_ms, 1, float(value)]
+        else:
+            entry[0] = min(entry[0], ts_ms)
+            entry[2] += 1
+            if ts_ms >= entry[1]:
+                entry[1], entry[3] = ts_ms, float(value)
+    return [(sensor_name,) + tuple(entry) for sensor_name, entry in sensors.items()]
+
+
+TREND_STATS_COLUMNS = ('sensor_name', 'origin_ms', 'ref_ms', 'reading_count') + SUM_FIELDS
+
+TREND_STATS_REPLACE = f'''
+    INSERT OR REPLACE INTO sensor_trend_stats ({', '.join(TREND_STATS_COLUMNS)})
+    VALUES ({', '.join(':' + column for column in TREND_STATS_COLUMNS)})
+'''
+
+
+def apply_trend_stats(cursor, rows, half_life_hours=None):
+    """
+    Ajoute un lot de lectures (sensor_name, value, ts_ms) aux statistiques de tendance de
+    leurs capteurs ; à appeler dans la transaction d'écriture du lot
+    """
+    half_life_hours = half_life_hours if half_life_hours is not None else Config.TREND_HALF_LIFE_HOURS
+    series = {}
+    for sensor_name, value, ts_ms in rows:
+        timestamps, values = series.setdefault(sensor_name, ([], []))
+        timestamps.append(ts_ms)
+        values.append(float(value))
+    if not series:
+        return
+    
+    placeholders = ','.join('?' * len(series))
+    existing = {
+        row[0]: dict(zip(TREND_STATS_COLUMNS, row))
+        for row in cursor.execute(
+            f'SELECT {", ".join(TREND_STATS_COLUMNS)} FROM sensor_trend_stats WHERE sensor_name IN ({placeholders})',
+            list(series)
+        ).fetchall()
+    }
+    cursor.executemany(TREND_STATS_REPLACE, [
+        dict(update_trend_stats(existing.get(sensor_name), timestamps, values, half_life_hours), sensor_name=sensor_name)
+        for sensor_name, (timestamps, values) in series.items()
+    ])
+
+
+def aggregate_rollups(rows, resolutions=None) -> List[tuple]:
+    """
+    Agrège un lot de lectures (sensor_name, value, ts_ms) par capteur et par intervalle
+    pour chaque résolution ; renvoie les lignes à passer à ROLLUP_UPSERT.
+    """
+    resolutions = resolutions or Config.SENSOR_ROLLUP_RESOLUTIONS
+    buckets = {}
+    for sensor_name, value, ts_ms in rows:
+        value = float(value)
+        for resolution_s in resolutions:
+            key = (sensor_name, resolution_s, ts_ms - ts_ms % (resolution_s * 1000))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [value, value, value, 1, value, ts_ms]
+            else:
+                bucket[0] = min(bucket[0], value)
+                bucket[1] = max(bucket[1], value)
+                bucket[2] += value
+                bucket[3] += 1
+                if ts_ms >= bucket[5]:
+                    bucket[4], bucket[5] = value, ts_ms
+    return [key + tuple(bucket) for key, bucket in buckets.items()]
+
+
+# Ordre d'application des pragmas d'un profil de stockage
+STORAGE_PRAGMAS = ('busy_timeout', 'journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store')
+# Pragmas qui écrivent dans le fichier, ignorés sur une connexion en lecture seule
+WRITE_PRAGMAS = ('journal_mode', 'synchronous')
+
+
+def get_storage_profile(name=None) -> Dict:
+    """Retourne les pragmas du profil de stockage demandé (par défaut celui de la configuration)"""
+    name = name or Config.DATABASE_STORAGE_PROFILE
+    if name not in Config.DATABASE_STORAGE_PROFILES:
+        raise ValueError(f"Profil de stockage inconnu: {name} "
+                         f"(disponibles: {', '.join(Config.DATABASE_STORAGE_PROFILES)})")
+    return Config.DATABASE_STORAGE_PROFILES[name]
+
+
+def apply_storage_profile(conn, profile: Dict, read_only: bool = False):
+    """Applique les pragmas d'un profil de stockage à une connexion"""
+    for pragma in STORAGE_PRAGMAS:
+        if pragma in profile and not (read_only and pragma in WRITE_PRAGMAS):
+            conn.execute(f'PRAGMA {pragma} = {profile[pragma]}').fetchall()
+
+
+class QueryPlanRegression(RuntimeError):
+    """Levée lorsqu'une requête critique retombe sur un parcours complet de table"""
+
+
+# Requêtes critiques vérifiées par EXPLAIN QUERY PLAN : nom -> (requête, paramètres d'exemple)
+# ⚠️ Garder synchronisé avec les méthodes correspondantes de Database
+HOT_QUERIES = {
+    'recent_readings_by_sensor': ('''
+        SELECT * FROM sensor_readings
+        WHERE sensor_name = ?
+        ORDER BY ts_ms DESC
+        LIMIT ?
+    ''', ('ph', 100)),
+    'recent_readings': ('''
+        SELECT * FROM sensor_readings
+        ORDER BY ts_ms DESC
+        LIMIT ?
+    ''', (100,)),
+    'readings_by_timerange': ('''
+        SELECT * FROM sensor_readings
+        WHERE sensor_name = ? AND ts_ms BETWEEN ? AND ?
+        ORDER BY ts_ms ASC
+    ''', ('ph', 0, 4102444800000)),
+    'active_alerts': ('''
+        SELECT * FROM alerts
+        WHERE is_active = 1
+        ORDER BY created_at_ms DESC
+    ''', ()),
+    'sensor_rollups': ('''
+        SELECT * FROM sensor_rollups
+        WHERE sensor_name = ? AND resolution_s = ? AND bucket_start_ms BETWEEN ? AND ?
+        ORDER BY bucket_start_ms ASC
+    ''', ('ph', 60, 0, 4102444800000)),
+    # created_at_ms n'est jamais NULL dans predictions (migration 12) : la jointure sur le MAX est exacte
+    'latest_predictions': ('''
+        SELECT p1.* FROM predictions p1
+        INNER JOIN (
+            SELECT sensor_name, MAX(created_at_ms) as max_date
+            FROM predictions
+            GROUP BY sensor_name
+        ) p2 ON p1.sensor_name = p2.sensor_name AND p1.created_at_ms = p2.max_date
+    ''', ()),
+}
+
+
+class PooledConnection:
+    """
+    Enveloppe d'une connexion SQLite appartenant au pool.
+    close() rend la connexion au pool au lieu de la fermer, ce qui permet
+    au code existant (conn = get_connection() ... conn.close()) de rester inchangé.
+    """
+    
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, tb):
+        return self._conn.__exit__(exc_type, exc_value, tb)
+    
+    def close(self):
+        """Rend la connexion au pool (idempotent)"""
+        if not self._released:
+            self._released = True
+            self._pool.release(self._conn)
+
+
+class ConnectionPool:
+    """
+    Pool de connexions SQLite à affinité de thread.
+    
+    Chaque thread réutilise de préférence « sa » connexion longue durée ; si elle
+    est prise ou inexistante, il emprunte une connexion inactive, en crée une
+    nouvelle tant que la taille maximale n'est pas atteinte, ou attend qu'une
+    connexion soit rendue (jusqu'à `timeout` secondes).
+    """
+    
+    def __init__(self, db_path, size=None, timeout=None, health_check_interval=None, profile=None,
+                 read_only=False):
+        self.db_path = db_path
+        self.read_only = read_only   # Connexions ouvertes en mode=ro (processus de détection)
+        # Profil : nom d'un préréglage de Config.DATABASE_STORAGE_PROFILES ou dictionnaire de pragmas
+        if isinstance(profile, dict):
+            self.profile_name, self.profile = 'custom', profile
+        else:
+            self.profile_name = profile or Config.DATABASE_STORAGE_PROFILE
+            self.profile = get_storage_profile(self.profile_name)
+        self.size = size or Config.DATABASE_POOL_SIZE
+        self.timeout = timeout if timeout is not None else Config.DATABASE_POOL_TIMEOUT
+        self.health_check_interval = (health_check_interval if health_check_interval is not None
+                                      else Config.DATABASE_POOL_HEALTH_CHECK_INTERVAL)
+        
+        self._lock = threading.Condition(threading.Lock())
+        self._local = threading.local()
+        self._idle = []          # Connexions disponibles
+        self._all = set()        # Toutes les connexions ouvertes
+        self._in_use = {}        # id(conn) -> [thread propriétaire, nombre d'emprunts imbriqués]
+        self._last_check = {}    # id(conn) -> dernier contrôle de santé
+        self._waiters = deque()  # Demandeurs en attente (FIFO)
+        self._closed = False
+        
+        self._stats = {
+            'requests': 0,
+            'thread_hits': 0,
+            'idle_reuses': 0,
+            'created': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0,
+            'health_check_failures': 0
+        }
+    
+    def _create_connection(self):
+        if self.read_only:
+            uri = f'file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_storage_profile(conn, self.profile, self.read_only)
+        self._all.add(conn)
+        self._last_check[id(conn)] = time.monotonic()
+        self._stats['created'] += 1
+        return conn
+    
+    def _discard(self, conn):
+        self._all.discard(conn)
+        self._last_check.pop(id(conn), None)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    
+    def _check_due(self, conn):
+        """La connexion n'a pas été contrôlée récemment (appelé sous le verrou)"""
+        return time.monotonic() - self._last_check.get(id(conn), 0) >= self.health_check_interval
+    
+    def _is_healthy(self, conn):
+        """Contrôle d'une connexion empruntée, hors du verrou du pool (la requête peut attendre)"""
+        try:
+            conn.execute('SELECT 1').fetchone()
+        except sqlite3.Error:
+            return False
+        with self._lock:
+            self._last_check[id(conn)] = time.monotonic()
+        return True
+    
+    def _drop_borrowed(self, conn):
+        """Ferme une connexion empruntée défaillante ; un demandeur en attente reçoit une connexion neuve"""
+        with self._lock:
+            self._stats['health_check_failures'] += 1
+            self._in_use.pop(id(conn), None)
+            if getattr(self._local, 'conn', None) is conn:
+                self._local.conn = None
+            self._discard(conn)
+            if self._waiters and not self._closed:
+                self._waiters.popleft()['conn'] = self._create_connection()
+                self._lock.notify_all()
+    
+    def acquire(self):
+        """Emprunte une connexion au pool (contrôlée si nécessaire, hors du verrou)"""
+        while True:
+            conn, check = self._borrow()
+            if not check or self._is_healthy(conn):
+                return conn
+            self._drop_borrowed(conn)
+    
+    def _borrow(self):
+        """Réserve une connexion ; renvoie (connexion, contrôle de santé à faire)"""
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Le pool de connexions est fermé")
+            
+            self._stats['requests'] += 1
+            own = getattr(self._local, 'conn', None)
+            
+            thread_id = threading.get_ident()
+            
+            # Appel imbriqué dans le même thread : partager la connexion déjà empruntée
+            borrowed = self._in_use.get(id(own)) if own is not None else None
+            if borrowed is not None and borrowed[0] == thread_id:
+                borrowed[1] += 1
+                self._stats['thread_hits'] += 1
+                return own, False
+            
+            # Connexion du thread toujours disponible
+            if own is not None and own in self._idle:
+                self._idle.remove(own)
+                self._in_use[id(own)] = [thread_id, 1]
+                self._stats['thread_hits'] += 1
+                return own, self._check_due(own)
+            
+            if self._idle:
+                conn = self._idle.pop()
+                self._stats['idle_reuses'] += 1
+                return self._checkout(conn), self._check_due(conn)
+            
+            if len(self._all) < self.size:
+                return self._checkout(self._create_connection()), False
+            
+            # Pool saturé : file d'attente FIFO, la connexion rendue est remise
+            # directement au plus ancien demandeur (pas de famine par affinité)
+            slot = {'conn': None}
+            self._waiters.append(slot)
+            self._stats['waits'] += 1
+            started = time.monotonic()
+            while slot['conn'] is None:
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0 or self._closed:
+                    self._waiters.remove(slot)
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"Aucune connexion disponible après {self.timeout}s (taille du pool: {self.size})"
+                    )
+                self._lock.wait(remaining)
+            
+            waited = time.monotonic() - started
+            self._stats['wait_time_total'] += waited
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], waited)
+            return self._checkout(slot['conn']), self._check_due(slot['conn'])
+    
+    def _checkout(self, conn):
+        self._in_use[id(conn)] = [threading.get_ident(), 1]
+        self._local.conn = conn
+        return conn
+    
+    def release(self, conn):
+        """Rend une connexion au pool"""
+        with self._lock:
+            borrowed = self._in_use.get(id(conn))
+            if borrowed is None:
+                return
+            if borrowed[1] > 1:
+                borrowed[1] -= 1
+                return
+            
+            del self._in_use[id(conn)]
+            
+            if self._closed:
+                self._discard(conn)
+                return
+            
+            # Ne jamais rendre une transaction entamée (ex: exception avant commit)
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                self._discard(conn)
+                if self._waiters:
+                    self._waiters.popleft()['conn'] = self._create_connection()
+                    self._lock.notify_all()
+                return
+            
+            if self._waiters:
+                self._waiters.popleft()['conn'] = conn
+                self._lock.notify_all()
+            else:
+                self._idle.append(conn)
+    
+    def connection(self):
+        """Retourne une connexion empruntée, à rendre via close()"""
+        return PooledConnection(self, self.acquire())
+    
+    def close_all(self):
+        """Ferme toutes les connexions inactives et refuse les nouveaux emprunts"""
+        with self._lock:
+            self._closed = True
+            for conn in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._lock.notify_all()
+    
+    def get_stats(self) -> Dict:
+        """Statistiques d'utilisation du pool"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['storage_profile'] = self.profile_name
+            stats['read_only'] = self.read_only
+            stats['open_connections'] = len(self._all)
+            stats['in_use'] = len(self._in_use)
+            stats['idle'] = len(self._idle)
+            stats['waiting'] = len(self._waiters)
+            # Toute demande servie sans ouvrir de nouvelle connexion est un « hit »
+            hits = stats['requests'] - stats['created'] - stats['timeouts']
+            stats['hit_rate'] = hits / stats['requests'] if stats['requests'] else 0.0
+            stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+            return stats
+
+
+# Un pool par fichier de base de données, partagé par toutes les instances de Database
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path, profile=None, read_only=False) -> ConnectionPool:
+    """
+    Retourne le pool associé à un fichier de base de données (un pool distinct en lecture seule).
+    Le profil de stockage n'est pris en compte qu'à la création du pool.
+    """
+    key = (os.path.abspath(db_path), read_only)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(db_path, profile=profile, read_only=read_only)
+            _pools[key] = pool
+        return pool
+
+
+def close_all_pools():
+    """Ferme proprement tous les pools (appelé à l'arrêt du processus)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+atexit.register(close_all_pools)
+
+
+# Schéma initialisé une seule fois par processus et par fichier
+_schema_ready = set()
+_epoch_backfills = {}        # Fichier -> état de la conversion des horodatages ('running' / 'done')
+_schema_lock = threading.Lock()
+
+# Instances partagées renvoyées par get_database()
+_shared_databases = {}
+_shared_lock = threading.Lock()
+
+
+def get_database(db_path=None) -> 'Database':
+    """Retourne l'instance Database partagée du processus pour ce fichier"""
+    if db_path is None:
+        db_path = os.path.join('data', 'fertigation.db')
+    key = os.path.abspath(db_path)
+    with _shared_lock:
+        database = _shared_databases.get(key)
+        if database is None:
+            database = Database(db_path)
+            _shared_databases[key] = database
+        return database
+
 
 class Database:
+    # Migrations versionnées (PRAGMA user_version) : (version, description, méthode)
+    MIGRATIONS = [
+        (1, 'schéma initial', '_migration_001_initial_schema'),
+        (2, 'index des séries temporelles et des alertes', '_migration_002_time_series_indexes'),
+        (3, 'horodatages entiers (epoch ms)', '_migration_003_epoch_ms_timestamps'),
+        (4, 'agrégats par intervalle (1 min / 1 h / 1 jour)', '_migration_004_sensor_rollups'),
+        (5, 'occurrences des alertes (dédoublonnage)', '_migration_005_alert_occurrences'),
+        (6, 'métadonnées par capteur (âge, nombre de lectures)', '_migration_006_sensor_metadata'),
+        (7, 'paramètres de Weibull ajustés sur l\'historique', '_migration_007_weibull_parameters'),
+        (8, 'statistiques de tendance incrémentales', '_migration_008_trend_stats'),
+        (9, 'réajustement de Weibull (types de défaillance corrigés)', '_migration_009_refit_weibull_parameters'),
+        (10, 'points de contrôle de la ré-analyse', '_migration_010_backfill_checkpoints'),
+        (11, 'paramètres de Weibull par classe de capteurs', '_migration_011_weibull_class_parameters'),
+        (12, 'horodatages entiers des prédictions (conversion immédiate)', '_migration_012_predictions_epoch_ms'),
+    ]
+    
     def __init__(self, db_path=None):
         # ✅ Chemin par défaut sécurisé
         if db_path is None:
             db_path = os.path.join('data', 'fertigation.db')
         
         self.db_path = db_path
-        self.ensure_db_exists()
-        self.init_database()
+        self.pool = get_pool(self.db_path)
+        self.ensure_schema()
+    
+    @classmethod
+    def open_read_only(cls, db_path=None) -> 'Database':
+        """
+        Accès en lecture seule à une base déjà initialisée par le processus principal, pour
+        les processus de détection : ni migrations, ni EXPLAIN QUERY PLAN, ni conversion des
+        horodatages en arrière-plan ; toute écriture lève sqlite3.OperationalError.
+        """
+        database = cls.__new__(cls)
+        database.db_path = db_path or os.path.join('data', 'fertigation.db')
+        database.pool = get_pool(database.db_path, read_only=True)
+        return database
+    
+    def ensure_schema(self):
+        """Initialise le schéma au premier usage du fichier dans ce processus"""
+        key = os.path.abspath(self.db_path)
+        if key in _schema_ready:
+            return
+        with _schema_lock:
+            if key in _schema_ready:
+                return
+            self.ensure_db_exists()
+            self.init_database()
+            if Config.DATABASE_CHECK_QUERY_PLANS:
+                self.check_query_plans()
+            _schema_ready.add(key)
+        self.start_epoch_backfill()
     
     def ensure_db_exists(self):
         """S'assure que le répertoire de la base de données existe"""
@@ -27,16 +618,85 @@ class Database:
             os.makedirs(db_dir)
     
     def get_connection(self):
-        """Obtient une connexion à la base de données"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Obtient une connexion du pool (close() la rend au pool)"""
+        return self.pool.connection()
+    
+    def get_pool_stats(self) -> Dict:
+        """Retourne les statistiques du pool de connexions"""
+        return self.pool.get_stats()
     
     def init_database(self):
-        """Initialise la base de données avec les tables nécessaires"""
+        """Applique les migrations de schéma en attente puis crée l'utilisateur admin"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        try:
+            for version, description, method_name in self.MIGRATIONS:
+                # Verrou d'écriture : un seul processus applique chaque migration
+                cursor.execute('BEGIN IMMEDIATE')
+                current_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+                if version <= current_version:
+                    conn.rollback()
+                    continue
+                print(f"🗄️ Migration {version}: {description}")
+                getattr(self, method_name)(cursor)
+                cursor.execute(f'PRAGMA user_version = {int(version)}')
+                conn.commit()
+        finally:
+            conn.close()
+        
+        # Créer un utilisateur admin par défaut
+        self.create_default_user()
+    
+    def explain_query_plans(self) -> Dict[str, List[str]]:
+        """Retourne le plan d'exécution (EXPLAIN QUERY PLAN) de chaque requête critique"""
+        conn = self.get_connection()
+        try:
+            plans = {}
+            for name, (query, params) in HOT_QUERIES.items():
+                rows = conn.execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()
+                plans[name] = [row['detail'] for row in rows]
+            return plans
+        finally:
+            conn.close()
+    
+    def check_query_plans(self) -> Dict[str, List[str]]:
+        """
+        Vérifie qu'aucune requête critique ne parcourt une table entière.
+        Un « SCAN <table> » sans index signifie qu'un index a disparu ou
+        n'est plus utilisé : on lève QueryPlanRegression plutôt que de
+        laisser les performances se dégrader silencieusement.
+        """
+        plans = self.explain_query_plans()
+        regressions = {}
+        for name, details in plans.items():
+            # Les sous-requêtes matérialisées (MATERIALIZE p2 / CO-ROUTINE) sont déjà réduites
+            subqueries = {d.split(' ', 1)[1] for d in details if d.startswith(('MATERIALIZE ', 'CO-ROUTINE '))}
+            full_scans = [
+                d for d in details
+                if d.startswith('SCAN ') and 'INDEX' not in d and d.split(' ')[1] not in subqueries
+            ]
+            if full_scans:
+                regressions[name] = full_scans
+        
+        if regressions:
+            summary = '; '.join(f"{name}: {', '.join(scans)}" for name, scans in regressions.items())
+            raise QueryPlanRegression(f"Parcours complet de table détecté ({summary})")
+        return plans
+    
+    def get_schema_version(self) -> int:
+        """Retourne la version du schéma appliquée au fichier"""
+        conn = self.get_connection()
+        try:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            return version
+        finally:
+            conn.close()
+    
+    # ==================== MIGRATIONS DU SCHÉMA ====================
+    
+    def _migration_001_initial_schema(self, cursor):
+        """Tables de base de l'application"""
         # Table des utilisateurs
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -113,48 +773,420 @@ class Database:
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
-        
-        conn.commit()
-        conn.close()
-        
-        # Créer un utilisateur admin par défaut
-        self.create_default_user()
     
     def create_default_user(self):
         """Crée un utilisateur admin par défaut"""
         try:
             password_hash = hashlib.sha256('admin123'.encode()).hexdigest()
             conn = self.get_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT OR IGNORE INTO users (username, email, password_hash, role)
-                VALUES (?, ?, ?, ?)
-            ''', ('admin', 'admin@fertigation.com', password_hash, 'admin'))
-            conn.commit()
-            conn.close()
-            print("👤 Utilisateur admin créé/vérifié")
+            try:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT OR IGNORE INTO users (username, email, password_hash, role)
+                    VALUES (?, ?, ?, ?)
+                ''', ('admin', 'admin@fertigation.com', password_hash, 'admin'))
+                conn.commit()
+                print("👤 Utilisateur admin créé/vérifié")
+            finally:
+                conn.close()
         except Exception as e:
             print(f"❌ Erreur lors de la création de l'utilisateur par défaut: {e}")
     
+    def _migration_002_time_series_indexes(self, cursor):
+        """Index des requêtes par capteur et par date, des alertes actives et des prédictions"""
+        # Lectures d'un capteur triées par date (lectures récentes, plages de temps, historique)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sensor_readings_sensor_ts
+            ON sensor_readings (sensor_name, timestamp, value)
+        ''')
+        
+        # Dernières lectures tous capteurs confondus
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sensor_readings_ts
+            ON sensor_readings (timestamp)
+        ''')
+        
+        # Alertes actives/résolues triées par date de création
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_active_created
+            ON alerts (is_active, created_at)
+        ''')
+        
+        # Dernière prédiction par capteur (GROUP BY sensor_name, MAX(created_at))
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_predictions_sensor_created
+            ON predictions (sensor_name, created_at)
+        ''')
+    
+    def _migration_003_epoch_ms_timestamps(self, cursor):
+        """
+        Colonnes d'horodatage entières (epoch ms) pour les lectures, alertes et prédictions.
+        La migration est en ligne : elle ajoute les colonnes et les index sans réécrire
+        les tables ; les lignes existantes sont converties par lots en arrière-plan
+        (backfill_epoch_timestamps), les plus récentes d'abord.
+        """
+        for table, (text_column, ms_column) in EPOCH_MS_COLUMNS.items():
+            columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})').fetchall()]
+            if ms_column not in columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {ms_column} INTEGER')
+            
+            # Filet de sécurité pour les écritures qui ne renseignent pas la colonne entière
+            # (scripts d'initialisation, outils externes)
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{ms_column}
+                AFTER INSERT ON {table}
+                WHEN NEW.{ms_column} IS NULL
+                BEGIN
+                    UPDATE {table}
+                    SET {ms_column} = {EPOCH_MS_FROM_TEXT.format(column=f"COALESCE(NEW.{text_column}, 'now')")}
+                    WHERE id = NEW.id;
+                END
+            ''')
+        
+        # Les index texte de la migration 2 sont remplacés par leurs équivalents entiers
+        for index_name in ('idx_sensor_readings_sensor_ts', 'idx_sensor_readings_ts',
+                           'idx_alerts_active_created', 'idx_predictions_sensor_created'):
+            cursor.execute(f'DROP INDEX IF EXISTS {index_name}')
+        
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sensor_readings_sensor_ts_ms
+            ON sensor_readings (sensor_name, ts_ms, value)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_sensor_readings_ts_ms
+            ON sensor_readings (ts_ms)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_active_created_ms
+            ON alerts (is_active, created_at_ms)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_predictions_sensor_created_ms
+            ON predictions (sensor_name, created_at_ms)
+        ''')
+    
+    def _migration_004_sensor_rollups(self, cursor):
+        """
+        Agrégats min/max/moyenne/nombre/dernière valeur par capteur et par intervalle.
+        Ils sont ensuite tenus à jour à chaque insertion (insert_sensor_readings) ;
+        la migration les calcule une fois pour l'historique existant.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sensor_rollups (
+                sensor_name TEXT NOT NULL,
+                resolution_s INTEGER NOT NULL,
+                bucket_start_ms INTEGER NOT NULL,
+                min_value REAL NOT NULL,
+                max_value REAL NOT NULL,
+                sum_value REAL NOT NULL,
+                count INTEGER NOT NULL,
+                last_value REAL NOT NULL,
+                last_ts_ms INTEGER NOT NULL,
+                PRIMARY KEY (sensor_name, resolution_s, bucket_start_ms)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Les lignes pas encore converties en epoch ms sont converties à la volée
+        ts_expression = f"COALESCE(ts_ms, {EPOCH_MS_FROM_TEXT.format(column='timestamp')})"
+        for resolution_s in Config.SENSOR_ROLLUP_RESOLUTIONS:
+            resolution_ms = resolution_s * 1000
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO sensor_rollups
+                (sensor_name, resolution_s, bucket_start_ms, min_value, max_value, sum_value, count, last_value, last_ts_ms)
+                SELECT sensor_name, ?, bucket, MIN(value), MAX(value), SUM(value), COUNT(*),
+                       MAX(CASE WHEN rn = 1 THEN value END), MAX(ts)
+                FROM (
+                    SELECT sensor_name, value, ts, ts - ts % {resolution_ms} AS bucket,
+                           ROW_NUMBER() OVER (PARTITION BY sensor_name, ts - ts % {resolution_ms}
+                                              ORDER BY ts DESC) AS rn
+                    FROM (SELECT sensor_name, value, {ts_expression} AS ts FROM sensor_readings)
+                )
+                GROUP BY sensor_name, bucket
+            ''', (resolution_s,))
+    
+    def _migration_005_alert_occurrences(self, cursor):
+        """
+        Compteur d'occurrences et date de dernière occurrence des alertes : une anomalie
+        répétée met à jour l'alerte active existante au lieu d'en créer une nouvelle
+        """
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(alerts)').fetchall()]
+        if 'occurrence_count' not in columns:
+            cursor.execute('ALTER TABLE alerts ADD COLUMN occurrence_count INTEGER NOT NULL DEFAULT 1')
+        if 'last_seen_ms' not in columns:
+            cursor.execute('ALTER TABLE alerts ADD COLUMN last_seen_ms INTEGER')
+        
+        # Alerte active d'un (capteur, type) : index partiel, limité aux alertes actives
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_active_sensor_type
+            ON alerts (sensor_name, alert_type)
+            WHERE is_active = 1
+        ''')
+    
+    def _migration_006_sensor_metadata(self, cursor):
+        """
+        Première et dernière lecture, nombre de lectures et dernière valeur de chaque capteur,
+        tenus à jour à chaque insertion : l'âge et la quantité de données d'un capteur se lisent
+        en une ligne au lieu de parcourir ses lectures
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sensor_metadata (
+                sensor_name TEXT PRIMARY KEY,
+                first_ts_ms INTEGER NOT NULL,
+                last_ts_ms INTEGER NOT NULL,
+                reading_count INTEGER NOT NULL,
+                last_value REAL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(SENSOR_METADATA_REFRESH)
+    
+    def _migration_007_weibull_parameters(self, cursor):
+        """
+        Paramètres de Weibull ajustés par capteur (cache des ajustements) et date de dernière
+        modification des maintenances : seuls les capteurs dont l'historique a changé depuis
+        le dernier ajustement sont réajustés
+        """
+        columns = [row[1] for row in cursor.execute('PRAGMA table_info(maintenance_records)').fetchall()]
+        if 'updated_at_ms' not in columns:
+            cursor.execute('ALTER TABLE maintenance_records ADD COLUMN updated_at_ms INTEGER')
+        now_expression = EPOCH_MS_FROM_TEXT.format(column="'now'")
+        cursor.execute(f'UPDATE maintenance_records SET updated_at_ms = {now_expression}')
+        
+        # Toutes les écritures (application, scripts) datent la modification
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_maintenance_records_inserted
+            AFTER INSERT ON maintenance_records
+            WHEN NEW.updated_at_ms IS NULL
+            BEGIN
+                UPDATE maintenance_records SET updated_at_ms = {now_expression} WHERE id = NEW.id;
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_maintenance_records_updated
+            AFTER UPDATE OF sensor_name, maintenance_type, status, completed_date ON maintenance_records
+            BEGIN
+                UPDATE maintenance_records SET updated_at_ms = {now_expression} WHERE id = NEW.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_maintenance_records_updated
+            ON maintenance_records (updated_at_ms)
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS weibull_parameters (
+                sensor_name TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                shape REAL,
+                scale REAL,
+                location REAL,
+                failures INTEGER NOT NULL,
+                censored INTEGER NOT NULL,
+                log_likelihood REAL,
+                renewed_at_ms INTEGER,
+                events_watermark_ms INTEGER NOT NULL,
+                fitted_at_ms INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+    
+    def _migration_008_trend_stats(self, cursor):
+        """
+        Sommes de la régression linéaire (valeur en fonction du temps) de chaque capteur,
+        mises à jour à l'ingestion : la tendance de dégradation ne relit plus la série
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sensor_trend_stats (
+                sensor_name TEXT PRIMARY KEY,
+                origin_ms INTEGER NOT NULL,
+                ref_ms INTEGER NOT NULL,
+                reading_count INTEGER NOT NULL,
+                weight REAL NOT NULL,
+                sum_t REAL NOT NULL,
+                sum_y REAL NOT NULL,
+                sum_tt REAL NOT NULL,
+                sum_ty REAL NOT NULL,
+                sum_yy REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self._rebuild_trend_stats(cursor)
+    
+    def _migration_009_refit_weibull_parameters(self, cursor):
+        """
+        Les ajustements en cache comptaient les maintenances créées automatiquement comme
+        défaillances : ils sont effacés pour que le prochain rafraîchissement réajuste tous
+        les capteurs avec les types saisis par l'utilisateur
+        """
+        cursor.execute('DELETE FROM weibull_parameters')
+    
+    def _migration_010_backfill_checkpoints(self, cursor):
+        """
+        Points de contrôle de la ré-analyse de l'historique, écrits dans la même transaction
+        que les alertes de chaque lot : une reprise ne réinsère jamais d'alertes déjà écrites
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS backfill_checkpoints (
+                name TEXT PRIMARY KEY,
+                checkpoint TEXT NOT NULL,
+                updated_at_ms INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+    
+    def _migration_011_weibull_class_parameters(self, cursor):
+        """
+        Un ajustement de Weibull par classe de capteurs (durées de vie mises en commun) au lieu
+        d'un par capteur ; par capteur, seules ses durées de vie terminées et le début de sa
+        vie en cours sont conservés, pour réajuster une classe sans relire tout son historique
+        """
+        cursor.execute('DROP TABLE IF EXISTS weibull_parameters')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sensor_lifetimes (
+                sensor_name TEXT PRIMARY KEY,
+                sensor_class TEXT NOT NULL,
+                durations TEXT NOT NULL,
+                failed TEXT NOT NULL,
+                open_since_ms INTEGER,
+                renewed_at_ms INTEGER,
+                events_watermark_ms INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS weibull_class_parameters (
+                sensor_class TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                shape REAL,
+                scale REAL,
+                location REAL,
+                sensors INTEGER NOT NULL,
+                failures INTEGER NOT NULL,
+                censored INTEGER NOT NULL,
+                log_likelihood REAL,
+                events_watermark_ms INTEGER NOT NULL,
+                fitted_at_ms INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+    
+    def _migration_012_predictions_epoch_ms(self, cursor):
+        """
+        Convertit tout de suite les horodatages des prédictions encore NULL (conversion en
+        arrière-plan de la migration 3) : get_latest_predictions joint sur MAX(created_at_ms),
+        qui ignorerait ces lignes. La table est petite (une prédiction par capteur et par analyse).
+        """
+        cursor.execute(f'''
+            UPDATE predictions
+            SET created_at_ms = {EPOCH_MS_FROM_TEXT.format(column='created_at')}
+            WHERE created_at_ms IS NULL
+        ''')
+    
+    def _rebuild_trend_stats(self, cursor, chunk_size: int = 50000):
+        """Recalcule les statistiques de tendance depuis toutes les lectures, par paquets"""
+        cursor.execute('DELETE FROM sensor_trend_stats')
+        # Les sommes ne dépendent pas de l'ordre des lectures : pas de tri nécessaire
+        reader = cursor.connection.cursor()
+        reader.row_factory = None
+        reader.execute(f'''
+            SELECT sensor_name, value, COALESCE(ts_ms, {EPOCH_MS_FROM_TEXT.format(column='timestamp')})
+            FROM sensor_readings
+        ''')
+        while True:
+            rows = reader.fetchmany(chunk_size)
+            if not rows:
+                break
+            apply_trend_stats(cursor, rows)
+    
+    def count_pending_epoch_backfill(self) -> int:
+        """Nombre de lignes dont l'horodatage entier reste à calculer"""
+        conn = self.get_connection()
+        try:
+            return sum(
+                conn.execute(f'SELECT COUNT(*) FROM {table} WHERE {ms_column} IS NULL').fetchone()[0]
+                for table, (_, ms_column) in EPOCH_MS_COLUMNS.items()
+            )
+        finally:
+            conn.close()
+    
+    def backfill_epoch_timestamps(self, chunk_size=None, pause=0.01) -> int:
+        """
+        Convertit les horodatages texte existants en epoch ms, par lots de `chunk_size`
+        lignes (une courte transaction par lot pour ne pas bloquer l'ingestion).
+        Reprend naturellement là où elle s'est arrêtée : seules les lignes NULL sont traitées.
+        """
+        chunk_size = chunk_size or Config.DATABASE_EPOCH_BACKFILL_CHUNK
+        converted = 0
+        
+        for table, (text_column, ms_column) in EPOCH_MS_COLUMNS.items():
+            while True:
+                conn = self.get_connection()
+                try:
+                    with conn:
+                        cursor = conn.execute(f'''
+                            UPDATE {table}
+                            SET {ms_column} = {EPOCH_MS_FROM_TEXT.format(column=text_column)}
+                            WHERE id IN (
+                                SELECT id FROM {table}
+                                WHERE {ms_column} IS NULL
+                                ORDER BY id DESC
+                                LIMIT ?
+                            )
+                        ''', (chunk_size,))
+                        updated = cursor.rowcount
+                finally:
+                    conn.close()
+                
+                converted += updated
+                if updated < chunk_size:
+                    break
+                time.sleep(pause)
+        
+        return converted
+    
+    def start_epoch_backfill(self):
+        """Lance la conversion des horodatages en arrière-plan s'il reste des lignes à traiter"""
+        key = os.path.abspath(self.db_path)
+        with _schema_lock:
+            if key in _epoch_backfills:
+                return
+            if not self.count_pending_epoch_backfill():
+                _epoch_backfills[key] = 'done'
+                return
+            _epoch_backfills[key] = 'running'
+        
+        def run():
+            try:
+                started = time.perf_counter()
+                converted = self.backfill_epoch_timestamps()
+                _epoch_backfills[key] = 'done'
+                print(f"✅ Horodatages convertis en epoch ms: {converted} lignes "
+                      f"({time.perf_counter() - started:.1f} s)")
+            except Exception as e:
+                # Sera relancée par la prochaine instance de Database
+                _epoch_backfills.pop(key, None)
+                print(f"❌ Erreur de conversion des horodatages: {e}")
+        
+        print("🕒 Conversion des horodatages existants en epoch ms (arrière-plan)...")
+        threading.Thread(target=run, name='epoch-backfill', daemon=True).start()
+    
     # ==================== MÉTHODES POUR LES UTILISATEURS ====================
     
     def get_user_by_username(self, username):
         """Récupère un utilisateur par son nom d'utilisateur"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        user = cursor.fetchone()
-        conn.close()
-        return user
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
+            user = cursor.fetchone()
+            return user
+        finally:
+            conn.close()
     
     def get_user_by_id(self, user_id):
         """Récupère un utilisateur par son ID"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
-        user = cursor.fetchone()
-        conn.close()
-        return user
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
+            user = cursor.fetchone()
+            return user
+        finally:
+            conn.close()
     
     def create_user(self, username, email, password, role='user'):
         """Crée un nouveau utilisateur"""
@@ -176,285 +1208,735 @@ class Database:
     def update_last_login(self, user_id):
         """Met à jour la dernière connexion d'un utilisateur"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE users SET last_login = ? WHERE id = ?
-        ''', (datetime.now(), user_id))
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE users SET last_login = ? WHERE id = ?
+            ''', (datetime.now(), user_id))
+            conn.commit()
+        finally:
+            conn.close()
     
     # ==================== MÉTHODES POUR LES CAPTEURS ====================
     
     def insert_sensor_reading(self, sensor_type, sensor_name, value, unit):
         """Insère une nouvelle lecture de capteur"""
+        self.insert_sensor_readings([
+            {'sensor_type': sensor_type, 'sensor_name': sensor_name, 'value': value, 'unit': unit}
+        ])
+    
+    def insert_sensor_readings(self, readings: List[Dict]) -> int:
+        """
+        Insère un lot de lectures en une seule transaction (un seul commit),
+        avec la mise à jour des agrégats par intervalle et des métadonnées des capteurs
+        """
+        if not readings:
+            return 0
+        
+        received_ms = now_ms()
+        rows = [
+            (reading['sensor_type'], reading['sensor_name'], reading['value'], reading['unit'],
+             reading.get('ts_ms') or to_epoch_ms(reading.get('timestamp')) or received_ms)
+            for reading in readings
+        ]
+        
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO sensor_readings (sensor_type, sensor_name, value, unit)
-            VALUES (?, ?, ?, ?)
-        ''', (sensor_type, sensor_name, value, unit))
-        conn.commit()
-        conn.close()
+        try:
+            with conn:
+                # Colonne texte héritée dérivée de ts_ms dans le même INSERT (et non l'instant d'écriture)
+                conn.executemany(f'''
+                    INSERT INTO sensor_readings (sensor_type, sensor_name, value, unit, ts_ms, timestamp)
+                    VALUES (?1, ?2, ?3, ?4, ?5, {TEXT_FROM_EPOCH_MS.format(column='?5')})
+                ''', rows)
+                conn.executemany(ROLLUP_UPSERT, aggregate_rollups(
+                    (sensor_name, value, ts_ms) for _, sensor_name, value, _, ts_ms in rows
+                ))
+                conn.executemany(SENSOR_METADATA_UPSERT, aggregate_sensor_metadata(
+                    (sensor_name, value, ts_ms) for _, sensor_name, value, _, ts_ms in rows
+                ))
+                apply_trend_stats(conn, (
+                    (sensor_name, value, ts_ms) for _, sensor_name, value, _, ts_ms in rows
+                ))
+        finally:
+            conn.close()
+        return len(rows)
     
     def get_recent_readings(self, sensor_name=None, limit=100):
         """Récupère les lectures récentes"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
+            
+            if sensor_name:
+                cursor.execute('''
+                    SELECT * FROM sensor_readings 
+                    WHERE sensor_name = ? 
+                    ORDER BY ts_ms DESC 
+                    LIMIT ?
+                ''', (sensor_name, limit))
+            else:
+                cursor.execute('''
+                    SELECT * FROM sensor_readings 
+                    ORDER BY ts_ms DESC 
+                    LIMIT ?
+                ''', (limit,))
+            
+            readings = [dict(row) for row in cursor.fetchall()]
+            return readings
+        finally:
+            conn.close()
+    
+    def get_readings_by_timerange(self, start_time, end_time, sensor_name=None):
+        """Récupère les lectures dans une plage de temps (datetime ou epoch ms)"""
+        start_ms, end_ms = to_epoch_ms(start_time), to_epoch_ms(end_time)
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            
+            if sensor_name:
+                cursor.execute('''
+                    SELECT * FROM sensor_readings 
+                    WHERE sensor_name = ? AND ts_ms BETWEEN ? AND ?
+                    ORDER BY ts_ms ASC
+                ''', (sensor_name, start_ms, end_ms))
+            else:
+                cursor.execute('''
+                    SELECT * FROM sensor_readings 
+                    WHERE ts_ms BETWEEN ? AND ?
+                    ORDER BY ts_ms ASC
+                ''', (start_ms, end_ms))
+            
+            readings = [dict(row) for row in cursor.fetchall()]
+            return readings
+        finally:
+            conn.close()
+    
+    def get_readings_chunk(self, start_ms: int, end_ms: int, after: Optional[Tuple[int, int]] = None,
+                           limit: int = 10000, sensor_names: Optional[List[str]] = None) -> List[Tuple]:
+        """
+        Lot de lectures (id, sensor_name, value, unit, ts_ms) de [start_ms, end_ms] trié par (ts_ms, id).
+        `after` = (ts_ms, id) de la dernière lecture du lot précédent (pagination par clé, sans OFFSET).
+        """
+        conditions, params = ['ts_ms BETWEEN ? AND ?'], [start_ms, end_ms]
+        if after is not None:
+            conditions.append('ts_ms >= ? AND (ts_ms > ? OR id > ?)')
+            params.extend(after[:1] + after[:1] + after[1:])
+        if sensor_names:
+            # « +sensor_name » : filtre sans index, pour parcourir idx_sensor_readings_ts_ms
+            # dans l'ordre (ts_ms, id) au lieu de trier toute la plage restante à chaque lot
+            conditions.append(f"+sensor_name IN ({', '.join('?' for _ in sensor_names)})")
+            params.extend(sensor_names)
         
-        if sensor_name:
-            cursor.execute('''
-                SELECT * FROM sensor_readings 
-                WHERE sensor_name = ? 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (sensor_name, limit))
-        else:
-            cursor.execute('''
-                SELECT * FROM sensor_readings 
-                ORDER BY timestamp DESC 
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute(f'''
+                SELECT id, sensor_name, value, unit, ts_ms FROM sensor_readings
+                WHERE {' AND '.join(conditions)}
+                ORDER BY ts_ms, id
                 LIMIT ?
-            ''', (limit,))
-        
-        readings = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return readings
+            ''', params + [limit])
+            rows = cursor.fetchall()
+            return rows
+        finally:
+            conn.close()
     
-    def get_readings_by_timerange(self, start_time, end_time, sensor_name=None):
-        """Récupère les lectures dans une plage de temps"""
+    def get_sensor_series(self, sensor_name, limit=None, start_time=None, end_time=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Série chronologique d'un capteur sous forme de tableaux NumPy (ts_ms int64, valeurs float64),
+        sans conversion ligne par ligne. `limit` garde les lectures les plus récentes.
+        """
+        conditions, params = ['sensor_name = ?', 'ts_ms IS NOT NULL'], [sensor_name]
+        if start_time is not None:
+            conditions.append('ts_ms >= ?')
+            params.append(to_epoch_ms(start_time))
+        if end_time is not None:
+            conditions.append('ts_ms <= ?')
+            params.append(to_epoch_ms(end_time))
+        query = f'SELECT ts_ms, value FROM sensor_readings WHERE {" AND ".join(conditions)} ORDER BY ts_ms DESC'
+        if limit:
+            query += ' LIMIT ?'
+            params.append(int(limit))
+        
         conn = self.get_connection()
-        cursor = conn.cursor()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None   # tuples bruts, convertis d'un bloc par NumPy
+            rows = cursor.execute(query, params).fetchall()
+        finally:
+            conn.close()
         
-        if sensor_name:
-            cursor.execute('''
-                SELECT * FROM sensor_readings 
-                WHERE sensor_name = ? AND timestamp BETWEEN ? AND ?
-                ORDER BY timestamp ASC
-            ''', (sensor_name, start_time, end_time))
-        else:
-            cursor.execute('''
-                SELECT * FROM sensor_readings 
-                WHERE timestamp BETWEEN ? AND ?
-                ORDER BY timestamp ASC
-            ''', (start_time, end_time))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        series = np.array(rows[::-1], dtype=np.float64)
+        return series[:, 0].astype(np.int64), series[:, 1]
+    
+    @staticmethod
+    def choose_rollup_resolution(window_s: float, resolution_s: Optional[float] = None) -> int:
+        """
+        Résolution (en secondes) la plus grossière qui respecte la résolution demandée ;
+        sans résolution demandée, on vise Config.MAX_CHART_POINTS points sur la fenêtre.
+        0 signifie « lectures brutes ».
+        """
+        if resolution_s is None:
+            resolution_s = window_s / max(1, Config.MAX_CHART_POINTS)
+        candidates = [r for r in Config.SENSOR_ROLLUP_RESOLUTIONS if r <= resolution_s and r < window_s]
+        return max(candidates) if candidates else 0
+    
+    def get_rollups(self, sensor_name, resolution_s, start_time, end_time) -> List[Dict]:
+        """Agrégats d'un capteur à une résolution donnée, intervalles chevauchant la plage"""
+        start_ms, end_ms = to_epoch_ms(start_time), to_epoch_ms(end_time)
+        resolution_ms = int(resolution_s) * 1000
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT * FROM sensor_rollups
+                WHERE sensor_name = ? AND resolution_s = ? AND bucket_start_ms BETWEEN ? AND ?
+                ORDER BY bucket_start_ms ASC
+            ''', (sensor_name, int(resolution_s), start_ms - start_ms % resolution_ms, end_ms)).fetchall()
+        finally:
+            conn.close()
         
-        readings = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return readings
+        rollups = []
+        for row in rows:
+            rollup = dict(row)
+            rollup['mean_value'] = rollup['sum_value'] / rollup['count']
+            rollups.append(rollup)
+        return rollups
+    
+    def get_sensor_history(self, sensor_name, start_time, end_time, resolution_s=None, max_points=None) -> Dict:
+        """
+        Historique d'un capteur pour les graphiques : lit l'agrégat le plus grossier
+        compatible avec la fenêtre et la résolution demandées, ou les lectures brutes,
+        puis le réduit à `max_points` points au plus (LTTB).
+        """
+        start_ms, end_ms = to_epoch_ms(start_time), to_epoch_ms(end_time)
+        resolution = self.choose_rollup_resolution((end_ms - start_ms) / 1000, resolution_s)
+        unit = Config.SENSOR_THRESHOLDS.get(sensor_name, {}).get('unit', '')
+        
+        if not resolution:
+            points = [
+                {
+                    'timestamp': epoch_ms_to_iso(reading['ts_ms']),
+                    'ts_ms': reading['ts_ms'],
+                    'value': reading['value'],
+                    'unit': reading['unit']
+                } for reading in self.get_readings_by_timerange(start_ms, end_ms, sensor_name)
+            ]
+        else:
+            points = [
+                {
+                    'timestamp': epoch_ms_to_iso(rollup['bucket_start_ms']),
+                    'ts_ms': rollup['bucket_start_ms'],
+                    'value': rollup['mean_value'],
+                    'min': rollup['min_value'],
+                    'max': rollup['max_value'],
+                    'count': rollup['count'],
+                    'last': rollup['last_value'],
+                    'unit': unit
+                } for rollup in self.get_rollups(sensor_name, resolution, start_ms, end_ms)
+            ]
+        
+        total_points = len(points)
+        if max_points:
+            points = downsample_points(points, max_points)
+        
+        return {'sensor_name': sensor_name, 'resolution_s': resolution,
+                'total_points': total_points, 'points': points}
+    
+    def get_first_reading_ms(self, sensor_name) -> Optional[int]:
+        """Horodatage (epoch ms) de la plus ancienne lecture d'un capteur"""
+        conn = self.get_connection()
+        try:
+            return conn.execute(
+                'SELECT MIN(ts_ms) FROM sensor_readings WHERE sensor_name = ?', (sensor_name,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+    
+    def get_sensor_metadata(self, sensor_name) -> Optional[Dict]:
+        """Première/dernière lecture (epoch ms), nombre de lectures et dernière valeur d'un capteur"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute('SELECT * FROM sensor_metadata WHERE sensor_name = ?', (sensor_name,)).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+    
+    def get_all_sensor_metadata(self) -> Dict[str, Dict]:
+        """Métadonnées de tous les capteurs, par nom de capteur (une ligne par capteur)"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('SELECT * FROM sensor_metadata').fetchall()
+        finally:
+            conn.close()
+        return {row['sensor_name']: dict(row) for row in rows}
+    
+    def refresh_sensor_metadata(self) -> int:
+        """Recalcule les métadonnées depuis les lectures (après une purge ou des écritures externes)"""
+        conn = self.get_connection()
+        try:
+            with conn:
+                conn.execute(SENSOR_METADATA_REFRESH)
+                conn.execute('''
+                    UPDATE sensor_metadata SET reading_count = 0
+                    WHERE sensor_name NOT IN (SELECT DISTINCT sensor_name FROM sensor_readings)
+                ''')
+            return conn.execute('SELECT COUNT(*) FROM sensor_metadata').fetchone()[0]
+        finally:
+            conn.close()
+    
+    def get_all_trend_stats(self) -> Dict[str, Dict]:
+        """Statistiques de tendance de tous les capteurs (voir trend_statistics.py)"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('SELECT * FROM sensor_trend_stats').fetchall()
+        finally:
+            conn.close()
+        return {row['sensor_name']: dict(row) for row in rows}
+    
+    def get_trend_stats(self, sensor_name: str) -> Optional[Dict]:
+        """Statistiques de tendance d'un capteur"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute('SELECT * FROM sensor_trend_stats WHERE sensor_name = ?', (sensor_name,)).fetchone()
+        finally:
+            conn.close()
+        return dict(row) if row else None
+    
+    def refresh_trend_stats(self) -> int:
+        """Recalcule les statistiques de tendance (après une purge ou un changement de demi-vie)"""
+        conn = self.get_connection()
+        try:
+            with conn:
+                self._rebuild_trend_stats(conn.cursor())
+            return conn.execute('SELECT COUNT(*) FROM sensor_trend_stats').fetchone()[0]
+        finally:
+            conn.close()
     
     # ==================== MÉTHODES POUR LES ALERTES ====================
     
     def create_alert(self, sensor_name, alert_type, message, severity):
         """Crée une nouvelle alerte"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO alerts (sensor_name, alert_type, message, severity)
-            VALUES (?, ?, ?, ?)
-        ''', (sensor_name, alert_type, message, severity))
-        alert_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return alert_id
+        try:
+            cursor = conn.cursor()
+            created_ms = now_ms()
+            cursor.execute('''
+                INSERT INTO alerts (sensor_name, alert_type, message, severity, created_at_ms, last_seen_ms)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (sensor_name, alert_type, message, severity, created_ms, created_ms))
+            alert_id = cursor.lastrowid
+            conn.commit()
+            return alert_id
+        finally:
+            conn.close()
+    
+    def create_alerts(self, alerts: List[Dict], checkpoint: Optional[Tuple[str, Dict]] = None) -> int:
+        """
+        Insère un lot d'alertes en une transaction (executemany).
+        Chaque alerte reprend le format des anomalies (sensor_name, type, message, severity) ;
+        `created_at_ms` (instant courant par défaut) et `is_active` sont optionnels.
+        `checkpoint` = (nom, point de contrôle) est enregistré dans la même transaction.
+        """
+        if not alerts and checkpoint is None:
+            return 0
+        current_ms = now_ms()
+        rows = []
+        for alert in alerts:
+            created_ms = int(alert.get('created_at_ms') or current_ms)
+            is_active = 1 if alert.get('is_active', True) else 0
+            rows.append((
+                alert['sensor_name'], alert['type'], alert['message'], alert['severity'],
+                created_ms, created_ms, created_ms, is_active, is_active, created_ms
+            ))
+        
+        conn = self.get_connection()
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO alerts (sensor_name, alert_type, message, severity, created_at, created_at_ms,
+                                        last_seen_ms, is_active, resolved_at)
+                    VALUES (?, ?, ?, ?, strftime('%Y-%m-%d %H:%M:%S', ? / 1000.0, 'unixepoch'), ?,
+                            ?, ?, CASE WHEN ? = 1 THEN NULL ELSE strftime('%Y-%m-%d %H:%M:%S', ? / 1000.0, 'unixepoch') END)
+                ''', rows)
+                if checkpoint is not None:
+                    self._write_backfill_checkpoint(conn, *checkpoint)
+        finally:
+            conn.close()
+        return len(rows)
+    
+    def _write_backfill_checkpoint(self, conn, name: str, checkpoint: Dict):
+        conn.execute('''
+            INSERT OR REPLACE INTO backfill_checkpoints (name, checkpoint, updated_at_ms) VALUES (?, ?, ?)
+        ''', (name, json.dumps(checkpoint), now_ms()))
+    
+    def get_backfill_checkpoint(self, name: str) -> Optional[Dict]:
+        """Point de contrôle enregistré d'une ré-analyse (None s'il n'y en a pas)"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute('SELECT checkpoint FROM backfill_checkpoints WHERE name = ?', (name,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row['checkpoint']) if row else None
+    
+    def save_backfill_checkpoint(self, name: str, checkpoint: Dict):
+        conn = self.get_connection()
+        try:
+            with conn:
+                self._write_backfill_checkpoint(conn, name, checkpoint)
+        finally:
+            conn.close()
+    
+    def delete_backfill_checkpoint(self, name: str):
+        conn = self.get_connection()
+        try:
+            with conn:
+                conn.execute('DELETE FROM backfill_checkpoints WHERE name = ?', (name,))
+        finally:
+            conn.close()
     
     def get_active_alerts(self, limit=None):
         """Récupère les alertes actives"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT * FROM alerts 
-            WHERE is_active = 1 
-            ORDER BY created_at DESC
-        '''
-        
-        if limit:
-            query += f' LIMIT {limit}'
-        
-        cursor.execute(query)
-        
-        alerts = []
-        for row in cursor.fetchall():
-            alert = dict(row)
-            # Ajouter des classes CSS pour l'affichage
-            alert['severity_class'] = self._get_severity_class(alert['severity'])
-            alert['severity_text'] = alert['severity'].upper()
-            alerts.append(alert)
-        
-        conn.close()
-        return alerts
+        try:
+            cursor = conn.cursor()
+            
+            query = '''
+                SELECT * FROM alerts 
+                WHERE is_active = 1 
+                ORDER BY created_at_ms DESC
+            '''
+            
+            if limit:
+                query += f' LIMIT {limit}'
+            
+            cursor.execute(query)
+            
+            alerts = []
+            for row in cursor.fetchall():
+                alert = dict(row)
+                # Ajouter des classes CSS pour l'affichage
+                alert['severity_class'] = self._get_severity_class(alert['severity'])
+                alert['severity_text'] = alert['severity'].upper()
+                alerts.append(alert)
+            
+            return alerts
+        finally:
+            conn.close()
     
     def get_resolved_alerts(self, limit=None):
         """Récupère les alertes résolues"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        query = '''
-            SELECT * FROM alerts 
-            WHERE is_active = 0 
-            ORDER BY resolved_at DESC
-        '''
-        
-        if limit:
-            query += f' LIMIT {limit}'
-        
-        cursor.execute(query)
-        
-        alerts = []
-        for row in cursor.fetchall():
-            alert = dict(row)
-            alert['severity_class'] = 'resolved'
-            alert['severity_text'] = 'RÉSOLU'
-            alerts.append(alert)
-        
-        conn.close()
-        return alerts
+        try:
+            cursor = conn.cursor()
+            
+            query = '''
+                SELECT * FROM alerts 
+                WHERE is_active = 0 
+                ORDER BY resolved_at DESC
+            '''
+            
+            if limit:
+                query += f' LIMIT {limit}'
+            
+            cursor.execute(query)
+            
+            alerts = []
+            for row in cursor.fetchall():
+                alert = dict(row)
+                alert['severity_class'] = 'resolved'
+                alert['severity_text'] = 'RÉSOLU'
+                alerts.append(alert)
+            
+            return alerts
+        finally:
+            conn.close()
     
     def get_all_alerts(self, limit=200):
         """Récupère toutes les alertes"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM alerts 
-            ORDER BY created_at DESC 
-            LIMIT ?
-        ''', (limit,))
-        alerts = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return alerts
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM alerts 
+                ORDER BY created_at_ms DESC 
+                LIMIT ?
+            ''', (limit,))
+            alerts = [dict(row) for row in cursor.fetchall()]
+            return alerts
+        finally:
+            conn.close()
     
     def resolve_alert(self, alert_id):
         """Marque une alerte comme résolue"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE alerts 
-            SET is_active = 0, resolved_at = ? 
-            WHERE id = ?
-        ''', (datetime.now(), alert_id))
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE alerts 
+                SET is_active = 0, resolved_at = ? 
+                WHERE id = ?
+            ''', (datetime.now(), alert_id))
+            resolved = cursor.rowcount > 0
+            conn.commit()
+            return resolved
+        finally:
+            conn.close()
+    
+    def get_active_alert_keys(self) -> Dict[Tuple[str, str], Tuple[int, int]]:
+        """Alerte active la plus récente de chaque (capteur, type) : {clé: (id, dernière occurrence ms)}"""
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            cursor.execute('''
+                SELECT sensor_name, alert_type, id, COALESCE(last_seen_ms, created_at_ms, 0)
+                FROM alerts
+                WHERE is_active = 1
+                ORDER BY id
+            ''')
+            keys = {(sensor_name, alert_type): (alert_id, last_seen_ms)
+                    for sensor_name, alert_type, alert_id, last_seen_ms in cursor.fetchall()}
+            return keys
+        finally:
+            conn.close()
+    
+    def record_alert_occurrences(self, occurrences: List[Tuple[int, int, int]]) -> int:
+        """
+        Ajoute des occurrences à des alertes actives existantes, en une transaction.
+        `occurrences` : (id de l'alerte, nombre d'occurrences, dernière occurrence ms).
+        Renvoie le nombre d'alertes mises à jour (les alertes résolues entre-temps sont ignorées).
+        """
+        if not occurrences:
+            return 0
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                UPDATE alerts
+                SET occurrence_count = occurrence_count + ?,
+                    last_seen_ms = MAX(COALESCE(last_seen_ms, 0), ?)
+                WHERE id = ? AND is_active = 1
+            ''', [(count, last_seen_ms, alert_id) for alert_id, count, last_seen_ms in occurrences])
+            updated = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        return updated
     
     # ==================== MÉTHODES POUR LA MAINTENANCE ====================
     
     def create_maintenance_record(self, sensor_name, maintenance_type, description, scheduled_date):
         """Crée un enregistrement de maintenance"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO maintenance_records 
-            (sensor_name, maintenance_type, description, scheduled_date)
-            VALUES (?, ?, ?, ?)
-        ''', (sensor_name, maintenance_type, description, scheduled_date))
-        maintenance_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return maintenance_id
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO maintenance_records 
+                (sensor_name, maintenance_type, description, scheduled_date)
+                VALUES (?, ?, ?, ?)
+            ''', (sensor_name, maintenance_type, description, scheduled_date))
+            maintenance_id = cursor.lastrowid
+            conn.commit()
+            return maintenance_id
+        finally:
+            conn.close()
     
     def get_maintenance_records(self, status=None, limit=None):
         """Récupère les enregistrements de maintenance"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if status:
-            query = '''
-                SELECT * FROM maintenance_records 
-                WHERE status = ? 
-                ORDER BY scheduled_date DESC
-            '''
-            params = (status,)
-        else:
-            query = '''
-                SELECT * FROM maintenance_records 
-                ORDER BY scheduled_date DESC
-            '''
-            params = ()
-        
-        if limit:
-            query += f' LIMIT {limit}'
-        
-        cursor.execute(query, params)
-        
-        records = []
-        for row in cursor.fetchall():
-            record = dict(row)
-            record['status_class'] = self._get_status_class(record['status'])
-            records.append(record)
-        
-        conn.close()
-        return records
+        try:
+            cursor = conn.cursor()
+            
+            if status:
+                query = '''
+                    SELECT * FROM maintenance_records 
+                    WHERE status = ? 
+                    ORDER BY scheduled_date DESC
+                '''
+                params = (status,)
+            else:
+                query = '''
+                    SELECT * FROM maintenance_records 
+                    ORDER BY scheduled_date DESC
+                '''
+                params = ()
+            
+            if limit:
+                query += f' LIMIT {limit}'
+            
+            cursor.execute(query, params)
+            
+            records = []
+            for row in cursor.fetchall():
+                record = dict(row)
+                record['status_class'] = self._get_status_class(record['status'])
+                records.append(record)
+            
+            return records
+        finally:
+            conn.close()
     
     def update_maintenance_status(self, maintenance_id, status, completed_date=None):
         """Met à jour le statut d'une maintenance"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if completed_date:
-            cursor.execute('''
-                UPDATE maintenance_records 
-                SET status = ?, completed_date = ? 
-                WHERE id = ?
-            ''', (status, completed_date, maintenance_id))
-        else:
-            cursor.execute('''
-                UPDATE maintenance_records 
-                SET status = ? 
-                WHERE id = ?
-            ''', (status, maintenance_id))
-        
-        conn.commit()
-        conn.close()
+        try:
+            cursor = conn.cursor()
+            
+            if completed_date:
+                cursor.execute('''
+                    UPDATE maintenance_records 
+                    SET status = ?, completed_date = ? 
+                    WHERE id = ?
+                ''', (status, completed_date, maintenance_id))
+            else:
+                cursor.execute('''
+                    UPDATE maintenance_records 
+                    SET status = ? 
+                    WHERE id = ?
+                ''', (status, maintenance_id))
+            
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def get_maintenance_changes(self, since_ms: Optional[int]) -> Tuple[List[str], Optional[int]]:
+        """Capteurs dont les maintenances ont changé après `since_ms` et date du dernier changement"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT sensor_name, MAX(updated_at_ms) FROM maintenance_records
+                WHERE updated_at_ms > ?
+                GROUP BY sensor_name
+            ''', (since_ms if since_ms is not None else -1,)).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows], max((row[1] for row in rows), default=None)
+    
+    def get_completed_maintenances(self, sensor_names: List[str]) -> List[Dict]:
+        """Maintenances terminées (type, date de fin) des capteurs donnés, par ordre chronologique"""
+        if not sensor_names:
+            return []
+        placeholders = ','.join('?' * len(sensor_names))
+        conn = self.get_connection()
+        try:
+            rows = conn.execute(f'''
+                SELECT id, sensor_name, maintenance_type, completed_date
+                FROM maintenance_records
+                WHERE status = 'completed' AND completed_date IS NOT NULL AND sensor_name IN ({placeholders})
+                ORDER BY sensor_name, completed_date, id
+            ''', sensor_names).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+    
+    def get_sensor_lifetimes(self) -> Dict[str, Dict]:
+        """Durées de vie terminées (heures, JSON décodé) et vie en cours de chaque capteur"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('SELECT * FROM sensor_lifetimes').fetchall()
+        finally:
+            conn.close()
+        lifetimes = {}
+        for row in rows:
+            lifetime = dict(row)
+            lifetime['durations'] = json.loads(lifetime['durations'])
+            lifetime['failed'] = json.loads(lifetime['failed'])
+            lifetimes[row['sensor_name']] = lifetime
+        return lifetimes
+    
+    def get_weibull_class_parameters(self) -> Dict[str, Dict]:
+        """Paramètres de Weibull en cache, par classe de capteurs (ajustés ou faute de données)"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('SELECT * FROM weibull_class_parameters').fetchall()
+        finally:
+            conn.close()
+        return {row['sensor_class']: dict(row) for row in rows}
+    
+    def save_weibull_fits(self, lifetimes: List[Dict], fits: List[Dict]):
+        """Enregistre (remplace) en une transaction les durées de vie des capteurs et les ajustements de leurs classes"""
+        conn = self.get_connection()
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO sensor_lifetimes
+                    (sensor_name, sensor_class, durations, failed, open_since_ms, renewed_at_ms, events_watermark_ms)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', [
+                    (lifetime['sensor_name'], lifetime['sensor_class'], json.dumps(lifetime['durations']),
+                     json.dumps(lifetime['failed']), lifetime['open_since_ms'], lifetime['renewed_at_ms'],
+                     lifetime['events_watermark_ms'])
+                    for lifetime in lifetimes
+                ])
+                conn.executemany('''
+                    INSERT OR REPLACE INTO weibull_class_parameters
+                    (sensor_class, status, shape, scale, location, sensors, failures, censored,
+                     log_likelihood, events_watermark_ms, fitted_at_ms)
+                    VALUES (:sensor_class, :status, :shape, :scale, :location, :sensors, :failures, :censored,
+                            :log_likelihood, :events_watermark_ms, :fitted_at_ms)
+                ''', fits)
+        finally:
+            conn.close()
     
     # ==================== MÉTHODES POUR LES PRÉDICTIONS ====================
     
     def save_prediction(self, sensor_name, failure_probability, predicted_failure_date, confidence_score):
         """Sauvegarde une prédiction"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO predictions 
-            (sensor_name, failure_probability, predicted_failure_date, confidence_score)
-            VALUES (?, ?, ?, ?)
-        ''', (sensor_name, failure_probability, predicted_failure_date, confidence_score))
-        prediction_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return prediction_id
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO predictions 
+                (sensor_name, failure_probability, predicted_failure_date, confidence_score, created_at_ms)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (sensor_name, failure_probability, predicted_failure_date, confidence_score, now_ms()))
+            prediction_id = cursor.lastrowid
+            conn.commit()
+            return prediction_id
+        finally:
+            conn.close()
     
     def get_latest_predictions(self):
         """Récupère les dernières prédictions pour chaque capteur"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT p1.* FROM predictions p1
-            INNER JOIN (
-                SELECT sensor_name, MAX(created_at) as max_date
-                FROM predictions
-                GROUP BY sensor_name
-            ) p2 ON p1.sensor_name = p2.sensor_name AND p1.created_at = p2.max_date
-        ''')
-        
-        predictions = []
-        for row in cursor.fetchall():
-            prediction = dict(row)
-            # Ajouter des informations calculées
-            prediction['risk_level'] = self._get_risk_level(prediction['failure_probability'])
-            prediction['risk_class'] = self._get_risk_class(prediction['failure_probability'])
+        try:
+            cursor = conn.cursor()
+            # created_at_ms n'est jamais NULL (migration 12, déclencheur de la migration 3)
+            cursor.execute('''
+                SELECT p1.* FROM predictions p1
+                INNER JOIN (
+                    SELECT sensor_name, MAX(created_at_ms) as max_date
+                    FROM predictions
+                    GROUP BY sensor_name
+                ) p2 ON p1.sensor_name = p2.sensor_name AND p1.created_at_ms = p2.max_date
+            ''')
             
-            # Calculer les jours restants
-            if prediction['predicted_failure_date']:
-                try:
-                    failure_date = datetime.fromisoformat(prediction['predicted_failure_date'])
-                    days_left = (failure_date - datetime.now()).days
-                    prediction['days_until_failure'] = max(0, days_left)
-                except:
+            predictions = []
+            for row in cursor.fetchall():
+                prediction = dict(row)
+                # Ajouter des informations calculées
+                prediction['risk_level'] = self._get_risk_level(prediction['failure_probability'])
+                prediction['risk_class'] = self._get_risk_class(prediction['failure_probability'])
+            
+                # Calculer les jours restants
+                if prediction['predicted_failure_date']:
+                    try:
+                        failure_date = datetime.fromisoformat(prediction['predicted_failure_date'])
+                        days_left = (failure_date - datetime.now()).days
+                        prediction['days_until_failure'] = max(0, days_left)
+                    except:
+                        prediction['days_until_failure'] = None
+                else:
                     prediction['days_until_failure'] = None
-            else:
-                prediction['days_until_failure'] = None
             
-            predictions.append(prediction)
-        
-        conn.close()
-        return predictions
+                predictions.append(prediction)
+            
+            return predictions
+        finally:
+            conn.close()
     
     # ==================== MÉTHODES UTILITAIRES ====================
     
@@ -503,7 +1985,7 @@ class Database:
 if __name__ == '__main__':
     # Test de la base de données
     print("🧪 Test de la base de données...")
-    db = Database()
+    db = get_database()
     print("✅ Base de données initialisée avec succès!")
     print("👤 Utilisateur par défaut créé: admin / admin123")
 
@@ -0,0 +1,211 @@
+"""
+Pool de processus de détection d'anomalies
+Les contrôles propres à chaque capteur (seuils, z-score, dérive) sont répartis entre
+processus par hachage du nom de capteur : chaque processus possède l'état glissant de ses
+capteurs et détecte hors du thread d'ingestion et du GIL du serveur. Les processus
+lisent la base en lecture seule (Database.open_read_only : le schéma est tenu par le
+processus principal). Les résultats reviennent par une file unique, consommée par un
+thread du processus principal (création des alertes, diffusion Socket.IO).
+"""
+import queue
+import atexit
+import threading
+import traceback
+import zlib
+import multiprocessing
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from config import Config
+
+
+def partition(sensor_name: str, workers: int) -> int:
+    """Processus propriétaire d'un capteur (hachage stable d'un démarrage à l'autre)"""
+    return zlib.crc32(sensor_name.encode('utf-8')) % workers
+
+
+def _worker_main(index: int, workers: int, check_trend: bool, db_path: Optional[str], inbox, outbox):
+    """Boucle d'un processus de détection : un lot de lectures en entrée, leurs anomalies en sortie"""
+    from anomaly_detector import AnomalyDetector
+    from database import Database
+    
+    sensors = [name for name in Config.SENSOR_THRESHOLDS if partition(name, workers) == index]
+    detector = AnomalyDetector(db=Database.open_read_only(db_path), sensors=sensors, cross_sensor=False)
+    outbox.put(('ready', index, None, sensors))
+    
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        seq, readings = item
+        try:
+            results = detector.detect_sensor_batch(readings, check_trend)
+        except Exception as e:
+            print(f"❌ Erreur détection (processus {index}): {e}")
+            traceback.print_exc()
+            results = [[] for _ in readings]
+        outbox.put(('results', index, seq, results))
+
+
+class DetectionWorkerPool:
+    """
+    `workers` processus, chacun avec sa file d'entrée bornée. `submit` ne bloque jamais :
+    si la file d'un processus est pleine, son sous-lot est diffusé sans détection par
+    capteur et compté dans `dropped_batches` (le thread appelant, écrivain de la file
+    d'ingestion, n'est pas retenu par un processus lent).
+    Un processus arrêté anormalement est relancé avec une nouvelle file (l'ancienne peut
+    rester verrouillée par le processus tué) et son état repréchauffé depuis la base ;
+    ses lots en attente sont comptés comme perdus.
+    
+    `on_results(readings, anomalies_by_reading)` est appelé, depuis le thread collecteur,
+    pour chaque sous-lot traité (lectures d'un même processus, dans l'ordre d'arrivée).
+    """
+    
+    def __init__(self, on_results: Callable[[List[Dict], List[List[Dict]]], None],
+                 workers: Optional[int] = None, check_trend: bool = False, db_path: Optional[str] = None):
+        self.on_results = on_results
+        self.workers = workers or Config.DETECTION_WORKERS or multiprocessing.cpu_count()
+        self.check_trend = check_trend
+        self.db_path = db_path
+        self._context = multiprocessing.get_context(Config.DETECTION_WORKER_START_METHOD)
+        self._inboxes = [self._context.Queue(maxsize=Config.DETECTION_WORKER_QUEUE_SIZE) for _ in range(self.workers)]
+        self._outbox = self._context.Queue()
+        self._processes = [None] * self.workers
+        self._in_flight = [deque() for _ in range(self.workers)]   # (seq, lectures) envoyés, par processus
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._running = False
+        self._collector = None
+        self._metrics = {
+            'submitted_batches': 0,
+            'submitted_readings': 0,
+            'completed_batches': 0,
+            'lost_batches': 0,
+            'dropped_batches': 0,
+            'dropped_readings': 0,
+            'restarts': 0
+        }
+    
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for index in range(self.workers):
+            self._start_worker(index)
+        self._collector = threading.Thread(target=self._collect_loop, name='detection-results', daemon=True)
+        self._collector.start()
+        atexit.register(self.stop)
+        print(f"✅ Pool de détection démarré ({self.workers} processus)")
+    
+    def _start_worker(self, index: int):
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.workers, self.check_trend, self.db_path, self._inboxes[index], self._outbox),
+            name=f'detection-worker-{index}',
+            daemon=True
+        )
+        process.start()
+        self._processes[index] = process
+    
+    def submit(self, readings: List[Dict]):
+        """Répartit un lot entre les processus propriétaires de ses capteurs (sans attente)"""
+        parts = {}
+        for reading in readings:
+            parts.setdefault(partition(reading['sensor_name'], self.workers), []).append(reading)
+        
+        for index, part in parts.items():
+            with self._lock:
+                self._seq += 1
+                seq = self._seq
+                self._in_flight[index].append((seq, part))
+                self._metrics['submitted_batches'] += 1
+                self._metrics['submitted_readings'] += len(part)
+                inbox = self._inboxes[index]
+            try:
+                inbox.put_nowait((seq, part))
+            except queue.Full:
+                with self._lock:
+                    in_flight = self._in_flight[index]
+                    if in_flight and in_flight[-1][0] == seq:
+                        in_flight.pop()
+                    self._metrics['dropped_batches'] += 1
+                    self._metrics['dropped_readings'] += len(part)
+                print(f"⚠️ Processus de détection {index} saturé: {len(part)} lectures sans détection par capteur")
+                self.on_results(part, [[] for _ in part])
+    
+    def _collect_loop(self):
+        while self._running:
+            try:
+                kind, index, seq, payload = self._outbox.get(timeout=1)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                break
+            
+            if kind == 'ready':
+                print(f"✅ Processus de détection {index} prêt ({len(payload)} capteurs)")
+                continue
+            
+            readings = self._complete(index, seq)
+            if readings is None:
+                continue
+            try:
+                self.on_results(readings, payload)
+            except Exception as e:
+                print(f"❌ Erreur publication des résultats de détection: {e}")
+                traceback.print_exc()
+    
+    def _complete(self, index: int, seq: int) -> Optional[List[Dict]]:
+        """Retire le lot `seq` des lots en cours ; les plus anciens sans résultat sont perdus (FIFO)"""
+        with self._lock:
+            in_flight = self._in_flight[index]
+            while in_flight and in_flight[0][0] < seq:
+                in_flight.popleft()
+                self._metrics['lost_batches'] += 1
+            if not in_flight or in_flight[0][0] != seq:
+                return None
+            self._metrics['completed_batches'] += 1
+            return in_flight.popleft()[1]
+    
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if self._running and process is not None and not process.is_alive():
+                print(f"❌ Processus de détection {index} arrêté (code {process.exitcode}), redémarrage")
+                with self._lock:
+                    self._metrics['restarts'] += 1
+                    self._metrics['lost_batches'] += len(self._in_flight[index])
+                    self._in_flight[index].clear()
+                    self._inboxes[index] = self._context.Queue(maxsize=Config.DETECTION_WORKER_QUEUE_SIZE)
+                self._start_worker(index)
+    
+    def stop(self, timeout: float = 5):
+        """Vide les files puis arrête les processus"""
+        if not self._running:
+            return
+        self._running = False
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for process in self._processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        if self._collector:
+            self._collector.join(timeout=timeout)
+        # Résultats arrivés après la dernière lecture du collecteur
+        while True:
+            try:
+                kind, index, seq, payload = self._outbox.get_nowait()
+            except (queue.Empty, EOFError, OSError):
+                break
+            readings = self._complete(index, seq) if kind == 'results' else None
+            if readings is not None:
+                self.on_results(readings, payload)
+        print("🛑 Pool de détection arrêté")
+    
+    def get_stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._metrics)
+            stats['in_flight_batches'] = [len(in_flight) for in_flight in self._in_flight]
+        stats['workers'] = self.workers
+        stats['alive'] = sum(1 for process in self._processes if process is not None and process.is_alive())
+        return stats
@@ -0,0 +1,49 @@
+"""
+Sous-échantillonnage des séries temporelles pour les graphiques
+Largest-Triangle-Three-Buckets (LTTB, Steinarsson 2013) : conserve la forme visuelle
+de la courbe (pics, creux) avec un nombre de points borné
+"""
+import numpy as np
+from typing import Dict, List
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Indices des points retenus par LTTB parmi (x, y), x croissant.
+    Le premier et le dernier point sont toujours conservés ; les autres sont répartis
+    en `threshold - 2` intervalles dont on garde le point formant le plus grand triangle
+    avec le point retenu précédemment et la moyenne de l'intervalle suivant.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    
+    # Bornes des intervalles intermédiaires (points 1 .. n-2)
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    counts = np.diff(edges)
+    
+    # Moyenne de chaque intervalle en une seule passe ; pour le dernier, le « suivant » est le point final
+    next_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / counts, x[-1])[1:]
+    next_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / counts, y[-1])[1:]
+    
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Aire (x2) des triangles (point retenu, candidat, moyenne suivante) pour tout l'intervalle
+        areas = np.abs((x[a] - next_x[i]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (next_y[i] - y[a]))
+        a = lo + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample_points(points: List[Dict], max_points: int, x_key='ts_ms', y_key='value') -> List[Dict]:
+    """Applique LTTB à une liste de points (dictionnaires) si elle dépasse `max_points`"""
+    if max_points is None or len(points) <= max_points:
+        return points
+    x = np.fromiter((point[x_key] for point in points), dtype=np.float64, count=len(points))
+    y = np.fromiter((point[y_key] for point in points), dtype=np.float64, count=len(points))
+    return [points[i] for i in lttb_indices(x, y, max_points)]
@@ -0,0 +1,206 @@
+"""
+Détecteurs de dérive à état constant (O(1) par lecture)
+Carte de contrôle EWMA, CUSUM et Page-Hinkley, comparés à une référence (moyenne et
+écart-type) figée à partir de la fenêtre glissante de l'AnomalyDetector ; activés par
+capteur via Config.SENSOR_DRIFT_DETECTORS
+"""
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Type
+
+
+class DriftDetector(ABC):
+    """
+    Détecteur de dérive d'un capteur. `update` reçoit chaque valeur avec les statistiques de
+    la fenêtre glissante *avant* son ajout (effectif, moyenne, écart-type) et renvoie une
+    anomalie (dict) en cas d'alarme. L'état se limite aux attributs de STATE_FIELDS et à
+    la référence.
+    
+    La référence est la moyenne et l'écart-type de la fenêtre relevés dès qu'elle compte
+    `min_samples` valeurs, puis figés : la fenêtre suit la dérive et la masquerait. Après
+    une alarme, la référence est relevée de nouveau sur la fenêtre courante.
+    """
+    name = 'drift'
+    STATE_FIELDS = ()
+    REFERENCE_FIELDS = ('reference_mean', 'reference_std')
+    
+    def __init__(self, sensor_name: str, min_samples: int = 10):
+        self.sensor_name = sensor_name
+        self.min_samples = min_samples
+        self.reference_mean = None
+        self.reference_std = None
+        self.reset()
+    
+    @abstractmethod
+    def reset(self):
+        """Remise à zéro de l'état du test (hors référence)"""
+    
+    @abstractmethod
+    def step(self, value: float, mean: float, std: float) -> Optional[Dict]:
+        """Mise à jour de l'état par rapport à la référence ; renvoie les détails de l'alarme éventuelle"""
+    
+    def update(self, value: float, unit: str, count: int, mean: float, std: float) -> Optional[Dict]:
+        if self.reference_mean is None:
+            if count < self.min_samples or std <= 0:  # Fenêtre de référence pas encore exploitable
+                return None
+            self.reference_mean, self.reference_std = float(mean), float(std)
+        alarm = self.step(float(value), self.reference_mean, self.reference_std)
+        if alarm is None:
+            return None
+        # Nouveau niveau signalé : référence relevée sur la fenêtre à la prochaine lecture
+        self.reference_mean, self.reference_std = None, None
+        return {
+            'sensor_name': self.sensor_name,
+            'type': f'drift_{self.name}',
+            'message': self.format_message(alarm, unit),
+            'severity': alarm.get('severity', 'medium')
+        }
+    
+    def format_message(self, alarm: Dict, unit: str) -> str:
+        direction = 'hausse' if alarm['direction'] > 0 else 'baisse'
+        return f"Dérive à la {direction} détectée sur {self.sensor_name} ({self.name}: {alarm['statistic']:.2f})"
+    
+    def state_dict(self) -> Dict:
+        """État sérialisable (point de contrôle de la ré-analyse)"""
+        return {field: getattr(self, field) for field in self.STATE_FIELDS + self.REFERENCE_FIELDS}
+    
+    def load_state(self, state: Dict):
+        for field in self.STATE_FIELDS + self.REFERENCE_FIELDS:
+            if field in state:
+                setattr(self, field, state[field])
+
+
+class EWMADetector(DriftDetector):
+    """
+    Carte de contrôle EWMA : z = λ·x + (1-λ)·z, alarme hors de μ ± L·σ·√(λ/(2-λ)·(1-(1-λ)^2t)),
+    μ et σ étant ceux de la référence
+    """
+    name = 'ewma'
+    STATE_FIELDS = ('ewma', 'steps')
+    
+    def __init__(self, sensor_name: str, lambda_: float = 0.2, L: float = 3.0, min_samples: int = 10):
+        self.lambda_ = lambda_
+        self.L = L
+        super().__init__(sensor_name, min_samples)
+    
+    def reset(self):
+        self.ewma = None
+        self.steps = 0
+    
+    def step(self, value, mean, std):
+        previous = mean if self.ewma is None else self.ewma   # z₀ = μ
+        self.ewma = self.lambda_ * value + (1 - self.lambda_) * previous
+        self.steps += 1
+        width = self.L * std * (self.lambda_ / (2 - self.lambda_) * (1 - (1 - self.lambda_) ** (2 * self.steps))) ** 0.5
+        if abs(self.ewma - mean) <= width:
+            return None
+        statistic, direction = self.ewma, 1 if self.ewma > mean else -1
+        self.reset()
+        return {'statistic': statistic, 'direction': direction, 'limit': width}
+    
+    def format_message(self, alarm, unit):
+        direction = 'hausse' if alarm['direction'] > 0 else 'baisse'
+        return (f"Dérive à la {direction} détectée sur {self.sensor_name} "
+                f"(EWMA {alarm['statistic']:.2f} {unit} hors limites ±{alarm['limit']:.2f})")
+
+
+class CUSUMDetector(DriftDetector):
+    """
+    CUSUM bilatéral sur l'écart normalisé (x - μ) / σ : S⁺ = max(0, S⁺ + s - k),
+    S⁻ = max(0, S⁻ - s - k), alarme quand S⁺ ou S⁻ dépasse h
+    """
+    name = 'cusum'
+    STATE_FIELDS = ('upper', 'lower')
+    
+    def __init__(self, sensor_name: str, k: float = 0.5, h: float = 5.0, min_samples: int = 10):
+        self.k = k
+        self.h = h
+        super().__init__(sensor_name, min_samples)
+    
+    def reset(self):
+        self.upper = 0.0
+        self.lower = 0.0
+    
+    def step(self, value, mean, std):
+        deviation = (value - mean) / std
+        self.upper = max(0.0, self.upper + deviation - self.k)
+        self.lower = max(0.0, self.lower - deviation - self.k)
+        if self.upper <= self.h and self.lower <= self.h:
+            return None
+        alarm = {'statistic': max(self.upper, self.lower), 'direction': 1 if self.upper > self.h else -1}
+        self.reset()
+        return alarm
+
+
+class PageHinkleyDetector(DriftDetector):
+    """
+    Test de Page-Hinkley : cumul (avec oubli α) des écarts à la moyenne courante du capteur,
+    normalisés par le σ de référence, au-delà de la tolérance δ ; alarme quand le cumul dépasse λ
+    """
+    name = 'page_hinkley'
+    STATE_FIELDS = ('count', 'mean', 'upper', 'lower')
+    
+    def __init__(self, sensor_name: str, delta: float = 0.1, threshold: float = 20.0,
+                 alpha: float = 0.999, min_samples: int = 10):
+        self.delta = delta
+        self.threshold = threshold
+        self.alpha = alpha
+        super().__init__(sensor_name, min_samples)
+    
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.upper = 0.0
+        self.lower = 0.0
+    
+    def step(self, value, mean, std):
+        self.count += 1
+        self.mean += (value - self.mean) / self.count
+        deviation = (value - self.mean) / std
+        self.upper = max(0.0, self.alpha * self.upper + deviation - self.delta)
+        self.lower = max(0.0, self.alpha * self.lower - deviation - self.delta)
+        if self.upper <= self.threshold and self.lower <= self.threshold:
+            return None
+        alarm = {'statistic': max(self.upper, self.lower), 'direction': 1 if self.upper > self.threshold else -1}
+        self.reset()
+        return alarm
+
+
+# Registre des détecteurs disponibles (nom utilisé dans Config.SENSOR_DRIFT_DETECTORS)
+DRIFT_DETECTORS: Dict[str, Type[DriftDetector]] = {
+    'ewma': EWMADetector,
+    'cusum': CUSUMDetector,
+    'page_hinkley': PageHinkleyDetector
+}
+
+
+def register_detector(name: str, detector_class: Type[DriftDetector]):
+    """Ajoute un détecteur au registre"""
+    DRIFT_DETECTORS[name] = detector_class
+
+
+def create_detectors(sensor_name: str, specs: Optional[Dict[str, Dict]]) -> List[DriftDetector]:
+    """Instancie les détecteurs configurés pour un capteur ({nom: paramètres})"""
+    detectors = []
+    for name, params in (specs or {}).items():
+        detector_class = DRIFT_DETECTORS.get(name)
+        if detector_class is None:
+            print(f"❌ Détecteur de dérive inconnu pour {sensor_name}: {name}")
+            continue
+        detectors.append(detector_class(sensor_name, **(params or {})))
+    return detectors
+
+
+def run_detectors(detectors: List[DriftDetector], values, units, counts, means, stds) -> Dict[int, List[Dict]]:
+    """
+    Passe une série chronologique (avec les statistiques de fenêtre de chaque valeur) dans
+    les détecteurs d'un capteur ; renvoie les anomalies par indice de lecture
+    """
+    anomalies = {}
+    if not detectors:
+        return anomalies
+    for k in range(len(values)):
+        for detector in detectors:
+            anomaly = detector.update(values[k], units[k], int(counts[k]), float(means[k]), float(stds[k]))
+            if anomaly:
+                anomalies.setdefault(k, []).append(anomaly)
+    return anomalies
@@ -4,6 +4,7 @@ Communication simplifiée avec ESP32 via requêtes POST
 """
 import os
 import json
+import math
 import traceback
 from datetime import datetime, timedelta
 from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session
@@ -11,19 +12,32 @@ from flask_login import LoginManager, login_user, logout_user, login_required, c
 from flask_socketio import SocketIO, emit
 import threading
 import time
+import atexit
 
 # Importer les modules du projet
 from config import Config
-from database import Database
+from database import get_database
 from models import User
 from anomaly_detector import AnomalyDetector
 from predictive_maintenance import PredictiveMaintenance
 from http_simulator import HTTPSimulator
+from ingest_queue import IngestQueue, IngestQueueFull
+from dashboard_service import DashboardService
+from alert_aggregator import AlertAggregator
+from detection_workers import DetectionWorkerPool
+from calibration_drift import CalibrationDriftAnalyzer
+from background_jobs import PeriodicJob
+from predictive_scheduler import PredictiveScheduler
 
 # Variables globales
 anomaly_detector = None
 predictive_maintenance = None
+predictive_scheduler = None
 http_simulator = None
+ingest_queue = None
+alert_aggregator = None
+detection_pool = None
+background_jobs = {}
 is_initialized = False
 
 # Initialiser l'application Flask
@@ -51,7 +65,8 @@ socketio = SocketIO(
 
 # Initialiser la base de données
 try:
-    db = Database()
+    db = get_database()
+    dashboard_service = DashboardService(db)
     print("✅ Base de données initialisée")
 except Exception as e:
     print(f"❌ Erreur d'initialisation de la base de données: {e}")
@@ -123,46 +138,10 @@ def index():
 @login_required
 def dashboard():
     try:
-        # Récupérer les dernières lectures de capteurs
-        recent_readings = {}
-        for sensor_name in Config.SENSOR_THRESHOLDS.keys():
-            try:
-                readings = db.get_recent_readings(sensor_name, limit=1)
-                if readings:
-                    recent_readings[sensor_name] = readings[0]
-            except Exception as e:
-                print(f"❌ Erreur lecture capteur {sensor_name}: {e}")
+        # Dernières lectures, alertes, prédictions, maintenances et compteurs en quelques requêtes agrégées
+        data = dashboard_service.get_dashboard_data(alerts_limit=5, maintenance_limit=3)
         
-        # Récupérer les alertes actives
-        active_alerts = db.get_active_alerts(limit=5)
-        
-        # Récupérer les dernières prédictions
-        latest_predictions = db.get_latest_predictions()
-        
-        # Récupérer les maintenances planifiées
-        planned_maintenance = db.get_maintenance_records(status='planned', limit=3)
-        
-        # Calculer les statistiques
-        all_active_alerts = db.get_active_alerts()
-        all_resolved_alerts = db.get_resolved_alerts()
-        
-        stats = {
-            'sensors_count': len(Config.SENSOR_THRESHOLDS),
-            'active_alerts_count': len(all_active_alerts),
-            'resolved_alerts_count': len(all_resolved_alerts),
-            'total_alerts_count': len(all_active_alerts) + len(all_resolved_alerts),
-            'high_risk_sensors_count': sum(1 for p in latest_predictions if float(p.get('failure_probability', 0)) > 0.6),
-            'planned_maintenance_count': len(db.get_maintenance_records(status='planned'))
-        }
-        
-        return render_template(
-            'dashboard.html',
-            recent_readings=recent_readings,
-            active_alerts=active_alerts,
-            latest_predictions=latest_predictions,
-            planned_maintenance=planned_maintenance,
-            stats=stats
-        )
+        return render_template('dashboard.html', **data)
         
     except Exception as e:
         print(f"❌ Erreur dashboard: {e}")
@@ -355,7 +334,7 @@ def receive_sensor_data():
         
         print(f"📡 Données reçues de l'ESP32: {data}")
         
-        # Traiter les données selon le type de capteur
+        # Valider puis confier les lectures à la file d'ingestion
         sensor_type = data.get('sensor_type', 'unknown')
         
         if sensor_type == 'npk_8in1':
@@ -367,12 +346,29 @@ def receive_sensor_data():
         else:
             print(f"⚠️ Type de capteur inconnu: {sensor_type}")
         
-        return jsonify({'status': 'success', 'message': 'Données reçues et traitées'})
+        return jsonify({'status': 'success', 'message': 'Données reçues et mises en file'})
+        
+    except IngestQueueFull as e:
+        print(f"⚠️ Ingestion saturée: {e}")
+        response = jsonify({'error': str(e)})
+        response.headers['Retry-After'] = str(Config.INGEST_RETRY_AFTER)
+        return response, 503
+        
+    except (TypeError, ValueError) as e:
+        print(f"⚠️ Données invalides: {e}")
+        return jsonify({'error': f'Données invalides: {e}'}), 400
         
     except Exception as e:
         print(f"❌ Erreur lors du traitement des données: {e}")
         return jsonify({'error': str(e)}), 500
 
+def parse_reading_value(key, raw_value):
+    """Valeur numérique d'une mesure ; NaN et infinis sont refusés (HTTP 400)"""
+    value = float(raw_value)
+    if not math.isfinite(value):
+        raise ValueError(f"valeur non finie pour {key}: {raw_value}")
+    return value
+
 def process_npk_data(data):
     """Traite les données du capteur NPK 8-en-1"""
     sensor_readings = []
@@ -393,23 +389,15 @@ def process_npk_data(data):
             reading = {
                 'sensor_type': 'npk_8in1',
                 'sensor_name': sensor_name,
-                'value': float(data[key]),
+                'value': parse_reading_value(key, data[key]),
                 'unit': unit,
                 'timestamp': datetime.now()
             }
             sensor_readings.append(reading)
             
             print(f"📊 {sensor_name}: {reading['value']} {unit}")
-            
-            # Sauvegarder en base
-            db.insert_sensor_reading(
-                reading['sensor_type'],
-                reading['sensor_name'],
-                reading['value'],
-                reading['unit']
-            )
     
-    process_sensor_readings(sensor_readings)
+    store_sensor_readings(sensor_readings)
 
 def process_water_level_data(data):
     """Traite les données du capteur de niveau d'eau"""
@@ -425,22 +413,15 @@ def process_water_level_data(data):
             reading = {
                 'sensor_type': 'water_level',
                 'sensor_name': sensor_name,
-                'value': float(data[key]),
+                'value': parse_reading_value(key, data[key]),
                 'unit': unit,
                 'timestamp': datetime.now()
             }
             sensor_readings.append(reading)
             
             print(f"💧 {sensor_name}: {reading['value']} {unit}")
-            
-            db.insert_sensor_reading(
-                reading['sensor_type'],
-                reading['sensor_name'],
-                reading['value'],
-                reading['unit']
-            )
     
-    process_sensor_readings(sensor_readings)
+    store_sensor_readings(sensor_readings)
 
 def process_water_flow_data(data):
     """Traite les données du capteur de débit d'eau"""
@@ -456,49 +437,65 @@ def process_water_flow_data(data):
             reading = {
                 'sensor_type': 'water_flow',
                 'sensor_name': sensor_name,
-                'value': float(data[key]),
+                'value': parse_reading_value(key, data[key]),
                 'unit': unit,
                 'timestamp': datetime.now()
             }
             sensor_readings.append(reading)
             
             print(f"🌊 {sensor_name}: {reading['value']} {unit}")
-            
-            db.insert_sensor_reading(
-                reading['sensor_type'],
-                reading['sensor_name'],
-                reading['value'],
-                reading['unit']
-            )
     
-    process_sensor_readings(sensor_readings)
+    store_sensor_readings(sensor_readings)
+
+def store_sensor_readings(readings):
+    """Confie les lectures à la file d'ingestion (écriture groupée puis détection)"""
+    if ingest_queue:
+        ingest_queue.submit(readings)
+    else:
+        db.insert_sensor_readings(readings)
+        process_sensor_readings(readings)
+
+def publish_anomaly(anomaly):
+    """Crée l'alerte d'une anomalie et la diffuse (les répétitions d'une alerte active
+    sont seulement comptées, sans nouvelle ligne ni diffusion)"""
+    alert_id = alert_aggregator.submit(anomaly)
+    if alert_id is None:
+        return
+    
+    print(f"🚨 ALERTE {anomaly['severity']}: {anomaly['message']}")
+    
+    # Émettre l'alerte via WebSocket
+    socketio.emit('new_alert', {
+        'id': alert_id,
+        'sensor_name': anomaly['sensor_name'],
+        'type': anomaly['type'],
+        'message': anomaly['message'],
+        'severity': anomaly['severity'],
+        'timestamp': datetime.now().isoformat()
+    })
 
 def process_sensor_readings(readings):
     """Traite les lectures de capteurs pour détecter les anomalies"""
-    for reading in readings:
-        # Détecter les anomalies
-        anomalies = anomaly_detector.detect_all_anomalies(reading)
+    if detection_pool:
+        # Contrôles par capteur dans le pool de processus (publiés par publish_readings) ;
+        # ici seulement les contrôles inter-capteurs, qui voient toutes les lectures
+        detection_pool.submit(readings)
+        for anomalies in anomaly_detector.detect_cross_sensor(readings):
+            for anomaly in anomalies:
+                publish_anomaly(anomaly)
+        alert_aggregator.flush_if_due()
+        return
+    
+    # Détecter les anomalies de tout le lot en une passe vectorisée
+    publish_readings(readings, anomaly_detector.detect_batch(readings))
+
+def publish_readings(readings, anomalies_by_reading):
+    """Publie les anomalies d'un lot et diffuse ses lectures en temps réel"""
+    for reading, anomalies in zip(readings, anomalies_by_reading):
         
         # Créer des alertes pour chaque anomalie détectée
         for anomaly in anomalies:
-            alert_id = db.create_alert(
-                sensor_name=anomaly['sensor_name'],
-                alert_type=anomaly['type'],
-                message=anomaly['message'],
-                severity=anomaly['severity']
-            )
-            
-            print(f"🚨 ALERTE {anomaly['severity']}: {anomaly['message']}")
-            
-            # Émettre l'alerte via WebSocket
-            socketio.emit('new_alert', {
-                'id': alert_id,
-                'sensor_name': anomaly['sensor_name'],
-                'type': anomaly['type'],
-                'message': anomaly['message'],
-                'severity': anomaly['severity'],
-                'timestamp': datetime.now().isoformat()
-            })
+            publish_anomaly(anomaly)
         
         # Émettre les données en temps réel via WebSocket
         socketio.emit('sensor_data', {
@@ -508,6 +505,8 @@ def process_sensor_readings(readings):
             'timestamp': reading['timestamp'].isoformat(),
             'anomalies_count': len(anomalies)
         })
+    
+    alert_aggregator.flush_if_due()
 
 # ==================== AUTRES ROUTES API ====================
 
@@ -525,6 +524,26 @@ def api_alerts_count():
         print(f"❌ Erreur API compteur alertes: {e}")
         return jsonify({'error': str(e), 'success': False}), 500
 
+@app.route('/api/metrics')
+@login_required
+def api_metrics():
+    """API exposant les métriques internes (pool de connexions, ...)"""
+    try:
+        return jsonify({
+            'database_pool': db.get_pool_stats(),
+            'ingest_queue': ingest_queue.get_metrics() if ingest_queue else None,
+            'anomaly_history_cache': anomaly_detector.get_cache_stats() if anomaly_detector else None,
+            'correlation_engine': anomaly_detector.get_correlation_stats() if anomaly_detector else None,
+            'communication_monitor': anomaly_detector.get_communication_stats() if anomaly_detector else None,
+            'background_jobs': {name: job.get_status() for name, job in background_jobs.items()},
+            'alert_aggregator': alert_aggregator.get_stats() if alert_aggregator else None,
+            'detection_pool': detection_pool.get_stats() if detection_pool else None,
+            'success': True
+        })
+    except Exception as e:
+        print(f"❌ Erreur API métriques: {e}")
+        return jsonify({'error': str(e), 'success': False}), 500
+
 @app.route('/alerts/resolve/<int:alert_id>', methods=['POST'])
 @login_required
 def resolve_alert(alert_id):
@@ -532,6 +551,8 @@ def resolve_alert(alert_id):
         print(f"🔧 Tentative de résolution de l'alerte {alert_id}")
         success = db.resolve_alert(alert_id)
         if success:
+            if alert_aggregator:
+                alert_aggregator.forget(alert_id)
             print(f"✅ Alerte {alert_id} résolue")
             socketio.emit('alert_resolved', {'alert_id': alert_id})
             return jsonify({'success': True, 'message': 'Alerte résolue avec succès'})
@@ -568,40 +589,46 @@ def update_maintenance(maintenance_id):
 def api_sensor_data(sensor_name):
     try:
         hours = int(request.args.get('hours', 24))
+        # Résolution souhaitée en secondes (optionnelle) ; l'agrégat le plus grossier compatible est utilisé
+        resolution = request.args.get('resolution', type=float)
+        # Nombre maximal de points renvoyés (sous-échantillonnage LTTB côté serveur)
+        max_points = (request.args.get('points', type=int) or request.args.get('max_points', type=int)
+                      or Config.MAX_CHART_POINTS)
+        max_points = max(3, max_points)
         end_time = datetime.now()
         start_time = end_time - timedelta(hours=hours)
         
-        readings = db.get_readings_by_timerange(start_time, end_time, sensor_name)
-        
-        data = [
-            {
-                'timestamp': reading['timestamp'],
-                'value': reading['value'],
-                'unit': reading['unit']
-            } for reading in readings
-        ]
+        history = db.get_sensor_history(sensor_name, start_time, end_time, resolution, max_points)
         
-        return jsonify(data)
+        response = jsonify(history['points'])
+        response.headers['X-Data-Resolution'] = str(history['resolution_s'])
+        response.headers['X-Total-Points'] = str(history['total_points'])
+        return response
         
     except Exception as e:
         print(f"❌ Erreur API données capteur {sensor_name}: {e}")
         return jsonify({'error': str(e)}), 500
 
+def enqueue_predictive_analysis(full=False):
+    """Met une analyse prédictive en file ; le résultat est diffusé par Socket.IO et suivi par identifiant"""
+    if not predictive_scheduler:
+        return jsonify({'success': False, 'error': 'Module de maintenance prédictive non disponible'}), 500
+    
+    job = predictive_scheduler.enqueue(full=full)
+    return jsonify({
+        'success': True,
+        'message': 'Analyse prédictive programmée',
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'status_url': url_for('api_predictive_analysis_status', job_id=job['job_id'])
+    }), 202
+
 @app.route('/api/run_predictive_analysis', methods=['POST'])
 @login_required
 def api_run_predictive_analysis():
+    """Analyse des capteurs dont les données ou les paramètres ont changé"""
     try:
-        if not predictive_maintenance:
-            return jsonify({'success': False, 'error': 'Module de maintenance prédictive non disponible'}), 500
-        
-        results = predictive_maintenance.run_predictive_analysis()
-        
-        return jsonify({
-            'success': True, 
-            'message': f'Analyse terminée, {results["sensors_analyzed"]} capteurs analysés',
-            'results': results
-        })
-        
+        return enqueue_predictive_analysis()
     except Exception as e:
         print(f"❌ Erreur analyse prédictive: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -609,45 +636,24 @@ def api_run_predictive_analysis():
 @app.route('/api/force_predictive_analysis', methods=['POST'])
 @login_required
 def api_force_predictive_analysis():
-    """Force l'exécution de l'analyse prédictive"""
+    """Force l'analyse prédictive de tous les capteurs"""
     try:
-        if not predictive_maintenance:
-            return jsonify({'success': False, 'error': 'Module de maintenance prédictive non disponible'}), 500
-        
         print("🔄 Forçage de l'analyse prédictive...")
-        
-        # Supprimer les anciennes prédictions
-        try:
-            conn = db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM predictions")
-            conn.commit()
-            conn.close()
-            print("✅ Anciennes prédictions supprimées")
-        except Exception as db_error:
-            print(f"⚠️ Erreur lors de la suppression des anciennes prédictions: {db_error}")
-            # Continuer malgré l'erreur
-        
-        # Exécuter l'analyse pour tous les capteurs
-        try:
-            results = predictive_maintenance.run_predictive_analysis()
-            print(f"✅ Analyse terminée: {results}")
-        except Exception as analysis_error:
-            print(f"❌ Erreur lors de l'analyse prédictive: {analysis_error}")
-            traceback.print_exc()
-            return jsonify({'success': False, 'error': str(analysis_error)}), 500
-        
-        return jsonify({
-            'success': True, 
-            'message': f'Analyse terminée, {results.get("sensors_analyzed", 0)} capteurs analysés',
-            'results': results
-        })
-        
+        return enqueue_predictive_analysis(full=True)
     except Exception as e:
         print(f"❌ Erreur analyse prédictive forcée: {e}")
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/predictive_analysis/<job_id>')
+@login_required
+def api_predictive_analysis_status(job_id):
+    """État d'une demande d'analyse prédictive (queued, running, completed, failed)"""
+    job = predictive_scheduler.get_request(job_id) if predictive_scheduler else None
+    if job is None:
+        return jsonify({'success': False, 'error': 'Analyse inconnue'}), 404
+    return jsonify({'success': True, **job})
+
 
 
 # ==================== ÉVÉNEMENTS WEBSOCKET ====================
@@ -685,9 +691,34 @@ def internal_error(error):
 
 # ==================== INITIALISATION DES SERVICES ====================
 
+def watch_communication():
+    """Vérifie périodiquement les pertes de communication (seules les échéances expirées sont parcourues)"""
+    while True:
+        time.sleep(Config.COMM_LOSS_CHECK_INTERVAL_S)
+        try:
+            for anomaly in anomaly_detector.detect_communication_loss():
+                publish_anomaly(anomaly)
+            alert_aggregator.flush_if_due()
+        except Exception as e:
+            print(f"❌ Erreur surveillance des communications: {e}")
+
+def run_calibration_drift():
+    """Analyse des dérives d'étalonnage sur les agrégats journaliers (tâche de fond)"""
+    anomalies = CalibrationDriftAnalyzer(db).detect()
+    for anomaly in anomalies:
+        publish_anomaly(anomaly)
+    alert_aggregator.flush()
+    return {'drifting_sensors': [anomaly['sensor_name'] for anomaly in anomalies]}
+
+def publish_predictive_results(summary):
+    """Diffuse le résultat d'une analyse prédictive (tâche de fond) aux clients"""
+    print(f"✅ Analyse prédictive terminée: {summary['sensors_analyzed']} capteurs analysés, "
+          f"{summary['sensors_skipped']} inchangés")
+    socketio.emit('predictive_analysis', summary)
+
 def initialize_services():
     """Initialise les services en arrière-plan"""
-    global anomaly_detector, predictive_maintenance, http_simulator, is_initialized
+    global anomaly_detector, predictive_maintenance, predictive_scheduler, http_simulator, ingest_queue, alert_aggregator, detection_pool, is_initialized
     
     if is_initialized:
         return
@@ -696,13 +727,40 @@ def initialize_services():
         print("🔧 Initialisation des services...")
         
         # Initialiser le détecteur d'anomalies
-        anomaly_detector = AnomalyDetector()
+        # (données simulées : pertes de communication signalées seulement sur opt-in)
+        if Config.DETECTION_WORKERS > 0:
+            # Capteurs répartis entre processus ; le détecteur local ne garde que l'inter-capteurs
+            detection_pool = DetectionWorkerPool(publish_readings, workers=Config.DETECTION_WORKERS)
+            detection_pool.start()
+            anomaly_detector = AnomalyDetector(simulation=True, sensors=[])
+        else:
+            anomaly_detector = AnomalyDetector(simulation=True)
         print("✅ Détecteur d'anomalies initialisé")
         
+        # Dédoublonnage des alertes répétées (compteur d'occurrences)
+        alert_aggregator = AlertAggregator(db)
+        atexit.register(alert_aggregator.flush)
+        
         # Initialiser le module de maintenance prédictive
         predictive_maintenance = PredictiveMaintenance()
+        predictive_scheduler = PredictiveScheduler(predictive_maintenance, on_results=publish_predictive_results)
         print("✅ Module de maintenance prédictive initialisé")
         
+        # Démarrer la file d'ingestion (écriture + détection hors requête HTTP)
+        ingest_queue = IngestQueue(db, on_commit=process_sensor_readings)
+        ingest_queue.start()
+        
+        # Surveillance des pertes de communication
+        threading.Thread(target=watch_communication, name='communication-watch', daemon=True).start()
+        
+        # Tâches de fond (jamais sur le chemin d'ingestion)
+        background_jobs['calibration-drift'] = PeriodicJob(
+            'calibration-drift', run_calibration_drift, Config.CALIBRATION_DRIFT_INTERVAL_S, initial_delay_s=60
+        )
+        background_jobs['predictive-analysis'] = predictive_scheduler.job
+        for job in background_jobs.values():
+            job.start()
+        
         # Initialiser le simulateur HTTP
         http_simulator = HTTPSimulator()
         print("✅ Simulateur HTTP initialisé")
@@ -727,7 +785,9 @@ def initialize_services():
         traceback.print_exc()
 
 # Initialiser automatiquement au chargement du module
-initialize_services()
+# (sauf dans les processus de détection, qui réexécutent le script principal sous '__mp_main__')
+if __name__ != '__mp_main__':
+    initialize_services()
 
 # Point d'entrée principal
 if __name__ == '__main__':
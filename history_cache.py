@@ -0,0 +1,107 @@
+"""
+Cache borné de l'historique récent des capteurs (détection d'anomalies)
+Les nouvelles lectures sont ajoutées aux entrées en cache au lieu de les invalider,
+les lectures sorties de la fenêtre sont retirées, et la mémoire totale est plafonnée (LRU)
+"""
+import threading
+from collections import OrderedDict, deque
+from typing import Callable, Dict, List
+from config import Config
+from database import now_ms
+
+
+class HistoryCache:
+    """
+    Historique par (capteur, fenêtre en heures), trié par ts_ms croissant.
+    La taille est comptée en lectures sur l'ensemble des entrées ; au-delà de
+    `max_rows`, les entrées les moins récemment consultées sont évincées.
+    """
+    
+    def __init__(self, max_rows=None):
+        self.max_rows = max_rows or Config.ANOMALY_HISTORY_CACHE_MAX_ROWS
+        self._entries = OrderedDict()   # (capteur, heures) -> deque de lectures
+        self._keys_by_sensor = {}       # capteur -> clés en cache
+        self._rows = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'appended_rows': 0, 'trimmed_rows': 0}
+    
+    def get(self, sensor_name: str, hours: int, loader: Callable[[], List[Dict]]) -> List[Dict]:
+        """Historique de la fenêtre ; `loader` n'est appelé (base de données) qu'en cas d'absence"""
+        key = (sensor_name, hours)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._trim(key, entry)
+                self._stats['hits'] += 1
+                return list(entry)
+            self._stats['misses'] += 1
+        
+        data = loader()
+        
+        with self._lock:
+            if key not in self._entries:
+                entry = deque(data)
+                self._entries[key] = entry
+                self._keys_by_sensor.setdefault(sensor_name, set()).add(key)
+                self._rows += len(entry)
+                self._trim(key, entry)
+                self._evict()
+        return list(data)
+    
+    def append(self, reading: Dict):
+        """Ajoute une nouvelle lecture à toutes les fenêtres en cache de son capteur"""
+        with self._lock:
+            for key in self._keys_by_sensor.get(reading['sensor_name'], ()):
+                entry = self._entries[key]
+                entry.append(reading)
+                self._rows += 1
+                self._stats['appended_rows'] += 1
+                self._trim(key, entry)
+            self._evict()
+    
+    def extend(self, sensor_name: str, readings: List[Dict]):
+        """Ajoute un lot de lectures d'un même capteur (ordre chronologique)"""
+        if not readings:
+            return
+        with self._lock:
+            for key in self._keys_by_sensor.get(sensor_name, ()):
+                entry = self._entries[key]
+                entry.extend(readings)
+                self._rows += len(readings)
+                self._stats['appended_rows'] += len(readings)
+                self._trim(key, entry)
+            self._evict()
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_sensor.clear()
+            self._rows = 0
+    
+    def get_stats(self) -> Dict:
+        """Compteurs de succès / échecs / évictions et occupation du cache"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+            stats['entries'] = len(self._entries)
+            stats['rows'] = self._rows
+            stats['max_rows'] = self.max_rows
+            return stats
+    
+    def _trim(self, key, entry):
+        """Retire les lectures sorties de la fenêtre de l'entrée"""
+        cutoff_ms = now_ms() - key[1] * 3600 * 1000
+        while entry and (entry[0].get('ts_ms') or 0) < cutoff_ms:
+            entry.popleft()
+            self._rows -= 1
+            self._stats['trimmed_rows'] += 1
+    
+    def _evict(self):
+        """Évince les entrées les moins récemment utilisées tant que la limite est dépassée"""
+        while self._rows > self.max_rows and self._entries:
+            (sensor_name, hours), entry = self._entries.popitem(last=False)
+            self._keys_by_sensor[sensor_name].discard((sensor_name, hours))
+            self._rows -= len(entry)
+            self._stats['evictions'] += 1
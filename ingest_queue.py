@@ -0,0 +1,208 @@
+"""
+File d'ingestion asynchrone (write-behind) pour les lectures de capteurs
+Les lectures sont regroupées et écrites par un thread dédié (group commit)
+"""
+import time
+import atexit
+import sqlite3
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional
+from config import Config
+from database import now_ms, to_epoch_ms
+
+
+class IngestQueueFull(Exception):
+    """Levée lorsque la file d'ingestion est pleine ou arrêtée (contre-pression)"""
+
+
+class IngestQueue:
+    """
+    File bornée de lectures de capteurs vidée par un thread d'écriture.
+    
+    Le thread regroupe les lectures et les écrit en une transaction dès que
+    `batch_size` lignes sont en attente ou que `flush_interval_ms` s'est écoulé
+    depuis la plus ancienne lecture non écrite. Après chaque commit, le callback
+    `on_commit` reçoit le lot (détection d'anomalies, diffusion WebSocket...).
+    
+    Un lot refusé pour une erreur transitoire (base verrouillée, pool saturé) est réessayé
+    avec un délai croissant ; s'il échoue encore, ou pour toute autre erreur, ses lectures
+    sont écrites une par une afin qu'une lecture invalide n'entraîne pas la perte des autres.
+    """
+    
+    def __init__(self, db, on_commit: Optional[Callable[[List[Dict]], None]] = None,
+                 max_size=None, batch_size=None, flush_interval_ms=None):
+        self.db = db
+        self.on_commit = on_commit
+        self.max_size = max_size or Config.INGEST_QUEUE_MAX_SIZE
+        self.batch_size = batch_size or Config.INGEST_BATCH_SIZE
+        self.flush_interval = (flush_interval_ms or Config.INGEST_FLUSH_INTERVAL_MS) / 1000.0
+        self.write_retries = Config.INGEST_WRITE_RETRIES
+        self.retry_backoff = Config.INGEST_WRITE_RETRY_BACKOFF_MS / 1000.0
+        
+        self._lock = threading.Condition(threading.Lock())
+        self._pending = deque()        # Lectures en attente d'écriture
+        self._oldest_enqueued = None   # Instant d'arrivée de la plus ancienne lecture
+        self._running = False
+        self._thread = None
+        
+        self._metrics = {
+            'enqueued_rows': 0,
+            'rejected_rows': 0,
+            'committed_rows': 0,
+            'failed_rows': 0,
+            'retried_batches': 0,
+            'row_by_row_batches': 0,
+            'batches': 0,
+            'max_depth': 0,
+            'commit_latency_last_ms': 0.0,
+            'commit_latency_max_ms': 0.0,
+            'commit_latency_total_ms': 0.0
+        }
+    
+    def start(self):
+        """Démarre le thread d'écriture"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        
+        self._thread = threading.Thread(target=self._writer_loop, name='ingest-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        print(f"✅ File d'ingestion démarrée (lot: {self.batch_size} lignes / {self.flush_interval * 1000:.0f} ms)")
+    
+    def submit(self, readings: List[Dict]):
+        """Ajoute les lectures d'un message ; lève IngestQueueFull si la file est saturée"""
+        if not readings:
+            return
+        
+        with self._lock:
+            if not self._running:
+                self._metrics['rejected_rows'] += len(readings)
+                raise IngestQueueFull("File d'ingestion arrêtée")
+            if len(self._pending) + len(readings) > self.max_size:
+                self._metrics['rejected_rows'] += len(readings)
+                raise IngestQueueFull(f"File d'ingestion pleine ({len(self._pending)}/{self.max_size} lectures)")
+            
+            # Horodatage de la lecture (celui vu par la détection), pas celui du commit
+            received_ms = now_ms()
+            for reading in readings:
+                if not reading.get('ts_ms'):
+                    reading['ts_ms'] = to_epoch_ms(reading.get('timestamp')) or received_ms
+            
+            was_empty = not self._pending
+            if was_empty:
+                self._oldest_enqueued = time.monotonic()
+            self._pending.extend(readings)
+            self._metrics['enqueued_rows'] += len(readings)
+            self._metrics['max_depth'] = max(self._metrics['max_depth'], len(self._pending))
+            
+            # Réveiller l'écrivain pour qu'il arme son délai ou écrive un lot complet
+            if was_empty or len(self._pending) >= self.batch_size:
+                self._lock.notify()
+    
+    def stop(self, timeout=10.0):
+        """Arrête le thread après avoir écrit toutes les lectures en attente"""
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._lock.notify()
+        
+        if self._thread and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout=timeout)
+        print(f"🛑 File d'ingestion arrêtée ({self._metrics['committed_rows']} lectures écrites)")
+    
+    def _next_batch(self) -> List[Dict]:
+        """Attend qu'un lot soit prêt (taille ou délai atteint, ou arrêt)"""
+        with self._lock:
+            while True:
+                if self._pending:
+                    waited = time.monotonic() - self._oldest_enqueued
+                    if (len(self._pending) >= self.batch_size or waited >= self.flush_interval
+                            or not self._running):
+                        count = min(len(self._pending), self.batch_size)
+                        batch = [self._pending.popleft() for _ in range(count)]
+                        self._oldest_enqueued = time.monotonic() if self._pending else None
+                        return batch
+                    self._lock.wait(self.flush_interval - waited)
+                elif not self._running:
+                    return []
+                else:
+                    self._lock.wait()
+    
+    def _writer_loop(self):
+        """Boucle du thread d'écriture"""
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                break
+            
+            started = time.perf_counter()
+            batch = self._write(batch)
+            if not batch:
+                continue
+            latency_ms = (time.perf_counter() - started) * 1000
+            
+            with self._lock:
+                self._metrics['batches'] += 1
+                self._metrics['committed_rows'] += len(batch)
+                self._metrics['commit_latency_last_ms'] = latency_ms
+                self._metrics['commit_latency_max_ms'] = max(self._metrics['commit_latency_max_ms'], latency_ms)
+                self._metrics['commit_latency_total_ms'] += latency_ms
+            
+            if self.on_commit:
+                try:
+                    self.on_commit(batch)
+                except Exception as e:
+                    print(f"❌ Erreur de traitement après écriture: {e}")
+    
+    def _write(self, batch: List[Dict]) -> List[Dict]:
+        """Écrit un lot (réessais puis écriture ligne par ligne) ; renvoie les lectures écrites"""
+        delay = self.retry_backoff
+        for attempt in range(self.write_retries + 1):
+            try:
+                self.db.insert_sensor_readings(batch)
+                return batch
+            except sqlite3.IntegrityError as e:
+                print(f"❌ Lot refusé ({len(batch)} lectures): {e}")
+                break
+            except sqlite3.OperationalError as e:
+                # Base verrouillée ou pool saturé : erreur transitoire
+                if attempt == self.write_retries:
+                    print(f"❌ Erreur d'écriture du lot ({len(batch)} lectures) après {attempt} réessais: {e}")
+                    break
+                with self._lock:
+                    self._metrics['retried_batches'] += 1
+                time.sleep(delay)
+                delay *= 2
+            except Exception as e:
+                print(f"❌ Erreur d'écriture du lot ({len(batch)} lectures): {e}")
+                break
+        
+        # Écriture ligne par ligne : seules les lectures fautives sont perdues
+        with self._lock:
+            self._metrics['row_by_row_batches'] += 1
+        written = []
+        for reading in batch:
+            try:
+                self.db.insert_sensor_readings([reading])
+                written.append(reading)
+            except Exception as e:
+                print(f"❌ Lecture rejetée ({reading.get('sensor_name')}: {reading.get('value')}): {e}")
+                with self._lock:
+                    self._metrics['failed_rows'] += 1
+        return written
+    
+    def get_metrics(self) -> Dict:
+        """Métriques de la file (profondeur, débit, latence des commits)"""
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['depth'] = len(self._pending)
+            metrics['capacity'] = self.max_size
+            metrics['running'] = self._running
+            metrics['commit_latency_avg_ms'] = (
+                metrics['commit_latency_total_ms'] / metrics['batches'] if metrics['batches'] else 0.0
+            )
+            return metrics
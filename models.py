@@ -4,7 +4,7 @@ Modèles de données pour l'application de maintenance prédictive
 import hashlib
 from datetime import datetime
 from flask_login import UserMixin
-from database import Database
+from database import get_database
 
 class User(UserMixin):
     def __init__(self, id, username, email, password_hash, role, created_at=None, last_login=None):
@@ -29,7 +29,7 @@ class User(UserMixin):
     @staticmethod
     def get(user_id):
         """Récupère un utilisateur par son ID"""
-        db = Database()
+        db = get_database()
         user_data = db.get_user_by_id(user_id)
         if user_data:
             return User(
@@ -46,7 +46,7 @@ class User(UserMixin):
     @staticmethod
     def get_by_username(username):
         """Récupère un utilisateur par son nom d'utilisateur"""
-        db = Database()
+        db = get_database()
         user_data = db.get_user_by_username(username)
         if user_data:
             return User(
@@ -63,12 +63,12 @@ class User(UserMixin):
     @staticmethod
     def create(username, email, password, role='user'):
         """Crée un nouvel utilisateur"""
-        db = Database()
+        db = get_database()
         return db.create_user(username, email, password, role)
     
     def update_last_login(self):
         """Met à jour la dernière connexion"""
-        db = Database()
+        db = get_database()
         db.update_last_login(self.id)
         self.last_login = datetime.now()
 
@@ -84,13 +84,13 @@ class SensorReading:
     @staticmethod
     def get_recent(sensor_name=None, limit=100):
         """Récupère les lectures récentes"""
-        db = Database()
+        db = get_database()
         return db.get_recent_readings(sensor_name, limit)
     
     @staticmethod
     def get_by_timerange(start_time, end_time, sensor_name=None):
         """Récupère les lectures dans une plage de temps"""
-        db = Database()
+        db = get_database()
         return db.get_readings_by_timerange(start_time, end_time, sensor_name)
 
 class Alert:
@@ -107,24 +107,24 @@ class Alert:
     @staticmethod
     def get_active(limit=None):
         """Récupère les alertes actives"""
-        db = Database()
+        db = get_database()
         return db.get_active_alerts(limit)
     
     @staticmethod
     def get_resolved(limit=None):
         """Récupère les alertes résolues"""
-        db = Database()
+        db = get_database()
         return db.get_resolved_alerts(limit)
     
     @staticmethod
     def create(sensor_name, alert_type, message, severity):
         """Crée une nouvelle alerte"""
-        db = Database()
+        db = get_database()
         return db.create_alert(sensor_name, alert_type, message, severity)
     
     def resolve(self):
         """Marque l'alerte comme résolue"""
-        db = Database()
+        db = get_database()
         db.resolve_alert(self.id)
         self.is_active = False
         self.resolved_at = datetime.now()
@@ -144,18 +144,18 @@ class MaintenanceRecord:
     @staticmethod
     def get_by_status(status=None, limit=None):
         """Récupère les maintenances par statut"""
-        db = Database()
+        db = get_database()
         return db.get_maintenance_records(status, limit)
     
     @staticmethod
     def create(sensor_name, maintenance_type, description, scheduled_date):
         """Crée un nouvel enregistrement de maintenance"""
-        db = Database()
+        db = get_database()
         return db.create_maintenance_record(sensor_name, maintenance_type, description, scheduled_date)
     
     def update_status(self, status, completed_date=None):
         """Met à jour le statut de la maintenance"""
-        db = Database()
+        db = get_database()
         db.update_maintenance_status(self.id, status, completed_date)
         self.status = status
         if completed_date:
@@ -174,13 +174,13 @@ class Prediction:
     @staticmethod
     def get_latest():
         """Récupère les dernières prédictions"""
-        db = Database()
+        db = get_database()
         return db.get_latest_predictions()
     
     @staticmethod
     def save(sensor_name, failure_probability, predicted_failure_date, confidence_score):
         """Sauvegarde une nouvelle prédiction"""
-        db = Database()
+        db = get_database()
         return db.save_prediction(sensor_name, failure_probability, predicted_failure_date, confidence_score)
 
 
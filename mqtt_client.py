@@ -487,15 +487,30 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Callable
 import paho.mqtt.client as mqtt
 from config import Config
-from database import Database
+from database import get_database
 from anomaly_detector import AnomalyDetector
+from alert_aggregator import AlertAggregator
+from detection_workers import DetectionWorkerPool
+from ingest_queue import IngestQueue, IngestQueueFull
 import numpy as np
 
 class MQTTClient:
     def __init__(self, socketio=None):
         self.client = mqtt.Client()
-        self.db = Database()
-        self.anomaly_detector = AnomalyDetector()
+        self.db = get_database()
+        self.alert_aggregator = AlertAggregator(self.db)
+        # Détection par capteur hors du thread réseau paho (keepalive) si un pool est configuré
+        self.detection_pool = None
+        if Config.DETECTION_WORKERS > 0:
+            self.detection_pool = DetectionWorkerPool(self._publish_readings, workers=Config.DETECTION_WORKERS)
+            self.detection_pool.start()
+            self.anomaly_detector = AnomalyDetector(sensors=[])
+        else:
+            self.anomaly_detector = AnomalyDetector()
+        # Écriture et détection sur le thread de la file d'ingestion : le callback paho
+        # ne fait que mettre les lectures en file et rend la main (keepalive)
+        self.ingest_queue = IngestQueue(self.db, on_commit=self._process_sensor_readings)
+        self.ingest_queue.start()
         self.socketio = socketio
         self.is_connected = False
         self.simulation_active = False
@@ -620,17 +635,9 @@ class MQTTClient:
                 
                 # 🖥️ AFFICHAGE TERMINAL
                 print(f"📊 {sensor_name}: {reading['value']} {unit}")
-                
-                # Sauvegarder en base
-                self.db.insert_sensor_reading(
-                    reading['sensor_type'],
-                    reading['sensor_name'],
-                    reading['value'],
-                    reading['unit']
-                )
         
-        # Détecter les anomalies et traiter les alertes
-        self._process_sensor_readings(sensor_readings)
+        # Écriture groupée puis détection par la file d'ingestion (hors du thread réseau paho)
+        self._store_readings(sensor_readings)
     
     def _process_water_level_data(self, data: Dict):
         """Traite les données du capteur de niveau d'eau"""
@@ -654,16 +661,9 @@ class MQTTClient:
                 
                 # 🖥️ AFFICHAGE TERMINAL
                 print(f"💧 {sensor_name}: {reading['value']} {unit}")
-                
-                # Sauvegarder en base
-                self.db.insert_sensor_reading(
-                    reading['sensor_type'],
-                    reading['sensor_name'],
-                    reading['value'],
-                    reading['unit']
-                )
         
-        self._process_sensor_readings(sensor_readings)
+        # Écriture groupée puis détection par la file d'ingestion (hors du thread réseau paho)
+        self._store_readings(sensor_readings)
     
     def _process_water_flow_data(self, data: Dict):
         """Traite les données du capteur de débit d'eau"""
@@ -687,16 +687,16 @@ class MQTTClient:
                 
                 # 🖥️ AFFICHAGE TERMINAL
                 print(f"🌊 {sensor_name}: {reading['value']} {unit}")
-                
-                # Sauvegarder en base
-                self.db.insert_sensor_reading(
-                    reading['sensor_type'],
-                    reading['sensor_name'],
-                    reading['value'],
-                    reading['unit']
-                )
         
-        self._process_sensor_readings(sensor_readings)
+        # Écriture groupée puis détection par la file d'ingestion (hors du thread réseau paho)
+        self._store_readings(sensor_readings)
+    
+    def _store_readings(self, readings: List[Dict]):
+        """Met les lectures d'un message en file ; file saturée : lectures abandonnées (comptées)"""
+        try:
+            self.ingest_queue.submit(readings)
+        except IngestQueueFull as e:
+            print(f"⚠️ Lectures MQTT abandonnées: {e}")
     
     def _process_system_status(self, data: Dict):
         """Traite les données de statut du système"""
@@ -704,33 +704,46 @@ class MQTTClient:
             self.socketio.emit('system_status', data)
     
     def _process_sensor_readings(self, readings: List[Dict]):
-        """Traite les lectures de capteurs pour détecter les anomalies"""
-        for reading in readings:
-            # Détecter les anomalies
-            anomalies = self.anomaly_detector.detect_all_anomalies(reading)
+        """Traite les lectures écrites pour détecter les anomalies (thread de la file d'ingestion)"""
+        if self.detection_pool:
+            # Contrôles par capteur dans le pool (publiés par _publish_readings), inter-capteurs ici
+            self.detection_pool.submit(readings)
+            for anomalies in self.anomaly_detector.detect_cross_sensor(readings):
+                for anomaly in anomalies:
+                    self._publish_anomaly(anomaly)
+            self.alert_aggregator.flush_if_due()
+            return
+        
+        # Détecter les anomalies de tout le message en une passe vectorisée
+        self._publish_readings(readings, self.anomaly_detector.detect_batch(readings))
+    
+    def _publish_anomaly(self, anomaly: Dict):
+        """Crée l'alerte d'une anomalie (répétitions seulement comptées) et la diffuse"""
+        alert_id = self.alert_aggregator.submit(anomaly)
+        if alert_id is None:
+            return
+        
+        # 🚨 AFFICHAGE ALERTE TERMINAL
+        print(f"🚨 ALERTE {anomaly['severity']}: {anomaly['message']}")
+        
+        # Émettre l'alerte via WebSocket
+        if self.socketio:
+            self.socketio.emit('new_alert', {
+                'id': alert_id,
+                'sensor_name': anomaly['sensor_name'],
+                'type': anomaly['type'],
+                'message': anomaly['message'],
+                'severity': anomaly['severity'],
+                'timestamp': datetime.now().isoformat()
+            })
+    
+    def _publish_readings(self, readings: List[Dict], anomalies_by_reading: List[List[Dict]]):
+        """Publie les anomalies d'un lot et diffuse ses lectures en temps réel"""
+        for reading, anomalies in zip(readings, anomalies_by_reading):
             
             # Créer des alertes pour chaque anomalie détectée
             for anomaly in anomalies:
-                alert_id = self.db.create_alert(
-                    sensor_name=anomaly['sensor_name'],
-                    alert_type=anomaly['type'],
-                    message=anomaly['message'],
-                    severity=anomaly['severity']
-                )
-                
-                # 🚨 AFFICHAGE ALERTE TERMINAL
-                print(f"🚨 ALERTE {anomaly['severity']}: {anomaly['message']}")
-                
-                # Émettre l'alerte via WebSocket
-                if self.socketio:
-                    self.socketio.emit('new_alert', {
-                        'id': alert_id,
-                        'sensor_name': anomaly['sensor_name'],
-                        'type': anomaly['type'],
-                        'message': anomaly['message'],
-                        'severity': anomaly['severity'],
-                        'timestamp': datetime.now().isoformat()
-                    })
+                self._publish_anomaly(anomaly)
             
             # Émettre les données en temps réel via WebSocket
             if self.socketio:
@@ -741,6 +754,8 @@ class MQTTClient:
                     'timestamp': reading['timestamp'].isoformat(),
                     'anomalies_count': len(anomalies)
                 })
+        
+        self.alert_aggregator.flush_if_due()
     
     def connect(self):
         """Se connecte au broker MQTT"""
@@ -775,6 +790,7 @@ class MQTTClient:
             
         self._simulation_started = True
         self.simulation_active = True
+        self.anomaly_detector.set_simulation_mode(True)
         
         print("🎲 Démarrage de la simulation des capteurs...")
         print("📊 Les données apparaîtront ci-dessous en temps réel:")
@@ -1,182 +1,177 @@
 """
 Module de maintenance prédictive utilisant la distribution de Weibull
 """
-import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from scipy.stats import weibull_min
-from database import Database
+from database import get_database, now_ms
 from config import Config
+from weibull_engine import weibull_fleet
+from weibull_fitting import WeibullFitter
+from trend_statistics import trend_from_stats
 from typing import Dict, List, Optional, Tuple
-import math
 
 class PredictiveMaintenance:
+    # Probabilité de défaillance dont on prédit la date
+    FAILURE_QUANTILE = 0.9
+    
     def __init__(self):
-        self.db = Database()
+        self.db = get_database()
         self.life_parameters = Config.SENSOR_LIFE_PARAMETERS
+        # Paramètres ajustés sur l'historique de maintenance de leur classe (prioritaires sur la
+        # configuration) et date de la dernière remise à neuf de chaque capteur (origine de son âge)
+        self.fitter = WeibullFitter(self.db)
+        self.fitted_parameters = {}
+        self.renewals = {}
+    
+    def refresh_life_parameters(self, full: bool = False) -> Dict[str, Dict]:
+        """Réajuste les paramètres des capteurs dont l'historique a changé (voir weibull_fitting.py)"""
+        try:
+            fits, lifetimes = self.fitter.refresh(full)
+            # Un seul dictionnaire par classe : ses capteurs sont évalués ensemble
+            class_parameters = {
+                sensor_class: {'shape': fit['shape'], 'scale': fit['scale'], 'location': fit['location']}
+                for sensor_class, fit in fits.items() if fit['status'] == 'fitted'
+            }
+            self.fitted_parameters = {}
+            for sensor_name in set(Config.SENSOR_THRESHOLDS) | set(self.life_parameters) | set(lifetimes):
+                sensor_class = self.fitter.sensor_class(sensor_name)
+                if sensor_class in class_parameters:
+                    self.fitted_parameters[sensor_name] = class_parameters[sensor_class]
+            self.renewals = {
+                sensor_name: lifetime['renewed_at_ms']
+                for sensor_name, lifetime in lifetimes.items() if lifetime['renewed_at_ms'] is not None
+            }
+        except Exception as e:
+            print(f"❌ Erreur d'ajustement des paramètres de Weibull: {e}")
+        return self.fitted_parameters
         
     def calculate_failure_probability(self, sensor_name: str, current_age_hours: float) -> Dict:
         """Calcule la probabilité de défaillance d'un capteur basée sur la distribution de Weibull"""
-        
-        # Mapper les noms de capteurs aux paramètres de vie
-        sensor_mapping = {
-            'nitrogen': 'npk_sensor',
-            'phosphorus': 'npk_sensor',
-            'potassium': 'npk_sensor',
-            'ph': 'npk_sensor',
-            'conductivity': 'npk_sensor',
-            'temperature': 'npk_sensor',
-            'humidity': 'npk_sensor',
-            'salinity': 'npk_sensor',
-            'water_level': 'water_level_sensor',
-            'water_temperature': 'water_level_sensor',
-            'water_flow': 'water_flow_sensor',
-            'water_pressure': 'water_flow_sensor'
-        }
-        
-        param_key = sensor_mapping.get(sensor_name, 'npk_sensor')
-        
-        if param_key not in self.life_parameters:
-            return {
-                'failure_probability': 0.0,
-                'confidence_score': 0.0,
-                'predicted_failure_date': None,
-                'mean_time_to_failure': 0.0,
-                'reliability': 1.0
+        return self.calculate_failure_probabilities({sensor_name: current_age_hours})[sensor_name]
+    
+    def _life_parameters_for(self, sensor_name: str) -> Optional[Dict]:
+        """Paramètres de vie (Weibull) d'un capteur : ajustés s'ils existent, sinon ceux de la configuration"""
+        return self.fitted_parameters.get(sensor_name) or self.life_parameters.get(sensor_name)
+    
+    def calculate_failure_probabilities(self, sensor_ages: Dict[str, float],
+                                        metadata: Optional[Dict[str, Dict]] = None) -> Dict[str, Dict]:
+        """
+        Probabilités de défaillance de tout un parc en une passe vectorisée
+        (forme fermée de Weibull, voir weibull_engine.py) : {capteur: prédiction}.
+        `metadata` : métadonnées des capteurs déjà lues (get_all_sensor_metadata)
+        """
+        predictions = {}
+        names, classes, ages = [], [], []
+        parameters, class_index = [], {}   # jeux de paramètres distincts (classes d'équipements)
+        for sensor_name, current_age_hours in sensor_ages.items():
+            params = self._life_parameters_for(sensor_name)
+            if params is None:
+                predictions[sensor_name] = {
+                    'failure_probability': 0.0,
+                    'confidence_score': 0.0,
+                    'predicted_failure_date': None,
+                    'mean_time_to_failure': 0.0,
+                    'reliability': 1.0
+                }
+                continue
+            if id(params) not in class_index:
+                class_index[id(params)] = len(parameters)
+                parameters.append(params)
+            names.append(sensor_name)
+            classes.append(class_index[id(params)])
+            ages.append(current_age_hours)
+        
+        if not names:
+            return predictions
+        
+        if metadata is None:
+            metadata = self.db.get_all_sensor_metadata()
+        
+        # CDF, fiabilité, MTTF et délai jusqu'au quantile de défaillance (imminent au-delà)
+        fleet = weibull_fleet(parameters, classes, ages, quantile=self.FAILURE_QUANTILE)
+        now = datetime.now()
+        for k, sensor_name in enumerate(names):
+            predictions[sensor_name] = {
+                'failure_probability': float(fleet['failure_probability'][k]),
+                # Score de confiance basé sur la quantité de données historiques
+                'confidence_score': float(self._calculate_confidence_score(sensor_name, metadata.get(sensor_name, {}))),
+                'predicted_failure_date': now + timedelta(hours=float(fleet['remaining_hours'][k])),
+                'mean_time_to_failure': float(fleet['mean_time_to_failure'][k]),
+                'reliability': float(fleet['reliability'][k]),
+                'current_age_hours': float(ages[k]),
+                'shape_parameter': float(fleet['shape'][k]),
+                'scale_parameter': float(fleet['scale'][k])
             }
-        
-        params = self.life_parameters[param_key]
-        shape = params['shape']  # β (paramètre de forme)
-        scale = params['scale']  # η (paramètre d'échelle)
-        
-        # Calculer la fonction de répartition cumulative (CDF) - probabilité de défaillance
-        failure_probability = weibull_min.cdf(current_age_hours, shape, scale=scale)
-        
-        # Calculer la fiabilité (1 - probabilité de défaillance)
-        reliability = 1 - failure_probability
-        
-        # Calculer le temps moyen jusqu'à la défaillance (MTTF)
-        mttf = scale * math.gamma(1 + 1/shape)
-        
-        # Estimer la date de défaillance probable
-        if failure_probability < 0.9:
-            # Temps jusqu'à 90% de probabilité de défaillance
-            time_to_90_percent = weibull_min.ppf(0.9, shape, scale=scale)
-            remaining_time_hours = max(0, time_to_90_percent - current_age_hours)
-            predicted_failure_date = datetime.now() + timedelta(hours=remaining_time_hours)
-        else:
-            # Si déjà haute probabilité, défaillance imminente
-            predicted_failure_date = datetime.now() + timedelta(hours=24)
-        
-        # Calculer le score de confiance basé sur la quantité de données historiques
-        confidence_score = self._calculate_confidence_score(sensor_name)
-        
-        return {
-            'failure_probability': float(failure_probability),
-            'confidence_score': float(confidence_score),
-            'predicted_failure_date': predicted_failure_date,
-            'mean_time_to_failure': float(mttf),
-            'reliability': float(reliability),
-            'current_age_hours': float(current_age_hours),
-            'shape_parameter': float(shape),
-            'scale_parameter': float(scale)
-        }
+        return predictions
     
-    def _calculate_confidence_score(self, sensor_name: str) -> float:
+    def _calculate_confidence_score(self, sensor_name: str, metadata: Optional[Dict] = None) -> float:
         """Calcule un score de confiance basé sur la quantité et qualité des données"""
-        # Récupérer les données historiques
-        recent_readings = self.db.get_recent_readings(sensor_name, limit=1000)
+        # Nombre de lectures historiques, tenu à jour à l'insertion (table sensor_metadata)
+        if metadata is None:
+            metadata = self.db.get_sensor_metadata(sensor_name) or {}
+        reading_count = metadata.get('reading_count', 0)
         
-        if len(recent_readings) < 10:
+        if reading_count < 10:
             return 0.1  # Très faible confiance
-        elif len(recent_readings) < 50:
+        elif reading_count < 50:
             return 0.4  # Faible confiance
-        elif len(recent_readings) < 200:
+        elif reading_count < 200:
             return 0.7  # Confiance moyenne
         else:
             return 0.9  # Haute confiance
     
-    def estimate_sensor_age(self, sensor_name: str) -> float:
+    def estimate_sensor_age(self, sensor_name: str, metadata: Optional[Dict] = None) -> float:
         """Estime l'âge d'un capteur en heures basé sur les données disponibles"""
-        # Récupérer toutes les données pour ce capteur
-        all_readings = self.db.get_recent_readings(sensor_name, limit=10000)
+        # Première lecture (plus ancienne) de ce capteur, en epoch ms
+        if metadata is None:
+            metadata = self.db.get_sensor_metadata(sensor_name) or {}
+        first_reading_ms = metadata.get('first_ts_ms')
         
-        if not all_readings:
+        if first_reading_ms is None:
             return 0.0
         
-        # Trouver la première lecture (plus ancienne)
-        try:
-            first_reading_time = datetime.fromisoformat(str(all_readings[-1]['timestamp']))
-            current_time = datetime.now()
-            age_delta = current_time - first_reading_time
-            return age_delta.total_seconds() / 3600  # Convertir en heures
-        except:
-            # Si erreur de parsing, estimer basé sur le nombre de lectures
-            # Assumer 1 lecture par minute en moyenne
-            return len(all_readings) / 60.0
+        # Une défaillance réparée ou un remplacement remet l'âge à zéro
+        start_ms = max(first_reading_ms, self.renewals.get(sensor_name) or first_reading_ms)
+        return max(0, now_ms() - start_ms) / 3600000  # Convertir en heures
     
-    def analyze_degradation_trend(self, sensor_name: str) -> Dict:
+    def analyze_degradation_trend(self, sensor_name: str, stats: Optional[Dict] = None) -> Dict:
         """Analyse la tendance de dégradation d'un capteur"""
-        readings = self.db.get_recent_readings(sensor_name, limit=200)
+        # Sommes de la régression tenues à jour à l'ingestion (voir trend_statistics.py) :
+        # pente et corrélation en O(1), sans relire la série
+        if stats is None:
+            stats = self.db.get_trend_stats(sensor_name)
         
-        if len(readings) < 10:
+        if not stats or stats['reading_count'] < 10:
             return {
                 'trend': 'INSUFFICIENT_DATA',
                 'degradation_rate': 0.0,
                 'trend_confidence': 0.0
             }
         
-        # Convertir en DataFrame pour l'analyse
-        timestamps = []
-        values = []
-        
-        for reading in reversed(readings):  # Ordre chronologique
-            try:
-                timestamp = datetime.fromisoformat(str(reading['timestamp']))
-                timestamps.append(timestamp)
-                values.append(float(reading['value']))
-            except:
-                continue
-        
-        if len(values) < 10:
+        regression = trend_from_stats(stats)
+        if regression is None:
             return {
-                'trend': 'INSUFFICIENT_DATA',
+                'trend': 'UNKNOWN',
                 'degradation_rate': 0.0,
                 'trend_confidence': 0.0
             }
         
-        # Convertir les timestamps en heures depuis le début
-        start_time = timestamps[0]
-        hours = [(t - start_time).total_seconds() / 3600 for t in timestamps]
-        
-        # Calculer la régression linéaire
-        if len(hours) > 1:
-            coefficients = np.polyfit(hours, values, 1)
-            slope = coefficients[0]
-            
-            # Déterminer la tendance
-            if abs(slope) < 0.01:
-                trend = 'STABLE'
-            elif slope > 0:
-                trend = 'IMPROVING'
-            else:
-                trend = 'DEGRADING'
-            
-            # Calculer le coefficient de corrélation pour la confiance
-            correlation = np.corrcoef(hours, values)[0, 1]
-            trend_confidence = abs(correlation) if not np.isnan(correlation) else 0.0
-            
-            return {
-                'trend': trend,
-                'degradation_rate': float(slope),
-                'trend_confidence': float(trend_confidence),
-                'data_points': len(values)
-            }
+        # Pente en unités par heure
+        slope = regression['slope']
+        
+        # Déterminer la tendance
+        if abs(slope) < 0.01:
+            trend = 'STABLE'
+        elif slope > 0:
+            trend = 'IMPROVING'
+        else:
+            trend = 'DEGRADING'
         
         return {
-            'trend': 'UNKNOWN',
-            'degradation_rate': 0.0,
-            'trend_confidence': 0.0
+            'trend': trend,
+            'degradation_rate': float(slope),
+            'trend_confidence': abs(regression['correlation']),
+            'data_points': stats['reading_count']
         }
     
     def schedule_maintenance(self, sensor_name: str, prediction: Dict) -> Optional[int]:
@@ -234,8 +229,12 @@ class PredictiveMaintenance:
         
         return maintenance_id
     
-    def run_predictive_analysis(self) -> Dict:
-        """Exécute l'analyse prédictive pour tous les capteurs"""
+    def run_predictive_analysis(self, sensor_names: Optional[List[str]] = None,
+                                refresh_parameters: bool = True) -> Dict:
+        """
+        Exécute l'analyse prédictive pour tous les capteurs (ou seulement `sensor_names`) ;
+        `refresh_parameters=False` si l'appelant vient de réajuster les paramètres de vie
+        """
         results = {
             'timestamp': datetime.now(),
             'sensors_analyzed': 0,
@@ -245,50 +244,64 @@ class PredictiveMaintenance:
         }
         
         # Liste de tous les capteurs à analyser
-        sensor_names = list(Config.SENSOR_THRESHOLDS.keys())
+        if sensor_names is None:
+            sensor_names = list(Config.SENSOR_THRESHOLDS.keys())
+        
+        # Paramètres de vie à jour (réajustement des seuls capteurs à l'historique modifié)
+        if refresh_parameters:
+            self.refresh_life_parameters()
         
+        # Âge de chaque capteur (une ligne de métadonnées par capteur, lues en une requête),
+        # puis prédictions de tout le parc en une passe
+        metadata = self.db.get_all_sensor_metadata()
+        sensor_ages = {}
         for sensor_name in sensor_names:
             try:
-                # Estimer l'âge du capteur
-                sensor_age = self.estimate_sensor_age(sensor_name)
-                
+                sensor_age = self.estimate_sensor_age(sensor_name, metadata.get(sensor_name, {}))
                 if sensor_age > 0:
-                    # Calculer la prédiction
-                    prediction = self.calculate_failure_probability(sensor_name, sensor_age)
-                    
-                    # Analyser la tendance
-                    trend_analysis = self.analyze_degradation_trend(sensor_name)
-                    prediction.update(trend_analysis)
-                    
-                    # Sauvegarder la prédiction
-                    self.db.save_prediction(
-                        sensor_name=sensor_name,
-                        failure_probability=prediction['failure_probability'],
-                        predicted_failure_date=prediction['predicted_failure_date'],
-                        confidence_score=prediction['confidence_score']
-                    )
-                    
-                    # Programmer maintenance si nécessaire
-                    if prediction['failure_probability'] > 0.2:
-                        maintenance_id = self.schedule_maintenance(sensor_name, prediction)
-                        if maintenance_id:
-                            results['maintenances_scheduled'] += 1
-                    
-                    # Identifier les capteurs à haut risque
-                    if prediction['failure_probability'] > 0.6:
-                        results['high_risk_sensors'].append({
-                            'sensor_name': sensor_name,
-                            'failure_probability': prediction['failure_probability'],
-                            'predicted_failure_date': prediction['predicted_failure_date']
-                        })
-                    
-                    results['predictions'].append({
+                    sensor_ages[sensor_name] = sensor_age
+            except Exception as e:
+                print(f"Erreur lors de l'analyse du capteur {sensor_name}: {e}")
+        predictions = self.calculate_failure_probabilities(sensor_ages, metadata)
+        trend_stats = self.db.get_all_trend_stats()
+        
+        for sensor_name in sensor_ages:
+            try:
+                prediction = predictions[sensor_name]
+                
+                # Analyser la tendance
+                trend_analysis = self.analyze_degradation_trend(sensor_name, trend_stats.get(sensor_name, {}))
+                prediction.update(trend_analysis)
+                
+                # Sauvegarder la prédiction
+                self.db.save_prediction(
+                    sensor_name=sensor_name,
+                    failure_probability=prediction['failure_probability'],
+                    predicted_failure_date=prediction['predicted_failure_date'],
+                    confidence_score=prediction['confidence_score']
+                )
+                
+                # Programmer maintenance si nécessaire
+                if prediction['failure_probability'] > 0.2:
+                    maintenance_id = self.schedule_maintenance(sensor_name, prediction)
+                    if maintenance_id:
+                        results['maintenances_scheduled'] += 1
+                
+                # Identifier les capteurs à haut risque
+                if prediction['failure_probability'] > 0.6:
+                    results['high_risk_sensors'].append({
                         'sensor_name': sensor_name,
-                        **prediction
+                        'failure_probability': prediction['failure_probability'],
+                        'predicted_failure_date': prediction['predicted_failure_date']
                     })
-                    
-                    results['sensors_analyzed'] += 1
-                    
+                
+                results['predictions'].append({
+                    'sensor_name': sensor_name,
+                    **prediction
+                })
+                
+                results['sensors_analyzed'] += 1
+                
             except Exception as e:
                 print(f"Erreur lors de l'analyse du capteur {sensor_name}: {e}")
                 continue
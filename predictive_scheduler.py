@@ -0,0 +1,177 @@
+"""
+Planification de l'analyse prédictive en arrière-plan
+L'analyse s'exécute périodiquement (intervalle avec gigue, une seule exécution à la fois)
+hors des requêtes HTTP ; les demandes manuelles sont mises en file et suivies par
+identifiant. Seuls les capteurs dont les entrées ont changé depuis leur dernière analyse
+sont réanalysés.
+"""
+import math
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from config import Config
+from background_jobs import PeriodicJob
+
+
+def _significant(value: float, digits: int) -> float:
+    """Arrondi à `digits` chiffres significatifs (comparaison tolérante des tendances)"""
+    if not value or not math.isfinite(value):
+        return value
+    return round(value, digits - 1 - int(math.floor(math.log10(abs(value)))))
+
+
+def _json_safe(value):
+    """Résultats d'analyse sérialisables (dates ISO, scalaires NumPy convertis)"""
+    if isinstance(value, dict):
+        return {key: _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class PredictiveScheduler:
+    """
+    `job` (PeriodicJob) exécute `run` toutes les PREDICTIVE_ANALYSIS_INTERVAL_S secondes ;
+    `enqueue` crée une demande et avance l'exécution suivante. Les demandes arrivées
+    pendant une analyse sont servies ensemble par l'analyse suivante.
+    
+    Entrées d'un capteur : celles dont dépend sa prédiction, et non le simple fait que des
+    lectures soient arrivées — mise en service et date de remise à neuf (âge), paramètres
+    de vie ajustés, palier du score de confiance et tendance de dégradation (pente et
+    corrélation arrondies à PREDICTIVE_ANALYSIS_TREND_DIGITS chiffres significatifs).
+    Le vieillissement est couvert par PREDICTIVE_ANALYSIS_MAX_AGE_S. `on_results(summary)`
+    est appelé après chaque analyse (diffusion Socket.IO).
+    """
+    
+    def __init__(self, predictive_maintenance, on_results: Optional[Callable[[Dict], None]] = None):
+        self.predictive_maintenance = predictive_maintenance
+        self.db = predictive_maintenance.db
+        self.on_results = on_results
+        self.max_age_s = Config.PREDICTIVE_ANALYSIS_MAX_AGE_S
+        self.trend_digits = Config.PREDICTIVE_ANALYSIS_TREND_DIGITS
+        self.job = PeriodicJob(
+            'predictive-analysis', self.run, Config.PREDICTIVE_ANALYSIS_INTERVAL_S,
+            initial_delay_s=30, jitter_s=Config.PREDICTIVE_ANALYSIS_JITTER_S
+        )
+        self._requests = OrderedDict()     # identifiant → demande, de la plus ancienne à la plus récente
+        self._lock = threading.Lock()
+        self._analyzed = {}                # capteur → (entrées, instant de l'analyse)
+    
+    def start(self):
+        self.job.start()
+    
+    def stop(self):
+        self.job.stop()
+    
+    def enqueue(self, full: bool = False) -> Dict:
+        """Demande une analyse (`full` : tous les capteurs, même inchangés) ; renvoie la demande"""
+        request = {
+            'job_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'full': full,
+            'requested_at': datetime.now().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None
+        }
+        with self._lock:
+            self._requests[request['job_id']] = request
+            while len(self._requests) > Config.PREDICTIVE_ANALYSIS_JOB_HISTORY:
+                self._requests.popitem(last=False)
+            request = dict(request)
+        self.job.trigger()
+        return request
+    
+    def get_request(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            request = self._requests.get(job_id)
+            return dict(request) if request else None
+    
+    def _take_queued(self) -> List[Dict]:
+        with self._lock:
+            queued = [request for request in self._requests.values() if request['status'] == 'queued']
+            for request in queued:
+                request['status'] = 'running'
+                request['started_at'] = datetime.now().isoformat()
+            return queued
+    
+    def _finish(self, requests: List[Dict], result: Optional[Dict] = None, error: Optional[str] = None):
+        with self._lock:
+            for request in requests:
+                request['status'] = 'failed' if error else 'completed'
+                request['finished_at'] = datetime.now().isoformat()
+                request['result'] = result
+                request['error'] = error
+    
+    def sensor_inputs(self) -> Dict[str, tuple]:
+        """Entrées de l'analyse de chaque capteur (après réajustement des paramètres de vie)"""
+        predictive_maintenance = self.predictive_maintenance
+        predictive_maintenance.refresh_life_parameters()
+        metadata = self.db.get_all_sensor_metadata()
+        trend_stats = self.db.get_all_trend_stats()
+        renewals = predictive_maintenance.renewals
+        inputs = {}
+        for sensor_name in Config.SENSOR_THRESHOLDS:
+            sensor_metadata = metadata.get(sensor_name, {})
+            parameters = predictive_maintenance._life_parameters_for(sensor_name) or {}
+            trend = predictive_maintenance.analyze_degradation_trend(sensor_name, trend_stats.get(sensor_name, {}))
+            inputs[sensor_name] = (
+                sensor_metadata.get('first_ts_ms'),
+                renewals.get(sensor_name),
+                tuple(sorted(parameters.items())),
+                predictive_maintenance._calculate_confidence_score(sensor_name, sensor_metadata),
+                trend['trend'],
+                _significant(trend['degradation_rate'], self.trend_digits),
+                _significant(trend['trend_confidence'], self.trend_digits)
+            )
+        return inputs
+    
+    def changed_sensors(self, inputs: Dict[str, tuple], full: bool = False) -> List[str]:
+        """Capteurs à réanalyser : entrées modifiées ou dernière analyse trop ancienne"""
+        now = time.time()
+        changed = []
+        for sensor_name, sensor_inputs in inputs.items():
+            previous = self._analyzed.get(sensor_name)
+            if full or previous is None or previous[0] != sensor_inputs or now - previous[1] >= self.max_age_s:
+                changed.append(sensor_name)
+        return changed
+    
+    def run(self) -> Dict:
+        """Une analyse (appelée par `job`, jamais en parallèle) servant toutes les demandes en file"""
+        requests = self._take_queued()
+        try:
+            inputs = self.sensor_inputs()
+            sensor_names = self.changed_sensors(inputs, full=any(request['full'] for request in requests))
+            if sensor_names:
+                # Paramètres de vie déjà réajustés par sensor_inputs() : un seul réajustement par exécution
+                results = self.predictive_maintenance.run_predictive_analysis(sensor_names, refresh_parameters=False)
+            else:
+                results = {'timestamp': datetime.now(), 'sensors_analyzed': 0, 'predictions': [],
+                           'maintenances_scheduled': 0, 'high_risk_sensors': []}
+            analyzed_at = time.time()
+            for sensor_name in sensor_names:
+                self._analyzed[sensor_name] = (inputs[sensor_name], analyzed_at)
+        except Exception as e:
+            self._finish(requests, error=str(e))
+            raise
+        
+        summary = _json_safe(results)
+        summary['sensors_skipped'] = len(inputs) - len(sensor_names)
+        summary['job_ids'] = [request['job_id'] for request in requests]
+        self._finish(requests, result=summary)
+        if self.on_results:
+            self.on_results(summary)
+        return {
+            'sensors_analyzed': summary['sensors_analyzed'],
+            'sensors_skipped': summary['sensors_skipped'],
+            'requests': len(requests)
+        }
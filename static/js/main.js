@@ -318,6 +318,29 @@ function formatDateTime(dateString) {
   return date.toLocaleString("fr-FR")
 }
 
+/**
+ * Attend la fin d'une tâche de fond (analyse prédictive, ...) en interrogeant son URL d'état
+ */
+function waitForJob(statusUrl, interval = 1000) {
+  return new Promise((resolve, reject) => {
+    const poll = () => {
+      fetch(statusUrl)
+        .then((response) => response.json())
+        .then((job) => {
+          if (job.status === "completed") {
+            resolve(job)
+          } else if (job.status === "failed" || !job.success) {
+            reject(new Error(job.error || "Échec de la tâche"))
+          } else {
+            setTimeout(poll, interval)
+          }
+        })
+        .catch(reject)
+    }
+    poll()
+  })
+}
+
 /**
  * Exporte les fonctions pour utilisation dans d'autres scripts
  */
@@ -328,6 +351,7 @@ window.MainApp = {
   showNotification,
   formatNumber,
   formatDateTime,
+  waitForJob,
 }
 
 // Declare the addAlertToList function
@@ -125,6 +125,13 @@ function runPredictiveAnalysis() {
   })
     .then((response) => response.json())
     .then((data) => {
+      if (!data.success) {
+        throw new Error(data.error || "Erreur lors de l'analyse")
+      }
+      // L'analyse s'exécute en arrière-plan : attendre sa fin
+      return window.MainApp.waitForJob(data.status_url)
+    })
+    .then(() => {
       showNotification("Analyse prédictive terminée avec succès", "success")
 
       // Recharger la page pour afficher les nouveaux résultats
@@ -52,10 +52,21 @@ function forceAnalysis() {
   })
     .then((response) => response.json())
     .then((data) => {
-      if (data.success) {
+      if (!data.success) {
+        throw new Error(data.error || "Erreur lors de l'analyse")
+      }
+      // L'analyse s'exécute en arrière-plan : attendre sa fin
+      return window.MainApp.waitForJob(data.status_url)
+    })
+    .then((job) => {
+      if (job.result) {
         // Afficher une notification de succès
         if (window.MainApp && window.MainApp.showNotification) {
-          window.MainApp.showNotification("Analyse terminée", data.message, "success")
+          window.MainApp.showNotification(
+            "Analyse terminée",
+            `${job.result.sensors_analyzed} capteurs analysés`,
+            "success",
+          )
         }
 
         // Actualiser la page après 2 secondes
@@ -63,7 +74,7 @@ function forceAnalysis() {
           location.reload()
         }, 2000)
       } else {
-        throw new Error(data.error || "Erreur lors de l'analyse")
+        throw new Error(job.error || "Erreur lors de l'analyse")
       }
     })
     .catch((error) => {
@@ -0,0 +1,192 @@
+"""
+Statistiques glissantes par capteur pour la détection d'anomalies
+Tampon circulaire NumPy de taille fixe + sommes courantes des valeurs décalées,
+mises à jour en O(1) à chaque lecture
+"""
+import math
+import numpy as np
+from typing import Optional, Tuple
+
+
+class SlidingWindowStats:
+    """
+    Fenêtre glissante des dernières lectures d'un capteur, bornée à la fois
+    en nombre (`capacity`) et en durée (`window_ms`).
+    
+    Les sommes Σ(x - K) et Σ(x - K)² sont mises à jour à l'ajout et au retrait de
+    chaque valeur, avec un décalage K proche de la moyenne de la fenêtre : la variance
+    d'une fenêtre quasi constante reste précise sans recalcul (pas de différence de
+    grands nombres). Les sommes sont recalculées exactement depuis le tampon, et K
+    recentré, toutes les `capacity` mises à jour, soit un coût amorti O(1) ; plus tôt
+    (au plus toutes les RECENTER_MIN_UPDATES mises à jour) si la moyenne s'est éloignée
+    de K de plus de quelques écarts-types.
+    """
+    
+    RECENTER_MIN_UPDATES = 64
+    
+    def __init__(self, capacity: int, window_ms: Optional[int] = None):
+        self.capacity = int(capacity)
+        self.window_ms = window_ms
+        self._values = np.empty(self.capacity, dtype=np.float64)
+        self._timestamps = np.empty(self.capacity, dtype=np.int64)
+        self._start = 0       # Index de la plus ancienne valeur
+        self.count = 0
+        self._shift = 0.0     # Décalage K (moyenne au dernier recalcul)
+        self._sum = 0.0       # Σ(x - K)
+        self._sum_sq = 0.0    # Σ(x - K)²
+        self._updates = 0
+    
+    def __len__(self):
+        return self.count
+    
+    @property
+    def mean(self) -> float:
+        return self._shift + self._sum / self.count if self.count else 0.0
+    
+    @property
+    def variance(self) -> float:
+        """Variance de population (comme np.var / np.std par défaut)"""
+        if not self.count:
+            return 0.0
+        centered_mean = self._sum / self.count
+        return max(self._sum_sq / self.count - centered_mean * centered_mean, 0.0)
+    
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+    
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        if not self.count:
+            return None
+        return int(self._timestamps[(self._start + self.count - 1) % self.capacity])
+    
+    def push(self, value: float, ts_ms: int):
+        """Ajoute une lecture (en expulsant les plus anciennes si nécessaire)"""
+        value = float(value)
+        if self.window_ms is not None:
+            self.expire(ts_ms - self.window_ms)
+        if self.count == self.capacity:
+            self._pop_oldest()
+        
+        if not self.count:
+            self._shift = value
+        index = (self._start + self.count) % self.capacity
+        self._values[index] = value
+        self._timestamps[index] = ts_ms
+        self.count += 1
+        centered = value - self._shift
+        self._sum += centered
+        self._sum_sq += centered * centered
+        
+        self._updates += 1
+        if self._updates >= self.capacity or (self._updates >= self.RECENTER_MIN_UPDATES and self._drifted()):
+            self._recompute()
+    
+    def expire(self, cutoff_ms: int):
+        """Retire les lectures antérieures à `cutoff_ms`"""
+        while self.count and self._timestamps[self._start] < cutoff_ms:
+            self._pop_oldest()
+    
+    def load(self, timestamps, values):
+        """Initialise la fenêtre depuis des tableaux chronologiques (préchauffage depuis la base)"""
+        timestamps = np.asarray(timestamps, dtype=np.int64)[-self.capacity:]
+        values = np.asarray(values, dtype=np.float64)[-self.capacity:]
+        self.count = len(values)
+        self._start = 0
+        self._values[:self.count] = values
+        self._timestamps[:self.count] = timestamps
+        self._recompute()
+    
+    def evaluate_and_extend(self, timestamps, values) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Version vectorisée d'une suite de push() : renvoie, pour chaque nouvelle valeur,
+        l'effectif, la moyenne et l'écart-type de la fenêtre *avant* son ajout (après
+        expiration à son horodatage), puis intègre toutes les valeurs.
+        Les horodatages sont supposés chronologiques.
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        k = len(values)
+        if not k:
+            empty = np.empty(0)
+            return empty.astype(np.int64), empty, empty
+        
+        n0 = self.count
+        all_ts = np.concatenate((self.timestamps(), timestamps))
+        all_values = np.concatenate((self.values(), values))
+        ends = n0 + np.arange(k)           # la fenêtre de la valeur j est [starts[j], ends[j])
+        
+        # Début de fenêtre : expiration temporelle et capacité, le début ne reculant jamais
+        starts = ends - self.capacity
+        if self.window_ms is not None:
+            time_starts = np.searchsorted(np.maximum.accumulate(all_ts), timestamps - self.window_ms, side='left')
+            starts = np.maximum(starts, time_starts)
+        starts = np.minimum(np.maximum.accumulate(np.maximum(starts, 0)), ends)
+        
+        # Sommes préfixées sur des valeurs recentrées (évite la perte de précision de E[x²] - E[x]²)
+        shift = float(all_values.mean())
+        centered = all_values - shift
+        s1 = np.concatenate(([0.0], np.cumsum(centered)))
+        s2 = np.concatenate(([0.0], np.cumsum(centered * centered)))
+        counts = ends - starts
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means_centered = (s1[ends] - s1[starts]) / counts
+            variances = np.maximum((s2[ends] - s2[starts]) / counts - means_centered ** 2, 0.0)
+        means = np.where(counts > 0, means_centered + shift, 0.0)
+        
+        # Fenêtres quasi constantes loin de la moyenne globale : la soustraction perd toute
+        # précision, on recalcule ces (rares) fenêtres directement
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_squares = (s2[ends] - s2[starts]) / counts
+        for j in np.flatnonzero((counts > 0) & (variances <= 1e-8 * mean_squares)):
+            window = all_values[starts[j]:ends[j]]
+            means[j], variances[j] = window.mean(), window.var()
+        stds = np.where(counts > 0, np.sqrt(variances), 0.0)
+        
+        # État final : celui qu'aurait laissé le dernier push()
+        final_start = max(int(starts[-1]), n0 + k - self.capacity)
+        self.load(all_ts[final_start:], all_values[final_start:])
+        return counts, means, stds
+    
+    def values(self) -> np.ndarray:
+        """Copie chronologique des valeurs de la fenêtre"""
+        return self._ordered(self._values)
+    
+    def timestamps(self) -> np.ndarray:
+        """Copie chronologique des horodatages (epoch ms) de la fenêtre"""
+        return self._ordered(self._timestamps)
+    
+    def _ordered(self, buffer: np.ndarray) -> np.ndarray:
+        end = self._start + self.count
+        if end <= self.capacity:
+            return buffer[self._start:end].copy()
+        return np.concatenate((buffer[self._start:], buffer[:end - self.capacity]))
+    
+    def _pop_oldest(self):
+        value = self._values[self._start]
+        self._start = (self._start + 1) % self.capacity
+        self.count -= 1
+        if not self.count:
+            self._sum, self._sum_sq = 0.0, 0.0
+            return
+        centered = value - self._shift
+        self._sum -= centered
+        self._sum_sq -= centered * centered
+    
+    def _drifted(self) -> bool:
+        """Moyenne éloignée du décalage : la variance par différence perdrait en précision"""
+        centered_mean = self._sum / self.count
+        return centered_mean * centered_mean > 64.0 * (self.variance + 1e-12 * self._shift * self._shift)
+    
+    def _recompute(self):
+        """Recalcul exact des sommes à partir du tampon, décalage recentré sur la moyenne"""
+        self._updates = 0
+        if not self.count:
+            self._shift, self._sum, self._sum_sq = 0.0, 0.0, 0.0
+            return
+        values = self.values()
+        self._shift = float(values.mean())
+        centered = values - self._shift
+        self._sum = float(centered.sum())
+        self._sum_sq = float((centered * centered).sum())
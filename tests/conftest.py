@@ -0,0 +1,17 @@
+"""
+Configuration commune des tests : modules de l'application importables depuis la racine
+du dépôt, base SQLite temporaire par test
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Base de données neuve (migrations appliquées) dans un répertoire temporaire"""
+    from database import Database
+    return Database(str(tmp_path / 'fertigation.db'))
@@ -0,0 +1,66 @@
+"""
+Agrégation des alertes : une seule alerte par (capteur, type) même quand plusieurs
+threads signalent la même anomalie pendant sa création
+"""
+import threading
+import time
+
+import pytest
+
+from alert_aggregator import AlertAggregator
+
+ANOMALY = {'sensor_name': 'ph', 'type': 'high_value', 'message': 'pH élevé', 'severity': 'high'}
+
+
+class SlowAlertDatabase:
+    """Base factice dont create_alert est lent (fenêtre de concurrence élargie)"""
+    
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.created = 0
+        self.occurrences = []
+        self._lock = threading.Lock()
+    
+    def get_active_alert_keys(self):
+        return {}
+    
+    def create_alert(self, **alert):
+        time.sleep(0.05)
+        if self.fail:
+            raise RuntimeError('database is locked')
+        with self._lock:
+            self.created += 1
+            return self.created
+    
+    def record_alert_occurrences(self, rows):
+        self.occurrences.extend(rows)
+        return len(rows)
+
+
+def test_concurrent_submissions_create_one_alert():
+    db = SlowAlertDatabase()
+    aggregator = AlertAggregator(db, windows={}, default_window_s=60, flush_interval_ms=10 ** 9)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(aggregator.submit(ANOMALY))) for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert db.created == 1
+    assert sorted(result for result in results if result is not None) == [1]
+    assert aggregator.flush() == 1
+    assert [(alert_id, count) for alert_id, count, _ in db.occurrences] == [(1, 15)]
+    assert aggregator.get_stats()['reserved_keys'] == 0
+
+
+def test_failed_creation_releases_the_key():
+    db = SlowAlertDatabase(fail=True)
+    aggregator = AlertAggregator(db, windows={}, default_window_s=60)
+    with pytest.raises(RuntimeError):
+        aggregator.submit(ANOMALY)
+    
+    db.fail = False
+    assert aggregator.submit(ANOMALY) == 1
+    stats = aggregator.get_stats()
+    assert stats['active_keys'] == 1 and stats['reserved_keys'] == 0
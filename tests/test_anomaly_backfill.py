@@ -0,0 +1,116 @@
+"""
+Ré-analyse de l'historique : une interruption entre l'écriture des alertes d'un lot et
+son point de contrôle ne duplique aucune alerte à la reprise, et le résultat ne dépend
+pas du découpage en lots ni des reprises
+"""
+import sqlite3
+
+import numpy as np
+import pytest
+
+from anomaly_backfill import AnomalyBackfill
+from database import Database
+
+START_MS = 1700000000000
+STEP_MS = 30 * 1000
+SENSORS = {'ph': (6.8, 0.15, 'pH'), 'conductivity': (1200.0, 40.0, 'µS/cm'), 'temperature': (24.0, 0.8, '°C')}
+
+
+def fill(db, n=1500, seed=0):
+    """Séries bruitées avec pics, sorties de seuil et une dérive lente"""
+    rng = np.random.default_rng(seed)
+    readings = []
+    for sensor_name, (level, noise, unit) in SENSORS.items():
+        values = level + rng.normal(0.0, noise, n) + np.linspace(0.0, 6 * noise, n)
+        spikes = rng.choice(n, 15, replace=False)
+        values[spikes] += rng.choice([-1, 1], 15) * noise * rng.uniform(4, 12, 15)
+        for k, value in enumerate(values):
+            readings.append({'sensor_type': 'npk', 'sensor_name': sensor_name, 'value': float(value),
+                             'unit': unit, 'ts_ms': START_MS + k * STEP_MS})
+    db.insert_sensor_readings(readings)
+
+
+def alerts(db):
+    conn = sqlite3.connect(db.db_path)
+    try:
+        return sorted(conn.execute('SELECT sensor_name, alert_type, created_at_ms, message FROM alerts').fetchall())
+    finally:
+        conn.close()
+
+
+def backfill(db, start_ms=START_MS, chunk_size=100000):
+    return AnomalyBackfill(start_ms, START_MS + 10 ** 9, sensors=list(SENSORS), db=db,
+                           chunk_size=chunk_size, check_trend=True)
+
+
+@pytest.fixture
+def reference(tmp_path):
+    """Alertes d'une ré-analyse complète en un seul lot"""
+    def run(start_ms=START_MS):
+        db = Database(str(tmp_path / f'reference-{start_ms}.db'))
+        fill(db)
+        backfill(db, start_ms).run()
+        return alerts(db)
+    return run
+
+
+def test_crash_between_alerts_and_checkpoint_does_not_duplicate(db, reference, monkeypatch):
+    fill(db)
+    writes = []
+    original = Database._write_backfill_checkpoint
+    
+    def crash_on_third_chunk(self, conn, name, checkpoint):
+        writes.append(checkpoint['last_ts_ms'])
+        if len(writes) == 3:
+            raise KeyboardInterrupt     # arrêt du processus après l'insertion des alertes du lot
+        original(self, conn, name, checkpoint)
+    
+    monkeypatch.setattr(Database, '_write_backfill_checkpoint', crash_on_third_chunk)
+    with pytest.raises(KeyboardInterrupt):
+        backfill(db, chunk_size=700).run()
+    monkeypatch.setattr(Database, '_write_backfill_checkpoint', original)
+    
+    checkpoint = backfill(db, chunk_size=700).run()
+    assert checkpoint['completed']
+    assert checkpoint['processed_rows'] == 1500 * len(SENSORS)
+    assert alerts(db) == reference()
+    assert checkpoint['alerts_written'] == len(alerts(db))
+
+
+def test_completed_run_is_not_replayed(db):
+    fill(db)
+    backfill(db, chunk_size=1000).run()
+    written = alerts(db)
+    assert written
+    backfill(db, chunk_size=1000).run()
+    assert alerts(db) == written
+
+
+@pytest.mark.parametrize('chunk_size', [97, 700, 2000])
+def test_chunked_resumed_run_matches_full_run(db, reference, chunk_size, monkeypatch):
+    # Plage commençant au milieu des données : une reprise ne doit pas préchauffer ses
+    # fenêtres avec les lectures antérieures à `start_ms`
+    start_ms = START_MS + 600 * STEP_MS
+    fill(db)
+    original = Database.get_readings_chunk
+    reads = []
+    
+    def one_chunk_per_run(self, *args, **kwargs):
+        if kwargs.get('limit') == chunk_size:
+            if reads:
+                raise KeyboardInterrupt     # arrêt après le premier lot de chaque exécution
+            reads.append(1)
+        return original(self, *args, **kwargs)
+    
+    monkeypatch.setattr(Database, 'get_readings_chunk', one_chunk_per_run)
+    resumes = 0
+    while True:
+        reads.clear()
+        try:
+            if backfill(db, start_ms, chunk_size).run().get('completed'):
+                break
+        except KeyboardInterrupt:
+            resumes += 1
+    
+    assert resumes >= 2
+    assert alerts(db) == reference(start_ms)
@@ -0,0 +1,42 @@
+"""
+Tâches périodiques : un déclenchement reçu pendant une exécution n'est pas perdu,
+et stop() réveille la tâche immédiatement
+"""
+import threading
+import time
+
+from background_jobs import PeriodicJob
+
+
+def test_trigger_during_run_is_not_lost():
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+    
+    def work():
+        runs.append(time.monotonic())
+        if len(runs) == 1:
+            started.set()
+            release.wait(5)
+    
+    job = PeriodicJob('test-trigger', work, interval_s=3600)
+    job.start()
+    try:
+        assert started.wait(5)
+        job.trigger()           # pendant la première exécution
+        release.set()
+        deadline = time.monotonic() + 5
+        while len(runs) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(runs) == 2
+    finally:
+        job.stop()
+
+
+def test_stop_wakes_the_job():
+    job = PeriodicJob('test-stop', lambda: None, interval_s=3600, initial_delay_s=3600)
+    job.start()
+    started = time.monotonic()
+    job.stop()
+    assert time.monotonic() - started < 1
+    assert not job.get_status()['running']
@@ -0,0 +1,60 @@
+"""
+Dérive d'étalonnage : Theil–Sen comparé à scipy.stats.theilslopes en présence de valeurs
+aberrantes, et alerte sur les moyennes journalières (dérive régulière contre bruit plat)
+"""
+import numpy as np
+import pytest
+from scipy import stats
+
+from calibration_drift import DAY_MS, CalibrationDriftAnalyzer, theil_sen
+
+START_MS = 1767225600000    # 2026-01-01 00:00 UTC
+READINGS_PER_DAY = 48
+
+
+def test_theil_sen_matches_scipy_with_outliers():
+    rng = np.random.default_rng(0)
+    x = np.sort(rng.uniform(0.0, 60.0, 80))
+    y = 7.0 + 0.02 * x + rng.normal(0.0, 0.05, len(x))
+    y[rng.choice(len(x), 12, replace=False)] += rng.choice([-3.0, 4.0], 12)
+    
+    slope, intercept, agreement = theil_sen(x, y)
+    reference = stats.theilslopes(y, x, method='joint')
+    
+    assert slope == pytest.approx(reference.slope, rel=1e-12)
+    assert intercept == pytest.approx(reference.intercept, rel=1e-12)
+    assert slope == pytest.approx(0.02, abs=0.005)
+    assert np.polyfit(x, y, 1)[0] != pytest.approx(0.02, abs=0.005)   # moindres carrés faussés
+    assert 0.5 < agreement <= 1.0
+
+
+def insert_daily_readings(db, drift_per_day, days=30):
+    rng = np.random.default_rng(1)
+    readings = []
+    for k in range(days * READINGS_PER_DAY):
+        ts_ms = START_MS + k * DAY_MS // READINGS_PER_DAY
+        value = 7.0 + drift_per_day * (ts_ms - START_MS) / DAY_MS + rng.normal(0.0, 0.1)
+        readings.append({'sensor_type': 'npk_8in1', 'sensor_name': 'ph', 'value': value, 'unit': 'pH', 'ts_ms': ts_ms})
+    db.insert_sensor_readings(readings)
+    return START_MS + days * DAY_MS
+
+
+def test_steady_drift_raises_calibration_alert(db):
+    end_ms = insert_daily_readings(db, drift_per_day=0.02)
+    analyzer = CalibrationDriftAnalyzer(db)
+    
+    estimate = analyzer.analyze_sensor('ph', end_ms)
+    assert estimate['days'] == 30
+    assert estimate['slope_per_day'] == pytest.approx(0.02, abs=0.003)
+    
+    anomalies = analyzer.detect(end_ms)
+    assert [(anomaly['sensor_name'], anomaly['type']) for anomaly in anomalies] == [('ph', 'calibration_drift')]
+    assert anomalies[0]['offset'] == pytest.approx(0.02 * 29, abs=0.1)
+
+
+def test_flat_noise_raises_no_alert(db):
+    end_ms = insert_daily_readings(db, drift_per_day=0.0)
+    analyzer = CalibrationDriftAnalyzer(db)
+    
+    assert analyzer.analyze_sensor('ph', end_ms)['offset_ratio'] < analyzer.min_offset_ratio
+    assert analyzer.detect(end_ms) == []
@@ -0,0 +1,66 @@
+"""
+Moteur de corrélation : covariance glissante tenue par mises à jour de rang 1 comparée à
+np.cov sur la même fenêtre, et seuil du χ² sur la distance de Mahalanobis
+"""
+import numpy as np
+import pytest
+from scipy.stats import chi2
+
+from correlation_engine import CorrelationEngine
+
+SENSORS = ['ph', 'conductivity', 'salinity']
+SLOT_MS = 10000
+
+
+def feed(engine, rows, first_slot=0):
+    """Une ligne par créneau ; renvoie l'anomalie éventuelle du créneau clos par chaque ligne"""
+    anomalies = []
+    for k, row in enumerate(rows, start=first_slot):
+        closed = [engine.update(name, value, k * SLOT_MS) for name, value in zip(SENSORS, row)]
+        anomalies.append(closed[0])
+    return anomalies
+
+
+def correlated_rows(rng, n, offset=0.0):
+    base = rng.normal(0.0, 1.0, n)
+    return np.column_stack((
+        offset + base,
+        offset + 2.0 * base + rng.normal(0.0, 0.05, n),
+        offset - base + rng.normal(0.0, 0.05, n)
+    ))
+
+
+@pytest.mark.parametrize('offset', [0.0, 1e5])
+def test_incremental_covariance_matches_numpy(offset):
+    rows = correlated_rows(np.random.default_rng(0), 1000, offset)
+    engine = CorrelationEngine(SENSORS, slot_ms=SLOT_MS, window_rows=120, min_rows=10 ** 9)
+    
+    for k in range(len(rows)):
+        feed(engine, rows[k:k + 1], first_slot=k)
+        if k not in (1, 3, 60, 119, 120, 121, 250, 599, 999):
+            continue
+        # Créneau k encore ouvert : la fenêtre contient les lignes closes précédentes
+        window = rows[max(0, k - 120):k]
+        assert engine.count == len(window)
+        assert engine.mean() == pytest.approx(window.mean(axis=0), rel=1e-12, abs=1e-9)
+        if len(window) >= 2:
+            np.testing.assert_allclose(engine.covariance(), np.cov(window, rowvar=False), rtol=1e-7, atol=1e-9)
+
+
+def test_off_axis_point_trips_chi2_threshold():
+    rng = np.random.default_rng(1)
+    engine = CorrelationEngine(SENSORS, slot_ms=SLOT_MS, window_rows=360, min_rows=60, quantile=0.999)
+    rows = correlated_rows(rng, 300)
+    assert not any(feed(engine, rows))
+    
+    # Chaque valeur reste dans sa plage habituelle, mais le point quitte l'axe de corrélation
+    on_axis, off_axis = np.array([1.0, 2.0, -1.0]), np.array([1.0, -2.0, -1.0])
+    mean, cov = engine.mean(), engine.covariance()
+    distance2 = float((off_axis - mean) @ np.linalg.solve(cov, off_axis - mean))
+    assert distance2 > chi2.ppf(0.999, len(SENSORS))
+    
+    assert feed(engine, [on_axis, rows[0]], first_slot=300) == [None, None]
+    anomaly = feed(engine, [off_axis, rows[1]], first_slot=302)[1]
+    assert anomaly['type'] == 'correlation_anomaly'
+    assert 'conductivity' in anomaly['sensors']
+    assert anomaly['severity'] == 'high'
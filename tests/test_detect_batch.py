@@ -0,0 +1,66 @@
+"""
+Détection par lots : detect_batch renvoie, pour chaque lecture d'un flux multi-capteurs,
+les mêmes anomalies que detect_all_anomalies appelé lecture par lecture (chemins unitaire
+et vectorisé, avec et sans contrôle de tendance)
+"""
+import numpy as np
+import pytest
+
+from anomaly_detector import AnomalyDetector
+from config import Config
+from database import now_ms
+
+NPK = ['nitrogen', 'phosphorus', 'potassium', 'ph', 'conductivity', 'temperature', 'humidity', 'salinity']
+BATCH_SIZES = [1, 7, 3, 400, 13, 12, 900, 1, 50, 2000]
+
+
+def mixed_stream(ticks=400):
+    """Messages de tous les équipements toutes les 10 s : bruit, valeurs aberrantes, hors seuils et dérive"""
+    rng = np.random.default_rng(0)
+    start_ms = now_ms() - ticks * 10000
+    stream = []
+    for tick in range(ticks):
+        for device, names in (('npk_8in1', NPK), ('water_level', ['water_level', 'water_temperature']),
+                              ('water_flow', ['water_flow', 'water_pressure'])):
+            for name in names:
+                threshold = Config.SENSOR_THRESHOLDS[name]
+                center, spread = (threshold['min'] + threshold['max']) / 2, (threshold['max'] - threshold['min']) / 20
+                value = center + rng.normal(0.0, spread)
+                if name == 'ph' and tick > ticks // 2:
+                    value += spread * (tick - ticks // 2) / 20     # dérive lente
+                if rng.random() < 0.02:
+                    value = center + rng.choice([-1, 1]) * spread * rng.uniform(6, 15)
+                stream.append({'sensor_type': device, 'sensor_name': name, 'value': round(float(value), 3),
+                               'unit': threshold['unit'], 'ts_ms': start_ms + tick * 10000})
+    return stream
+
+
+def canonical(anomalies):
+    return sorted((anomaly['type'], anomaly['sensor_name'], anomaly['message'], anomaly['severity'])
+                  for anomaly in anomalies)
+
+
+@pytest.mark.parametrize('check_trend', [False, True])
+def test_detect_batch_matches_sequential_detection(db, check_trend):
+    stream = mixed_stream()
+    sequential, batched = AnomalyDetector(db), AnomalyDetector(db)
+    
+    expected = []
+    for reading in stream:
+        trend = sequential.detect_trend_anomaly(reading) if check_trend else None
+        anomalies = sequential.detect_all_anomalies(reading)
+        expected.append(canonical(anomalies + ([trend] if trend else [])))
+    
+    actual, position = [], 0
+    for size in BATCH_SIZES:
+        batch = stream[position:position + size]
+        actual.extend(canonical(anomalies) for anomalies in batched.detect_batch(batch, check_trend))
+        position += size
+    actual.extend(canonical(anomalies) for anomalies in batched.detect_batch(stream[position:], check_trend))
+    
+    assert len(actual) == len(stream)
+    assert actual == expected
+    types = {anomaly[0] for anomalies in expected for anomaly in anomalies}
+    assert {'threshold_low', 'threshold_high', 'statistical_anomaly', 'drift_ewma', 'drift_cusum',
+            'correlation_anomaly'} <= types
+    assert ('trend_anomaly' in types) == check_trend
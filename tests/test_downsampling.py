@@ -0,0 +1,52 @@
+"""
+Sous-échantillonnage LTTB : nombre de points demandé, extrémités conservées, indices
+croissants, pics préservés
+"""
+import numpy as np
+import pytest
+
+from downsampling import downsample_points, lttb_indices
+
+
+@pytest.mark.parametrize('n, threshold', [(1000, 100), (1000, 3), (101, 100), (5000, 777)])
+def test_length_and_endpoints(n, threshold):
+    rng = np.random.default_rng(n + threshold)
+    x = np.arange(n, dtype=np.float64)
+    y = rng.normal(size=n).cumsum()
+    indices = lttb_indices(x, y, threshold)
+    
+    assert len(indices) == threshold
+    assert indices[0] == 0
+    assert indices[-1] == n - 1
+    assert (np.diff(indices) > 0).all()
+
+
+@pytest.mark.parametrize('threshold', [2, 1000, 2000])
+def test_small_threshold_or_short_series_keeps_everything(threshold):
+    x = np.arange(1000)
+    assert np.array_equal(lttb_indices(x, np.sin(x), threshold), x)
+
+
+def test_one_point_per_bucket():
+    n, threshold = 1002, 102
+    indices = lttb_indices(np.arange(n), np.cos(np.arange(n) / 7), threshold)
+    # 100 intervalles de 10 points entre les extrémités
+    buckets = (indices[1:-1] - 1) // 10
+    assert np.array_equal(buckets, np.arange(threshold - 2))
+
+
+def test_spike_is_kept():
+    y = np.zeros(10000)
+    y[4321] = 50.0
+    indices = lttb_indices(np.arange(len(y)), y, 200)
+    assert 4321 in indices
+
+
+def test_downsample_points():
+    points = [{'ts_ms': 1700000000000 + i * 1000, 'value': float(i % 17)} for i in range(500)]
+    sampled = downsample_points(points, 50)
+    assert len(sampled) == 50
+    assert sampled[0] is points[0]
+    assert sampled[-1] is points[-1]
+    assert downsample_points(points, 500) is points
+    assert downsample_points(points, None) is points
@@ -0,0 +1,48 @@
+"""
+Détecteurs de dérive : référence figée après le préchauffage (une dérive lente suivie par
+la fenêtre glissante reste détectée), classe de base abstraite, état sérialisable
+"""
+import numpy as np
+import pytest
+
+from drift_detectors import DRIFT_DETECTORS, DriftDetector, create_detectors
+from streaming_stats import SlidingWindowStats
+
+
+def count_alarms(detector, values, window_size=200):
+    window = SlidingWindowStats(window_size)
+    alarms = 0
+    for k, value in enumerate(values):
+        if detector.update(value, 'pH', len(window), window.mean, window.std):
+            alarms += 1
+        window.push(value, k)
+    return alarms
+
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        DriftDetector('ph')
+
+
+@pytest.mark.parametrize('name', sorted(DRIFT_DETECTORS))
+def test_slow_drift_raises_alarm_rate(name):
+    # Rampe de 0,003 σ par lecture : la moyenne de la fenêtre (200 lectures) ne retarde
+    # que de 0,3 σ sur le signal, la référence figée s'en écarte de plusieurs σ
+    noise = np.random.default_rng(7).normal(0.0, 1.0, 3000)
+    stable = count_alarms(create_detectors('ph', {name: {}})[0], noise)
+    drifting = count_alarms(create_detectors('ph', {name: {}})[0], noise + np.arange(3000) * 0.003)
+    assert drifting > 2 * stable
+
+
+def test_reference_is_frozen_and_checkpointed():
+    detector = create_detectors('ph', {'cusum': {'min_samples': 10}})[0]
+    assert detector.update(7.0, 'pH', 5, 7.0, 0.1) is None
+    assert detector.reference_mean is None
+    
+    detector.update(7.0, 'pH', 10, 7.0, 0.1)
+    detector.update(7.05, 'pH', 11, 7.2, 0.3)       # la fenêtre a bougé, pas la référence
+    assert (detector.reference_mean, detector.reference_std) == (7.0, 0.1)
+    
+    restored = create_detectors('ph', {'cusum': {'min_samples': 10}})[0]
+    restored.load_state(detector.state_dict())
+    assert restored.state_dict() == detector.state_dict()
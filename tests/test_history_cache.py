@@ -0,0 +1,69 @@
+"""
+Cache de l'historique : une entrée alimentée par les nouvelles lectures reste identique
+à une relecture de la base, et la limite de taille évince le capteur le moins récemment utilisé
+"""
+from database import now_ms
+from history_cache import HistoryCache
+
+MINUTE_MS = 60 * 1000
+
+
+def reading(sensor_name, ts_ms, value):
+    return {'sensor_type': 'npk_8in1', 'sensor_name': sensor_name, 'value': value, 'unit': 'pH', 'ts_ms': ts_ms}
+
+
+def cold_read(db, sensor_name, hours):
+    end_ms = now_ms()
+    return db.get_readings_by_timerange(end_ms - hours * 3600 * 1000, end_ms, sensor_name)
+
+
+def series(rows):
+    return [(row['sensor_name'], row['ts_ms'], row['value']) for row in rows]
+
+
+def test_appended_entry_matches_cold_read(db):
+    # Lectures à la minute, décalées de 30 s des bornes de la fenêtre de 2 h
+    start_ms = now_ms() - 3 * 60 * MINUTE_MS + 30000
+    db.insert_sensor_readings([reading('ph', start_ms + k * MINUTE_MS, 6.5 + k / 1000) for k in range(120)])
+    cache = HistoryCache(max_rows=10000)
+    cached = cache.get('ph', 2, lambda: cold_read(db, 'ph', 2))
+    assert series(cached) == series(cold_read(db, 'ph', 2))
+    
+    # Nouvelles lectures : écrites en base et ajoutées au cache (une à une puis par lot)
+    new = [reading('ph', start_ms + k * MINUTE_MS, 6.5 + k / 1000) for k in range(120, 179)]
+    db.insert_sensor_readings(new)
+    for row in new[:20]:
+        cache.append(row)
+    cache.extend('ph', new[20:])
+    cache.append(reading('ec', start_ms, 1.0))   # autre capteur : sans effet
+    
+    loads = []
+    warm = cache.get('ph', 2, lambda: loads.append(1) or [])
+    assert loads == []
+    assert series(warm) == series(cold_read(db, 'ph', 2))
+    assert len(warm) == 119
+
+
+def test_cap_evicts_least_recently_used_sensor():
+    ts_ms = now_ms()
+    loads = []
+    
+    def loader(sensor_name):
+        def load():
+            loads.append(sensor_name)
+            return [reading(sensor_name, ts_ms - k * MINUTE_MS, float(k)) for k in range(5, 0, -1)]
+        return load
+    
+    cache = HistoryCache(max_rows=10)
+    cache.get('ph', 2, loader('ph'))
+    cache.get('salinity', 2, loader('salinity'))
+    cache.get('ph', 2, loader('ph'))                 # ph redevient le plus récent
+    cache.get('humidity', 2, loader('humidity'))     # 15 lectures > 10 : salinity évincé
+    
+    assert cache.get_stats()['evictions'] == 1
+    assert cache.get_stats()['rows'] == 10
+    cache.get('ph', 2, loader('ph'))
+    cache.get('humidity', 2, loader('humidity'))
+    assert loads == ['ph', 'salinity', 'humidity']
+    cache.get('salinity', 2, loader('salinity'))
+    assert loads[-1] == 'salinity'
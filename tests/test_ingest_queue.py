@@ -0,0 +1,106 @@
+"""
+File d'ingestion : un lot refusé ne fait perdre que ses lectures fautives, une erreur
+transitoire est réessayée, et l'écriture reprend normalement après un échec
+"""
+import sqlite3
+
+import pytest
+
+from ingest_queue import IngestQueue, IngestQueueFull
+
+
+def reading(sensor_name, value, ts_ms=1700000000000):
+    return {'sensor_type': 'npk', 'sensor_name': sensor_name, 'value': value, 'unit': 'u', 'ts_ms': ts_ms}
+
+
+class FlakyDatabase:
+    """Enveloppe d'une base : les `failures` premières écritures lèvent `error`"""
+    
+    def __init__(self, db, error, failures):
+        self.db = db
+        self.error = error
+        self.failures = failures
+        self.calls = 0
+    
+    def insert_sensor_readings(self, readings):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise self.error
+        return self.db.insert_sensor_readings(readings)
+
+
+def run_queue(db, batches):
+    """Soumet les lots, arrête la file (écriture de tout le reste) et renvoie (lots écrits, métriques)"""
+    committed = []
+    queue = IngestQueue(db, on_commit=committed.append, batch_size=100, flush_interval_ms=10)
+    queue.retry_backoff = 0.001
+    queue.start()
+    for batch in batches:
+        queue.submit(batch)
+    queue.stop()
+    return committed, queue.get_metrics()
+
+
+def stored_values(db, sensor_name):
+    return sorted(row['value'] for row in db.get_recent_readings(sensor_name, limit=1000))
+
+
+def test_failed_batch_keeps_valid_readings(db):
+    # sensor_name NULL : violation NOT NULL pour cette seule lecture
+    committed, metrics = run_queue(db, [[reading('ph', 6.5), reading(None, 1.0), reading('ph', 6.7)]])
+    
+    assert stored_values(db, 'ph') == [6.5, 6.7]
+    assert metrics['row_by_row_batches'] == 1
+    assert metrics['failed_rows'] == 1
+    assert metrics['committed_rows'] == 2
+    assert [len(batch) for batch in committed] == [2]
+
+
+def test_transient_error_is_retried(db):
+    flaky = FlakyDatabase(db, sqlite3.OperationalError('database is locked'), failures=2)
+    committed, metrics = run_queue(flaky, [[reading('ec', 1.2), reading('ec', 1.3)]])
+    
+    assert stored_values(db, 'ec') == [1.2, 1.3]
+    assert metrics['retried_batches'] == 2
+    assert metrics['row_by_row_batches'] == 0
+    assert metrics['committed_rows'] == 2
+
+
+def test_persistent_error_falls_back_to_row_by_row(db):
+    # Tous les essais du lot échouent, pas les écritures ligne par ligne
+    queue_retries = IngestQueue(db).write_retries
+    flaky = FlakyDatabase(db, sqlite3.OperationalError('database is locked'), failures=queue_retries + 1)
+    committed, metrics = run_queue(flaky, [[reading('ec', 1.2), reading('ec', 1.3)]])
+    
+    assert stored_values(db, 'ec') == [1.2, 1.3]
+    assert metrics['retried_batches'] == queue_retries
+    assert metrics['row_by_row_batches'] == 1
+    assert metrics['failed_rows'] == 0
+
+
+def test_writer_recovers_after_failed_batch(db):
+    committed, metrics = run_queue(db, [[reading(None, 1.0)]])
+    assert metrics['failed_rows'] == 1
+    
+    committed, metrics = run_queue(db, [[reading('ph', 7.0)], [reading('ph', 7.1)]])
+    assert stored_values(db, 'ph') == [7.0, 7.1]
+    assert metrics['failed_rows'] == 0
+
+
+def test_enqueue_sets_reading_timestamp(db):
+    queued = reading('ph', 6.9, ts_ms=None)
+    committed, _ = run_queue(db, [[queued]])
+    assert queued['ts_ms'] > 0
+    assert committed[0][0]['ts_ms'] == queued['ts_ms']
+
+
+def test_full_queue_rejects_and_counts(db):
+    queue = IngestQueue(db, max_size=2)
+    queue.start()
+    try:
+        with pytest.raises(IngestQueueFull):
+            queue.submit([reading('ph', 6.0), reading('ph', 6.1), reading('ph', 6.2)])
+        assert queue.get_metrics()['rejected_rows'] == 3
+    finally:
+        queue.stop()
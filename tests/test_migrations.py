@@ -0,0 +1,94 @@
+"""
+Migrations de schéma : une base à jour n'est pas modifiée par un nouvel init_database(),
+et chaque migration peut être rejouée sans erreur sur un schéma existant ; l'accès en
+lecture seule des processus de détection ne touche pas au schéma
+"""
+import sqlite3
+
+import pytest
+
+from database import Database
+
+
+def schema(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(conn.execute('SELECT type, name, sql FROM sqlite_master').fetchall(), key=str)
+    finally:
+        conn.close()
+
+
+def test_fresh_database_reaches_latest_version(db):
+    assert db.get_schema_version() == Database.MIGRATIONS[-1][0]
+
+
+def test_init_database_is_idempotent(db):
+    before = schema(db.db_path)
+    db.init_database()
+    db.init_database()
+    assert db.get_schema_version() == Database.MIGRATIONS[-1][0]
+    assert schema(db.db_path) == before
+
+
+def test_migrations_can_be_replayed(db):
+    before = schema(db.db_path)
+    conn = sqlite3.connect(db.db_path)
+    conn.execute('PRAGMA user_version = 0')
+    conn.commit()
+    conn.close()
+    
+    db.init_database()
+    assert db.get_schema_version() == Database.MIGRATIONS[-1][0]
+    assert schema(db.db_path) == before
+
+
+def test_replayed_migrations_keep_data(db):
+    db.insert_sensor_readings([
+        {'sensor_type': 'npk', 'sensor_name': 'ph', 'value': 6.8, 'unit': 'pH', 'ts_ms': 1700000000000}
+    ])
+    conn = sqlite3.connect(db.db_path)
+    conn.execute('PRAGMA user_version = 0')
+    conn.commit()
+    conn.close()
+    
+    db.init_database()
+    readings = db.get_recent_readings('ph')
+    assert [reading['value'] for reading in readings] == [6.8]
+
+
+def test_legacy_timestamp_is_derived_from_ts_ms(db):
+    db.insert_sensor_readings([
+        {'sensor_type': 'npk', 'sensor_name': 'ph', 'value': 6.8, 'unit': 'pH', 'ts_ms': 1700000000123}
+    ])
+    assert db.get_recent_readings('ph')[0]['timestamp'] == '2023-11-14 22:13:20.123'
+
+
+def test_unconverted_predictions_are_converted_before_use(db):
+    db.save_prediction('ph', 0.2, None, 0.8)
+    conn = sqlite3.connect(db.db_path)
+    conn.execute("UPDATE predictions SET created_at = '2030-01-01 00:00:00', created_at_ms = NULL")
+    conn.execute('PRAGMA user_version = 11')
+    conn.commit()
+    conn.close()
+    
+    db.init_database()
+    latest = db.get_latest_predictions()
+    assert [(prediction['sensor_name'], prediction['created_at_ms']) for prediction in latest] == [('ph', 1893456000000)]
+
+
+def test_read_only_access_does_no_schema_work(db):
+    db.insert_sensor_readings([
+        {'sensor_type': 'npk', 'sensor_name': 'ph', 'value': 6.8, 'unit': 'pH', 'ts_ms': 1700000000000}
+    ])
+    conn = sqlite3.connect(db.db_path)
+    conn.execute('PRAGMA user_version = 1')
+    conn.commit()
+    conn.close()
+    
+    reader = Database.open_read_only(db.db_path)
+    assert [reading['value'] for reading in reader.get_recent_readings('ph')] == [6.8]
+    assert reader.get_schema_version() == 1
+    with pytest.raises(sqlite3.OperationalError):
+        reader.insert_sensor_readings([
+            {'sensor_type': 'npk', 'sensor_name': 'ph', 'value': 7.0, 'unit': 'pH', 'ts_ms': 1700000001000}
+        ])
@@ -0,0 +1,58 @@
+"""
+Analyse prédictive incrémentale : de nouvelles lectures qui ne modifient pas les entrées
+de la prédiction (tendance, paramètres de vie, palier de confiance) ne relancent pas
+l'analyse du capteur ; une tendance modifiée la relance
+"""
+import pytest
+
+import predictive_maintenance
+from config import Config
+from predictive_maintenance import PredictiveMaintenance
+from predictive_scheduler import PredictiveScheduler
+
+HOUR_MS = 3600 * 1000
+START_MS = 1700000000000
+
+
+def linear_readings(first_hour, hours, slope=-0.002, sensor_name='ph'):
+    """Lectures horaires exactement alignées sur une droite (pente en unités par heure)"""
+    return [
+        {'sensor_type': 'npk', 'sensor_name': sensor_name, 'value': 7.0 + slope * hour,
+         'unit': 'pH', 'ts_ms': START_MS + hour * HOUR_MS}
+        for hour in range(first_hour, first_hour + hours)
+    ]
+
+
+@pytest.fixture
+def scheduler(db, monkeypatch):
+    monkeypatch.setattr(predictive_maintenance, 'get_database', lambda: db)
+    return PredictiveScheduler(PredictiveMaintenance())
+
+
+def test_readings_on_the_same_trend_are_skipped(db, scheduler):
+    db.insert_sensor_readings(linear_readings(0, 300))
+    first = scheduler.run()
+    assert first['sensors_analyzed'] == 1
+    
+    # Même droite, plus de lectures : pente, corrélation et palier de confiance inchangés
+    db.insert_sensor_readings(linear_readings(300, 50))
+    second = scheduler.run()
+    assert second['sensors_analyzed'] == 0
+    assert second['sensors_skipped'] == len(Config.SENSOR_THRESHOLDS)
+
+
+def test_changed_trend_is_reanalyzed(db, scheduler):
+    db.insert_sensor_readings(linear_readings(0, 300))
+    scheduler.run()
+    
+    db.insert_sensor_readings(linear_readings(300, 100, slope=0.05))
+    assert scheduler.run()['sensors_analyzed'] == 1
+
+
+def test_confidence_tier_change_is_reanalyzed(db, scheduler):
+    db.insert_sensor_readings(linear_readings(0, 150))
+    scheduler.run()
+    
+    # 150 → 250 lectures : palier de confiance 0,7 → 0,9
+    db.insert_sensor_readings(linear_readings(150, 100))
+    assert scheduler.run()['sensors_analyzed'] == 1
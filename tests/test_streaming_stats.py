@@ -0,0 +1,76 @@
+"""
+Statistiques glissantes comparées à NumPy sur la fenêtre courante : mises à jour une à
+une, expiration temporelle, fenêtres quasi constantes et version vectorisée
+"""
+import numpy as np
+import pytest
+
+from streaming_stats import SlidingWindowStats
+
+
+def assert_matches_numpy(stats, window):
+    assert len(stats) == len(window)
+    assert np.array_equal(stats.values(), window)
+    scale = max(abs(window.mean()), 1.0)
+    assert stats.mean == pytest.approx(window.mean(), rel=1e-9, abs=1e-12 * scale)
+    assert stats.std == pytest.approx(window.std(), rel=1e-6, abs=1e-9 * scale)
+
+
+@pytest.mark.parametrize('series', [
+    'noise', 'drift', 'constant', 'step_to_large_constant'
+])
+def test_push_matches_numpy(series):
+    rng = np.random.default_rng(0)
+    n, capacity = 3000, 256
+    values = {
+        'noise': rng.normal(7.0, 0.1, n),
+        'drift': np.linspace(0.0, 1e5, n) + rng.normal(0.0, 1.0, n),
+        'constant': np.full(n, 6.85),
+        'step_to_large_constant': np.concatenate((rng.normal(0.0, 1.0, n // 2), np.full(n - n // 2, 1e6)))
+    }[series]
+    
+    stats = SlidingWindowStats(capacity)
+    for k, value in enumerate(values):
+        stats.push(value, k)
+        if k % 37 == 0 or k == n - 1:
+            assert_matches_numpy(stats, values[max(0, k + 1 - capacity):k + 1])
+
+
+def test_time_window_expiry():
+    stats = SlidingWindowStats(1000, window_ms=10000)
+    timestamps = np.arange(0, 60000, 700)
+    values = np.sin(timestamps / 5000.0)
+    for ts_ms, value in zip(timestamps, values):
+        stats.push(value, int(ts_ms))
+    
+    kept = timestamps >= timestamps[-1] - 10000
+    assert_matches_numpy(stats, values[kept])
+    assert stats.last_timestamp == timestamps[-1]
+    
+    stats.expire(int(timestamps[-1]) + 1)
+    assert len(stats) == 0
+    assert stats.mean == 0.0 and stats.std == 0.0
+
+
+def test_evaluate_and_extend_matches_successive_pushes():
+    rng = np.random.default_rng(1)
+    timestamps = np.cumsum(rng.integers(100, 2000, 2000))
+    values = rng.normal(20.0, 2.0, 2000)
+    values[800:1200] = 25.0
+    
+    batch = SlidingWindowStats(300, window_ms=120000)
+    batch.load(timestamps[:100], values[:100])
+    counts, means, stds = batch.evaluate_and_extend(timestamps[100:], values[100:])
+    
+    single = SlidingWindowStats(300, window_ms=120000)
+    single.load(timestamps[:100], values[:100])
+    for j, (ts_ms, value) in enumerate(zip(timestamps[100:], values[100:])):
+        single.expire(int(ts_ms) - 120000)
+        window = single.values()
+        assert counts[j] == len(window)
+        assert means[j] == pytest.approx(window.mean(), rel=1e-9)
+        assert stds[j] == pytest.approx(window.std(), rel=1e-6, abs=1e-9)
+        single.push(value, int(ts_ms))
+    
+    assert np.array_equal(batch.values(), single.values())
+    assert batch.std == pytest.approx(single.std, rel=1e-9)
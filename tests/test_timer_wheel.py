@@ -0,0 +1,75 @@
+"""
+Roue temporelle : expiration à l'échéance (ni avant ni en double), reprogrammation,
+annulation, échéances au-delà d'un tour de roue et avance de plusieurs tours
+"""
+import random
+
+from timer_wheel import TimerWheel
+
+
+def test_expires_at_deadline_only():
+    wheel = TimerWheel(tick_ms=100, slots=8)
+    wheel.advance(0)
+    wheel.schedule('ph', 450)
+    
+    assert wheel.advance(449) == []
+    assert wheel.advance(450) == [('ph', 450)]
+    assert wheel.advance(10000) == []
+    assert 'ph' not in wheel and len(wheel) == 0
+
+
+def test_reschedule_and_cancel():
+    wheel = TimerWheel(tick_ms=100, slots=8)
+    wheel.advance(0)
+    wheel.schedule('ec', 300)
+    wheel.schedule('ec', 900)              # une seule échéance par clé
+    wheel.schedule('temperature', 500)
+    assert wheel.deadline('ec') == 900
+    assert wheel.cancel('temperature')
+    assert not wheel.cancel('temperature')
+    
+    assert wheel.advance(800) == []
+    assert wheel.advance(900) == [('ec', 900)]
+
+
+def test_deadline_beyond_one_revolution():
+    wheel = TimerWheel(tick_ms=100, slots=8)   # un tour = 800 ms
+    wheel.advance(0)
+    wheel.schedule('humidity', 2050)
+    
+    for now in range(0, 2050, 50):
+        assert wheel.advance(now) == []
+    assert wheel.advance(2050) == [('humidity', 2050)]
+
+
+def test_past_deadline_expires_on_next_advance():
+    wheel = TimerWheel(tick_ms=100, slots=8)
+    wheel.advance(5000)
+    wheel.schedule('late', 1000)
+    assert wheel.advance(5000) == [('late', 1000)]
+
+
+def test_matches_brute_force_over_random_schedule():
+    rng = random.Random(42)
+    wheel = TimerWheel(tick_ms=50, slots=16)
+    deadlines = {}
+    now = 0
+    wheel.advance(now)
+    for _ in range(2000):
+        action = rng.random()
+        key = rng.randrange(40)
+        if action < 0.5:
+            deadline_ms = now + rng.randrange(0, 3000)
+            wheel.schedule(key, deadline_ms)
+            deadlines[key] = deadline_ms
+        elif action < 0.6:
+            assert wheel.cancel(key) == (deadlines.pop(key, None) is not None)
+        else:
+            # Avances irrégulières, parfois de plusieurs tours de roue
+            now += rng.choice((0, 7, 50, 333, 2000))
+            expected = sorted(((k, d) for k, d in deadlines.items() if d <= now), key=lambda item: item[1])
+            expired = wheel.advance(now)
+            assert sorted(expired, key=lambda item: (item[1], item[0])) == sorted(expected, key=lambda item: (item[1], item[0]))
+            for key, _ in expired:
+                del deadlines[key]
+        assert len(wheel) == len(deadlines)
@@ -0,0 +1,94 @@
+"""
+Régression incrémentale avec oubli exponentiel comparée à np.polyfit pondéré (poids
+λ^(n-i) de la lecture i parmi n) : lectures ajoutées une à une, par lots en retard, et
+sommes tenues par insert_sensor_readings
+"""
+import numpy as np
+import pytest
+
+from config import Config
+from trend_statistics import HOUR_MS, SUM_FIELDS, trend_from_stats, update_trend_stats
+
+START_MS = 1767225600000    # 2026-01-01 00:00 UTC
+
+
+def weighted_fit(ts_ms, values, half_life_hours):
+    """Pente (par heure) et corrélation des moindres carrés pondérés par l'âge de chaque lecture"""
+    hours = (np.asarray(ts_ms) - START_MS) / HOUR_MS
+    weights = 0.5 ** ((hours.max() - hours) / half_life_hours)
+    slope = np.polyfit(hours, values, 1, w=np.sqrt(weights))[0]
+    mean_t, mean_y = np.average(hours, weights=weights), np.average(values, weights=weights)
+    covariance = np.average((hours - mean_t) * (values - mean_y), weights=weights)
+    correlation = covariance / np.sqrt(np.average((hours - mean_t) ** 2, weights=weights)
+                                       * np.average((values - mean_y) ** 2, weights=weights))
+    return slope, correlation
+
+
+def series(n, seed=0):
+    rng = np.random.default_rng(seed)
+    ts_ms = START_MS + np.arange(n) * HOUR_MS
+    # Pente qui change de signe : l'oubli doit suivre la pente récente
+    hours = np.arange(n, dtype=np.float64)
+    values = 7.0 + np.where(hours < n / 2, 0.01 * hours, 0.01 * n - 0.01 * hours) + rng.normal(0.0, 0.05, n)
+    return ts_ms, values
+
+
+def test_one_at_a_time_matches_weighted_polyfit():
+    half_life_hours = 48.0
+    # Lectures horaires : poids λ^(n-i) avec λ = 2^(-1/48)
+    ts_ms, values = series(600)
+    state = None
+    for i in range(len(values)):
+        state = update_trend_stats(state, ts_ms[i:i + 1], values[i:i + 1], half_life_hours)
+        if i + 1 in (3, 50, 300, 301, 450, 600):
+            slope, correlation = weighted_fit(ts_ms[:i + 1], values[:i + 1], half_life_hours)
+            trend = trend_from_stats(state)
+            assert trend['slope'] == pytest.approx(slope, rel=1e-6, abs=1e-9)
+            assert trend['correlation'] == pytest.approx(correlation, rel=1e-6, abs=1e-9)
+    assert state['reading_count'] == len(values)
+    assert state['weight'] == pytest.approx(1 / (1 - 0.5 ** (1 / half_life_hours)), rel=1e-3)
+
+
+def test_late_batches_match_weighted_polyfit():
+    ts_ms, values = series(400, seed=1)
+    order = np.random.default_rng(2).permutation(len(values))
+    state = None
+    for batch in np.array_split(order, 37):
+        state = update_trend_stats(state, ts_ms[batch], values[batch], 24.0)
+    
+    slope, correlation = weighted_fit(ts_ms, values, 24.0)
+    trend = trend_from_stats(state)
+    assert trend['slope'] == pytest.approx(slope, rel=1e-6)
+    assert trend['correlation'] == pytest.approx(correlation, rel=1e-6)
+
+
+def test_without_forgetting_matches_polyfit():
+    ts_ms, values = series(300, seed=3)
+    state = None
+    for i in range(0, len(values), 7):
+        state = update_trend_stats(state, ts_ms[i:i + 7], values[i:i + 7])
+    hours = (ts_ms - START_MS) / HOUR_MS
+    assert trend_from_stats(state)['slope'] == pytest.approx(np.polyfit(hours, values, 1)[0], rel=1e-9)
+
+
+def test_insert_sensor_readings_maintains_sums(db):
+    ts_ms, values = series(500, seed=4)
+    for i in range(len(values)):
+        db.insert_sensor_readings([
+            {'sensor_type': 'npk_8in1', 'sensor_name': 'ph', 'value': float(values[i]), 'unit': 'pH', 'ts_ms': int(ts_ms[i])}
+        ])
+    state = db.get_trend_stats('ph')
+    
+    half_life_hours = Config.TREND_HALF_LIFE_HOURS
+    hours = (ts_ms - state['origin_ms']) / HOUR_MS
+    weights = 0.5 ** ((ts_ms.max() - ts_ms) / HOUR_MS / half_life_hours)
+    expected = dict(zip(SUM_FIELDS, (weights.sum(), weights @ hours, weights @ values, weights @ (hours * hours),
+                                     weights @ (hours * values), weights @ (values * values))))
+    for field in SUM_FIELDS:
+        assert state[field] == pytest.approx(expected[field], rel=1e-9)
+    assert state['reading_count'] == len(values)
+    assert state['ref_ms'] == ts_ms.max()
+    
+    slope, correlation = weighted_fit(ts_ms, values, half_life_hours)
+    assert trend_from_stats(state)['slope'] == pytest.approx(slope, rel=1e-6)
+    assert trend_from_stats(state)['correlation'] == pytest.approx(correlation, rel=1e-6)
@@ -0,0 +1,55 @@
+"""
+Évaluation vectorisée de la loi de Weibull comparée à scipy.stats.weibull_min pour
+plusieurs (β, η, γ, âge), et constantes de vie mises en cache par jeu de paramètres
+"""
+import numpy as np
+import pytest
+from scipy import stats
+
+from weibull_engine import IMMINENT_FAILURE_HOURS, life_constants, weibull_fleet
+
+PARAMETERS = [
+    {'shape': 0.7, 'scale': 5000.0},
+    {'shape': 1.0, 'scale': 8760.0, 'location': 0.0},
+    {'shape': 2.5, 'scale': 17520.0, 'location': 1000.0},
+    {'shape': 4.0, 'scale': 3000.0, 'location': 250.0},
+]
+AGES = [0.0, 100.0, 999.0, 1000.0, 2500.0, 8760.0, 20000.0, 60000.0]
+
+
+@pytest.mark.parametrize('params', PARAMETERS)
+def test_life_constants_match_scipy(params):
+    location = params.get('location', 0.0)
+    distribution = stats.weibull_min(params['shape'], loc=location, scale=params['scale'])
+    mttf, quantile_age = life_constants(params['shape'], params['scale'], location, 0.9)
+    
+    assert mttf == pytest.approx(distribution.mean(), rel=1e-12)
+    assert quantile_age == pytest.approx(distribution.ppf(0.9), rel=1e-12)
+
+
+def test_life_constants_are_cached():
+    life_constants.cache_clear()
+    for _ in range(3):
+        weibull_fleet(PARAMETERS, [0, 1, 2, 3] * 50, np.linspace(0.0, 30000.0, 200))
+    info = life_constants.cache_info()
+    assert info.misses == len(PARAMETERS)
+    assert info.hits == 2 * len(PARAMETERS)
+
+
+@pytest.mark.parametrize('quantile', [0.5, 0.9])
+def test_fleet_matches_scipy(quantile):
+    classes = np.repeat(np.arange(len(PARAMETERS)), len(AGES))
+    ages = np.tile(AGES, len(PARAMETERS))
+    fleet = weibull_fleet(PARAMETERS, classes, ages, quantile)
+    
+    for k, (index, age) in enumerate(zip(classes, ages)):
+        params = PARAMETERS[index]
+        distribution = stats.weibull_min(params['shape'], loc=params.get('location', 0.0), scale=params['scale'])
+        assert fleet['failure_probability'][k] == pytest.approx(distribution.cdf(age), rel=1e-10, abs=1e-15)
+        assert fleet['reliability'][k] == pytest.approx(distribution.sf(age), rel=1e-10, abs=1e-15)
+        assert fleet['mean_time_to_failure'][k] == pytest.approx(distribution.mean(), rel=1e-12)
+        assert fleet['quantile_age_hours'][k] == pytest.approx(distribution.ppf(quantile), rel=1e-12)
+        expected_remaining = (max(0.0, distribution.ppf(quantile) - age) if distribution.cdf(age) < quantile
+                              else IMMINENT_FAILURE_HOURS)
+        assert fleet['remaining_hours'][k] == pytest.approx(expected_remaining, rel=1e-9, abs=1e-6)
+        assert fleet['shape'][k] == params['shape'] and fleet['scale'][k] == params['scale']
@@ -0,0 +1,157 @@
+"""
+Ajustement de Weibull : comparaison avec le maximum de vraisemblance de SciPy (données
+complètes et censurées), cas dégénérés, classement des maintenances en défaillances,
+remises à neuf ou inspections, et ajustement par classe de capteurs
+"""
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from scipy import optimize, stats
+
+from config import Config
+from database import to_epoch_ms
+from predictive_maintenance import PredictiveMaintenance
+from weibull_fitting import WeibullFitter, fit_weibull
+
+HOUR_MS = 3600 * 1000
+
+
+def censored_log_likelihood(params, t, failed):
+    shape, scale = params
+    if shape <= 0 or scale <= 0:
+        return np.inf
+    return -(stats.weibull_min.logpdf(t[failed], shape, scale=scale).sum()
+             + stats.weibull_min.logsf(t[~failed], shape, scale=scale).sum())
+
+
+def test_complete_data_matches_scipy():
+    t = stats.weibull_min.rvs(2.3, scale=1500.0, size=300, random_state=np.random.default_rng(3))
+    fit = fit_weibull(t, np.ones(len(t), dtype=bool), fit_location=False)
+    shape, _, scale = stats.weibull_min.fit(t, floc=0)
+    
+    assert fit['shape'] == pytest.approx(shape, rel=1e-5)
+    assert fit['scale'] == pytest.approx(scale, rel=1e-5)
+    assert fit['location'] == 0.0
+    assert fit['log_likelihood'] == pytest.approx(stats.weibull_min.logpdf(t, shape, scale=scale).sum(), rel=1e-6)
+
+
+def test_censored_data_matches_direct_maximisation():
+    rng = np.random.default_rng(4)
+    lifetimes = stats.weibull_min.rvs(1.7, scale=800.0, size=200, random_state=rng)
+    censoring = rng.uniform(100.0, 1500.0, size=200)
+    t = np.minimum(lifetimes, censoring)
+    failed = lifetimes <= censoring
+    
+    fit = fit_weibull(t, failed, fit_location=False)
+    reference = optimize.minimize(censored_log_likelihood, x0=[1.0, t.mean()], args=(t, failed),
+                                  method='Nelder-Mead', options={'xatol': 1e-8, 'fatol': 1e-10, 'maxiter': 5000})
+    
+    assert fit['failures'] == failed.sum() and fit['censored'] == (~failed).sum()
+    assert fit['shape'] == pytest.approx(reference.x[0], rel=1e-4)
+    assert fit['scale'] == pytest.approx(reference.x[1], rel=1e-4)
+    assert fit['log_likelihood'] == pytest.approx(-reference.fun, rel=1e-6)
+
+
+def test_location_fit_improves_likelihood():
+    t = 500.0 + stats.weibull_min.rvs(2.0, scale=300.0, size=200, random_state=np.random.default_rng(5))
+    failed = np.ones(len(t), dtype=bool)
+    two_parameters = fit_weibull(t, failed, fit_location=False)
+    three_parameters = fit_weibull(t, failed, fit_location=True)
+    
+    assert three_parameters['location'] > 0
+    assert three_parameters['log_likelihood'] >= two_parameters['log_likelihood']
+
+
+@pytest.mark.parametrize('durations, failed', [
+    ([100.0, 100.0, 100.0], [True, True, True]),
+    ([100.0, 100.0, 100.0, 50.0], [True, True, True, False]),
+    ([100.0], [True]),
+    ([100.0, 200.0], [False, False]),
+])
+def test_degenerate_histories_are_not_fitted(durations, failed):
+    with np.errstate(all='raise'):
+        assert fit_weibull(durations, failed) is None
+
+
+def test_identical_failures_with_longer_censored_unit_are_fitted():
+    fit = fit_weibull([100.0, 100.0, 100.0, 150.0], [True, True, True, False], fit_location=False)
+    assert fit is not None and np.isfinite(fit['shape'])
+
+
+def test_lifetimes_use_user_recorded_types():
+    fitter = WeibullFitter(db=object())
+    maintenances = [
+        {'maintenance_type': maintenance_type, 'completed_date': completed_hours * HOUR_MS}
+        for maintenance_type, completed_hours in [
+            ('emergency', 100),               # défaillance
+            ('urgent_maintenance', 150),      # créée automatiquement : ignorée
+            ('emergency_maintenance', 170),   # créée automatiquement : ignorée
+            ('preventive', 200),              # remise à neuf (censure)
+            ('corrective', 320),              # défaillance
+        ]
+    ]
+    durations, failed, renewed_at_ms = fitter.lifetimes(maintenances, 0, 400 * HOUR_MS)
+    
+    assert durations.tolist() == [100.0, 100.0, 120.0, 80.0]
+    assert failed.tolist() == [True, False, True, False]
+    assert renewed_at_ms == 320 * HOUR_MS
+
+
+def record(db, sensor_name, maintenance_type, completed_hours):
+    maintenance_id = db.create_maintenance_record(sensor_name, maintenance_type, '', '2026-01-01 00:00:00')
+    completed = datetime(2026, 1, 1) + timedelta(hours=completed_hours)
+    db.update_maintenance_status(maintenance_id, 'completed', completed.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+@pytest.fixture
+def npk_history(db):
+    """Deux défaillances par capteur de la classe npk_8in1 : trop peu pour un capteur seul"""
+    for sensor_name, failures in [('nitrogen', [900, 2100]), ('phosphorus', [1200, 2000]), ('potassium', [700, 1900])]:
+        record(db, sensor_name, 'preventive', 0)
+        for completed_hours in failures:
+            record(db, sensor_name, 'corrective', completed_hours)
+    return db
+
+
+def test_class_pools_lifetimes_of_its_sensors(npk_history):
+    fitter = WeibullFitter(npk_history)
+    fits, lifetimes = fitter.refresh()
+    
+    assert set(fits) == {'npk_8in1'}
+    assert fits['npk_8in1']['status'] == 'fitted'
+    assert fits['npk_8in1']['failures'] == 6
+    assert fits['npk_8in1']['sensors'] == len([name for name, sensor_class in Config.WEIBULL_SENSOR_CLASSES.items()
+                                               if sensor_class == 'npk_8in1'])
+    assert lifetimes['nitrogen']['durations'] == [900.0, 1200.0]
+    assert npk_history.get_weibull_class_parameters() == fits
+    
+    maintenance = PredictiveMaintenance.__new__(PredictiveMaintenance)
+    maintenance.life_parameters, maintenance.fitter = Config.SENSOR_LIFE_PARAMETERS, fitter
+    maintenance.refresh_life_parameters()
+    # Même jeu de paramètres pour toute la classe, configuration pour les autres
+    assert maintenance.fitted_parameters['nitrogen'] is maintenance.fitted_parameters['salinity']
+    assert 'water_flow' not in maintenance.fitted_parameters
+    assert maintenance.renewals['potassium'] == to_epoch_ms('2026-03-21 04:00:00')
+
+
+def test_only_changed_classes_are_refitted(npk_history, monkeypatch):
+    fitter = WeibullFitter(npk_history)
+    fits, _ = fitter.refresh()
+    time.sleep(0.002)
+    record(npk_history, 'water_flow', 'preventive', 0)
+    record(npk_history, 'water_flow', 'corrective', 500)
+    
+    reread = []
+    get_completed_maintenances = npk_history.get_completed_maintenances
+    monkeypatch.setattr(npk_history, 'get_completed_maintenances',
+                        lambda sensor_names: reread.append(sensor_names) or get_completed_maintenances(sensor_names))
+    refreshed, lifetimes = fitter.refresh()
+    
+    assert reread == [['water_flow']]
+    assert refreshed['npk_8in1'] == fits['npk_8in1']
+    assert refreshed['water_flow']['status'] == 'insufficient_data'
+    assert refreshed['water_flow']['failures'] == 1
+    assert set(lifetimes) == {'nitrogen', 'phosphorus', 'potassium', 'water_flow'}
+    assert fitter.refresh() == (refreshed, lifetimes)
@@ -0,0 +1,79 @@
+"""
+Roue temporelle hachée (hashed timer wheel)
+Planification et annulation d'échéances en O(1), expiration en O(échéances du créneau)
+au lieu d'un parcours de toutes les clés à chaque vérification
+"""
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class TimerWheel:
+    """
+    `slots` créneaux de `tick_ms` millisecondes. Une échéance est rangée dans le créneau
+    de son instant ; une échéance au-delà d'un tour de roue reste dans son créneau et n'est
+    retenue qu'au tour où elle arrive à terme. Une seule échéance par clé.
+    """
+    
+    def __init__(self, tick_ms: int = 1000, slots: int = 512):
+        self.tick_ms = int(tick_ms)
+        self.slots = int(slots)
+        self._buckets: List[Dict[Hashable, int]] = [{} for _ in range(self.slots)]
+        self._deadlines: Dict[Hashable, Tuple[int, int]] = {}   # clé -> (créneau, échéance)
+        self._current_tick: Optional[int] = None
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._deadlines)
+    
+    def __contains__(self, key):
+        return key in self._deadlines
+    
+    def schedule(self, key: Hashable, deadline_ms: int):
+        """(Re)programme l'échéance de `key`"""
+        deadline_ms = int(deadline_ms)
+        with self._lock:
+            self._remove(key)
+            tick = deadline_ms // self.tick_ms
+            if self._current_tick is not None:
+                tick = max(tick, self._current_tick)   # échéance déjà passée : prochain advance()
+            index = tick % self.slots
+            self._deadlines[key] = (index, deadline_ms)
+            self._buckets[index][key] = deadline_ms
+    
+    def cancel(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._remove(key)
+    
+    def deadline(self, key: Hashable) -> Optional[int]:
+        entry = self._deadlines.get(key)
+        return entry[1] if entry else None
+    
+    def advance(self, now_ms: int) -> List[Tuple[Hashable, int]]:
+        """Fait tourner la roue jusqu'à `now_ms` ; renvoie les (clé, échéance) arrivées à terme"""
+        now_tick = int(now_ms) // self.tick_ms
+        expired = []
+        with self._lock:
+            if self._current_tick is None:
+                self._current_tick = now_tick - self.slots
+            # Le créneau courant est revisité (échéances plus tardives dans le même tick) ;
+            # au-delà d'un tour complet, chaque créneau n'est visité qu'une fois
+            first_tick = max(self._current_tick, now_tick - self.slots + 1)
+            for tick in range(first_tick, now_tick + 1):
+                bucket = self._buckets[tick % self.slots]
+                if not bucket:
+                    continue
+                for key, deadline_ms in list(bucket.items()):
+                    if deadline_ms <= now_ms:
+                        del bucket[key]
+                        del self._deadlines[key]
+                        expired.append((key, deadline_ms))
+            self._current_tick = max(self._current_tick, now_tick)
+        expired.sort(key=lambda item: item[1])
+        return expired
+    
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._deadlines.pop(key, None)
+        if entry is None:
+            return False
+        self._buckets[entry[0]].pop(key, None)
+        return True
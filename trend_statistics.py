@@ -0,0 +1,70 @@
+"""
+Régression linéaire incrémentale des tendances de dégradation
+Statistiques suffisantes par capteur (n, Σt, Σy, Σt², Σty, Σy²), avec oubli exponentiel
+optionnel, mises à jour à chaque lot de lectures : la pente et la corrélation se calculent
+en O(1) sans relire la série, sur une fenêtre aussi longue que voulu.
+"""
+import numpy as np
+from typing import Dict, Optional
+
+HOUR_MS = 3600 * 1000
+
+# Sommes pondérées tenues pour chaque capteur (t en heures depuis `origin_ms`)
+SUM_FIELDS = ('weight', 'sum_t', 'sum_y', 'sum_tt', 'sum_ty', 'sum_yy')
+
+
+def update_trend_stats(state: Optional[Dict], ts_ms, values, half_life_hours: Optional[float] = None) -> Dict:
+    """
+    Ajoute un lot de lectures (epoch ms, valeurs) aux statistiques d'un capteur et renvoie
+    le nouvel état ({} ou None pour un capteur sans statistiques).
+    
+    Avec `half_life_hours`, le poids d'une lecture est divisé par deux à chaque demi-vie
+    écoulée depuis la lecture la plus récente (`ref_ms`) : les sommes existantes sont
+    atténuées quand cette référence avance, les lectures en retard arrivent déjà atténuées.
+    """
+    ts_ms = np.asarray(ts_ms, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    if state:
+        state = dict(state)
+    else:
+        origin_ms = int(ts_ms.min())
+        state = dict.fromkeys(SUM_FIELDS, 0.0)
+        state.update(origin_ms=origin_ms, ref_ms=origin_ms, reading_count=0)
+    
+    ref_ms = max(state['ref_ms'], int(ts_ms.max()))
+    if half_life_hours:
+        decay = 0.5 ** ((ref_ms - state['ref_ms']) / HOUR_MS / half_life_hours)
+        for field in SUM_FIELDS:
+            state[field] *= decay
+        weights = 0.5 ** ((ref_ms - ts_ms) / HOUR_MS / half_life_hours)
+    else:
+        weights = np.ones(len(values))
+    
+    hours = (ts_ms - state['origin_ms']) / HOUR_MS
+    state['weight'] += float(weights.sum())
+    state['sum_t'] += float(weights @ hours)
+    state['sum_y'] += float(weights @ values)
+    state['sum_tt'] += float(weights @ (hours * hours))
+    state['sum_ty'] += float(weights @ (hours * values))
+    state['sum_yy'] += float(weights @ (values * values))
+    state['reading_count'] += len(values)
+    state['ref_ms'] = ref_ms
+    return state
+
+
+def trend_from_stats(state: Dict) -> Optional[Dict]:
+    """Pente (unités par heure) et coefficient de corrélation ; None si les t ou les y sont constants"""
+    w = state['weight']
+    covariance = w * state['sum_ty'] - state['sum_t'] * state['sum_y']
+    variance_t = w * state['sum_tt'] - state['sum_t'] ** 2
+    variance_y = w * state['sum_yy'] - state['sum_y'] ** 2
+    # Erreurs d'arrondi des différences de grands nombres : variance nulle à la précision près
+    if variance_t <= 1e-12 * w * state['sum_tt'] or w <= 0:
+        return None
+    correlation = 0.0
+    if variance_y > 1e-12 * w * state['sum_yy']:
+        correlation = max(-1.0, min(1.0, covariance / np.sqrt(variance_t * variance_y)))
+    return {
+        'slope': covariance / variance_t,
+        'correlation': float(correlation)
+    }
@@ -0,0 +1,60 @@
+"""
+Évaluation vectorisée de la loi de Weibull pour tout un parc d'équipements
+Forme fermée en NumPy au lieu d'appels scalaires à scipy.stats.weibull_min : probabilité
+de défaillance, fiabilité, MTTF et délai jusqu'au quantile de défaillance de N équipements
+en une seule passe
+"""
+import math
+import numpy as np
+from functools import lru_cache
+from typing import Dict, Sequence, Tuple
+
+# Délai retenu quand la probabilité de défaillance a déjà atteint le quantile visé
+IMMINENT_FAILURE_HOURS = 24
+
+
+@lru_cache(maxsize=1024)
+def life_constants(shape: float, scale: float, location: float = 0.0, quantile: float = 0.9) -> Tuple[float, float]:
+    """
+    MTTF et âge (heures) auquel la probabilité de défaillance atteint `quantile`.
+    Ne dépendent que des paramètres de vie : calculés une fois par jeu de paramètres.
+    """
+    mttf = location + scale * math.gamma(1 + 1 / shape)
+    quantile_age = location + scale * (-math.log1p(-quantile)) ** (1 / shape)
+    return mttf, quantile_age
+
+
+def weibull_fleet(parameters: Sequence[Dict], classes, ages_hours, quantile: float = 0.9) -> Dict[str, np.ndarray]:
+    """
+    Indicateurs de fiabilité de chaque équipement (tableaux alignés sur `ages_hours`).
+    
+    `parameters` : paramètres de vie de chaque classe d'équipement ('shape' β, 'scale' η,
+    'location' γ) ; `classes` : indice de la classe de chaque équipement.
+    F(t) = 1 - exp(-((t - γ) / η)^β) pour t > γ, 0 sinon ; le MTTF et l'âge au quantile
+    sont lus dans le cache par classe puis distribués aux équipements.
+    """
+    table = np.array([
+        (params['shape'], params['scale'], params.get('location', 0.0),
+         *life_constants(float(params['shape']), float(params['scale']), float(params.get('location', 0.0)), quantile))
+        for params in parameters
+    ], dtype=np.float64).reshape(-1, 5)
+    classes = np.asarray(classes, dtype=np.intp)
+    ages = np.asarray(ages_hours, dtype=np.float64)
+    shapes, scales, locations, mttf, quantile_age = table[classes].T
+    
+    elapsed = np.maximum(ages - locations, 0.0)
+    failure_probability = -np.expm1(-(elapsed / scales) ** shapes)
+    remaining_hours = np.where(
+        failure_probability < quantile,
+        np.maximum(0.0, quantile_age - ages),
+        IMMINENT_FAILURE_HOURS
+    )
+    return {
+        'failure_probability': failure_probability,
+        'reliability': 1 - failure_probability,
+        'mean_time_to_failure': mttf,
+        'quantile_age_hours': quantile_age,
+        'remaining_hours': remaining_hours,
+        'shape': shapes,
+        'scale': scales
+    }
@@ -0,0 +1,227 @@
+"""
+Ajustement des paramètres de Weibull sur l'historique réel des capteurs
+Maximum de vraisemblance avec censure à droite : les durées de vie terminées par une
+défaillance sont observées, celles interrompues par une maintenance préventive ou encore
+en cours (unité en service) sont censurées. Les durées de vie des capteurs d'une même
+classe (modèle de sonde) sont mises en commun : un seul ajustement par classe, mis en
+cache dans weibull_class_parameters et recalculé seulement pour les classes dont un
+capteur a vu son historique de maintenance changer (seul cet historique est relu).
+"""
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from database import get_database, now_ms, to_epoch_ms
+
+
+def fit_weibull(durations, failed, fit_location: bool = True, location_grid: int = 32,
+                max_iterations: int = 100) -> Optional[Dict]:
+    """
+    Estimation (β, η, γ) du maximum de vraisemblance pour des durées censurées à droite.
+    
+    Pour γ fixé, η est éliminé (η^β = Σ x^β / r, r défaillances, x = t - γ) et β est la
+    racine de Σ x^β ln x / Σ x^β - 1/β - moyenne(ln x des défaillances) ; l'équation est
+    résolue par Newton simultanément pour toute une grille de γ, puis le γ de plus grande
+    vraisemblance est retenu (γ > 0 seulement si β ≥ 1, sinon la vraisemblance diverge).
+    
+    None si l'historique ne permet pas d'estimation : en particulier si toutes les
+    défaillances ont la même durée sans durée censurée plus longue (β → ∞).
+    """
+    t = np.asarray(durations, dtype=np.float64)
+    d = np.asarray(failed, dtype=bool)
+    r = int(d.sum())
+    if r < 1 or len(t) < 2 or not (t > 0).all():
+        return None
+    failure_durations = t[d]
+    if np.ptp(failure_durations) <= 1e-9 * failure_durations.max() and not (t[~d] > failure_durations.max()).any():
+        return None
+    
+    # Grille de localisation, bornée par la plus courte durée avant défaillance
+    gammas = np.zeros(1)
+    if fit_location and location_grid > 1:
+        gammas = np.linspace(0.0, 0.95 * t[d].min(), location_grid)
+    
+    # Durées normalisées (x^β reste borné pendant les itérations)
+    unit = t.max()
+    x = np.maximum(t[None, :] - gammas[:, None], 0.0) / unit        # (γ, unités)
+    positive = x > 0
+    log_x = np.log(np.where(positive, x, 1.0))
+    mean_log_failures = (log_x * d).sum(axis=1) / r
+    
+    beta = np.ones(len(gammas))
+    for _ in range(max_iterations):
+        powers = np.where(positive, x ** beta[:, None], 0.0)
+        b = powers.sum(axis=1)
+        a = (powers * log_x).sum(axis=1)
+        c = (powers * log_x * log_x).sum(axis=1)
+        g = a / b - 1 / beta - mean_log_failures
+        slope = (c * b - a * a) / (b * b) + 1 / (beta * beta)        # > 0 : racine unique
+        updated = beta - g / slope
+        updated = np.where(updated > 0, updated, beta / 2)
+        converged = np.abs(updated - beta) <= 1e-10 * beta
+        beta = updated
+        if converged.all():
+            break
+    
+    powers = np.where(positive, x ** beta[:, None], 0.0)
+    eta = (powers.sum(axis=1) / r) ** (1 / beta)
+    # Log-vraisemblance profilée, en unités d'origine (terme -r ln(unit) du changement d'échelle)
+    log_likelihood = r * np.log(beta) - r * beta * np.log(eta) + (beta - 1) * (log_x * d).sum(axis=1) - r - r * np.log(unit)
+    admissible = (gammas == 0) | (beta >= 1)
+    log_likelihood = np.where(admissible & np.isfinite(log_likelihood), log_likelihood, -np.inf)
+    best = int(np.argmax(log_likelihood))
+    if not np.isfinite(log_likelihood[best]) or not np.isfinite(beta[best]) or not converged[best]:
+        return None
+    
+    return {
+        'shape': float(beta[best]),
+        'scale': float(eta[best] * unit),
+        'location': float(gammas[best]),
+        'failures': r,
+        'censored': int(len(t) - r),
+        'log_likelihood': float(log_likelihood[best])
+    }
+
+
+class WeibullFitter:
+    """
+    Construit les durées de vie de chaque capteur à partir des maintenances terminées
+    (une défaillance ou une remise à neuf redémarre la durée de vie), ajuste les paramètres
+    de chaque classe de capteurs et tient le cache à jour de façon incrémentale.
+    """
+    
+    def __init__(self, db=None):
+        self.db = db or get_database()
+        self.failure_types = set(Config.WEIBULL_FAILURE_MAINTENANCE_TYPES)
+        self.renewal_types = set(Config.WEIBULL_RENEWAL_MAINTENANCE_TYPES)
+        self.min_failures = Config.WEIBULL_FIT_MIN_FAILURES
+        self.fit_location = Config.WEIBULL_FIT_LOCATION
+        self.location_grid = Config.WEIBULL_FIT_LOCATION_GRID
+        self.sensor_classes = Config.WEIBULL_SENSOR_CLASSES
+    
+    def sensor_class(self, sensor_name: str) -> str:
+        """Classe d'un capteur (modèle de sonde) ; un capteur non classé forme sa propre classe"""
+        return self.sensor_classes.get(sensor_name, sensor_name)
+    
+    def history(self, maintenances: List[Dict], start_ms: Optional[int]) -> Tuple[List[float], List[bool], Optional[int], Optional[int]]:
+        """
+        Durées de vie terminées (heures) et indicateur de défaillance d'un capteur, début de
+        sa vie en cours et date de sa dernière remise à neuf
+        """
+        durations, failed, renewed_at_ms = [], [], None
+        for maintenance in maintenances:
+            failure = maintenance['maintenance_type'] in self.failure_types
+            if not failure and maintenance['maintenance_type'] not in self.renewal_types:
+                continue   # Inspection : l'unité n'est pas remise à neuf
+            completed_ms = to_epoch_ms(maintenance['completed_date'])
+            if start_ms is not None and completed_ms > start_ms:
+                durations.append((completed_ms - start_ms) / 3600000)
+                failed.append(failure)
+            start_ms = completed_ms if start_ms is None else max(start_ms, completed_ms)
+            renewed_at_ms = start_ms
+        return durations, failed, start_ms, renewed_at_ms
+    
+    def lifetimes(self, maintenances: List[Dict], start_ms: Optional[int], end_ms: int) -> Tuple[np.ndarray, np.ndarray, Optional[int]]:
+        """
+        Durées de vie (heures) et indicateur de défaillance d'un capteur (la dernière, en
+        cours, est censurée) et date de la dernière remise à neuf
+        """
+        durations, failed, open_since_ms, renewed_at_ms = self.history(maintenances, start_ms)
+        if open_since_ms is not None and end_ms > open_since_ms:
+            durations.append((end_ms - open_since_ms) / 3600000)
+            failed.append(False)
+        return np.array(durations, dtype=np.float64), np.array(failed, dtype=bool), renewed_at_ms
+    
+    def sensor_lifetimes(self, sensor_names: List[str], metadata: Dict[str, Dict], watermark_ms: int) -> List[Dict]:
+        """Relit l'historique complet des capteurs donnés (les autres ne sont pas relus)"""
+        maintenances = {}
+        for maintenance in self.db.get_completed_maintenances(sensor_names):
+            maintenances.setdefault(maintenance['sensor_name'], []).append(maintenance)
+        
+        lifetimes = []
+        for sensor_name in sensor_names:
+            # Mise en service : première lecture connue (sinon la première maintenance)
+            start_ms = metadata.get(sensor_name, {}).get('first_ts_ms')
+            durations, failed, open_since_ms, renewed_at_ms = self.history(maintenances.get(sensor_name, []), start_ms)
+            lifetimes.append({
+                'sensor_name': sensor_name,
+                'sensor_class': self.sensor_class(sensor_name),
+                'durations': durations,
+                'failed': failed,
+                'open_since_ms': open_since_ms,
+                'renewed_at_ms': renewed_at_ms,
+                'events_watermark_ms': watermark_ms
+            })
+        return lifetimes
+    
+    def fit_class(self, sensor_class: str, members: List[Dict], end_ms: int, watermark_ms: int) -> Dict:
+        """Ajuste une classe sur les durées de vie mises en commun de ses capteurs (vies en cours censurées)"""
+        durations, failed = [], []
+        for lifetime in members:
+            durations.extend(lifetime['durations'])
+            failed.extend(lifetime['failed'])
+            if lifetime['open_since_ms'] is not None and end_ms > lifetime['open_since_ms']:
+                durations.append((end_ms - lifetime['open_since_ms']) / 3600000)
+                failed.append(False)
+        durations, failed = np.array(durations, dtype=np.float64), np.array(failed, dtype=bool)
+        
+        fit = None
+        if failed.sum() >= self.min_failures:
+            fit = fit_weibull(durations, failed, self.fit_location, self.location_grid)
+        return {
+            'sensor_class': sensor_class,
+            'status': 'fitted' if fit else 'insufficient_data',
+            'shape': fit['shape'] if fit else None,
+            'scale': fit['scale'] if fit else None,
+            'location': fit['location'] if fit else None,
+            'sensors': len(members),
+            'failures': int(failed.sum()),
+            'censored': int(len(failed) - failed.sum()),
+            'log_likelihood': fit['log_likelihood'] if fit else None,
+            'events_watermark_ms': watermark_ms,
+            'fitted_at_ms': end_ms
+        }
+    
+    def refresh(self, full: bool = False) -> Tuple[Dict[str, Dict], Dict[str, Dict]]:
+        """
+        Relit l'historique des capteurs dont les maintenances ont changé depuis le dernier
+        ajustement (tous si `full`) et réajuste leurs classes seulement ; renvoie l'ajustement
+        en cache de chaque classe et les durées de vie de chaque capteur ayant un historique
+        """
+        lifetimes = self.db.get_sensor_lifetimes()
+        fits = self.db.get_weibull_class_parameters()
+        watermark = None if full or not fits else max(fit['events_watermark_ms'] for fit in fits.values())
+        changed, latest = self.db.get_maintenance_changes(watermark)
+        if full:
+            changed = sorted(set(changed) | set(lifetimes))
+        if not changed:
+            return fits, lifetimes
+        
+        end_ms = now_ms()
+        watermark_ms = latest if latest is not None else (watermark or 0)
+        metadata = self.db.get_all_sensor_metadata()
+        updated = self.sensor_lifetimes(changed, metadata, watermark_ms)
+        for lifetime in updated:
+            lifetimes[lifetime['sensor_name']] = lifetime
+        
+        # Membres de chaque classe : un capteur en service sans maintenance apporte sa vie en
+        # cours (depuis sa première lecture), durée censurée
+        members = {}
+        for sensor_name in set(Config.SENSOR_THRESHOLDS) | set(Config.SENSOR_LIFE_PARAMETERS) | set(lifetimes):
+            lifetime = lifetimes.get(sensor_name) or {
+                'durations': [], 'failed': [], 'open_since_ms': metadata.get(sensor_name, {}).get('first_ts_ms')
+            }
+            members.setdefault(self.sensor_class(sensor_name), []).append(lifetime)
+        
+        refitted = [
+            self.fit_class(sensor_class, members[sensor_class], end_ms, watermark_ms)
+            for sensor_class in sorted({lifetime['sensor_class'] for lifetime in updated})
+        ]
+        self.db.save_weibull_fits(updated, refitted)
+        for fit in refitted:
+            fits[fit['sensor_class']] = fit
+            if fit['status'] == 'fitted':
+                print(f"📐 Weibull {fit['sensor_class']}: β={fit['shape']:.2f}, η={fit['scale']:.0f} h, "
+                      f"γ={fit['location']:.0f} h ({fit['sensors']} capteurs, {fit['failures']} défaillances, "
+                      f"{fit['censored']} censurées)")
+        
+        return fits, lifetimes